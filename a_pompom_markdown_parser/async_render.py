@@ -0,0 +1,215 @@
+import asyncio
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncGenerator, Callable
+
+from a_pompom_markdown_parser.main import parse_md_to_html, parse_md_to_html_by_string, parse_md_to_html_chunks, \
+    DEFAULT_FLUSH_SIZE
+
+# 別スレッド・別プロセスへ処理を移すときの固定コストを払うより、イベントループ上で変換した方が速い文字数
+# 数十マイクロ秒のスレッドの受け渡しと、同程度の時間で変換できる大きさとした
+DEFAULT_INLINE_THRESHOLD = 256
+# 同時に変換する文書数の上限
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def render_chunk_list(markdown_content: str, flush_size: int) -> list[str]:
+    """
+    マークダウン文字列を変換し、HTML文字列の断片をまとめて返却 別プロセスの委譲先で呼び出す
+
+    :param markdown_content: マークダウン形式の文字列
+    :param flush_size: まとめて出力する文字数の目安 0以下の場合は最上位のBlock要素ごとに出力
+    :return: HTML文字列の断片
+    """
+    return list(parse_md_to_html_chunks(markdown_content, flush_size))
+
+
+class AsyncRenderer:
+    """
+    イベントループを止めずにマークダウン→HTMLへ変換することを責務に持つ\n
+    パース・変換・HTMLの組み立てはExecutorへ委譲し、同時に委譲する数を制限する
+    """
+
+    def __init__(self, executor: Executor = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 inline_threshold: int = DEFAULT_INLINE_THRESHOLD):
+        # 処理を委譲するExecutor スレッド・プロセスいずれも受け付ける
+        # 別プロセスへは、モジュールの関数と文字列のみを受け渡す
+        # 省略した場合は初めて利用するときにスレッドのExecutorを生成
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._max_concurrency = max_concurrency
+        # この文字数未満のマークダウン文字列は委譲せずに変換する ファイルの変換には適用しない
+        self._inline_threshold = inline_threshold
+        # asyncioの同期プリミティブはイベントループごとに用意する必要があるので、ループをキーに保持
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    async def render(self, markdown_content: str) -> str:
+        """
+        マークダウン文字列をHTML文字列へ変換
+
+        :param markdown_content: マークダウン形式の文字列
+        :return: HTML形式の文字列
+        """
+
+        if len(markdown_content) < self._inline_threshold:
+            return parse_md_to_html_by_string(markdown_content)
+
+        return await self._offload(parse_md_to_html_by_string, markdown_content)
+
+    async def render_stream(self, markdown_content: str,
+                            flush_size: int = DEFAULT_FLUSH_SIZE) -> AsyncGenerator[str, None]:
+        """
+        マークダウン文字列を先頭から変換し、HTML文字列を少しずつ出力\n
+        文書全体の変換を待たずに出力を始められるので、最初の出力までの時間が文書の大きさに左右されない\n
+        変換途中の状態を保持するジェネレータは別プロセスへ受け渡せないので、委譲先がスレッドのExecutorでない場合は、
+        委譲先ですべての断片を組み立ててからまとめて受け取る
+
+        :param markdown_content: マークダウン形式の文字列
+        :param flush_size: まとめて出力する文字数の目安 0以下の場合は最上位のBlock要素ごとに出力
+        :return: ループで参照される度、HTML文字列の断片を返却
+        """
+
+        chunks = parse_md_to_html_chunks(markdown_content, flush_size)
+
+        if len(markdown_content) < self._inline_threshold:
+            for chunk in chunks:
+                yield chunk
+            return
+
+        if not isinstance(self._get_executor(), ThreadPoolExecutor):
+            for chunk in await self._offload(render_chunk_list, markdown_content, flush_size):
+                yield chunk
+            return
+
+        # 1つの断片を組み立てる単位で委譲することで、委譲の固定コストを断片の大きさに応じて均す
+        while True:
+            chunk = await self._offload(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def render_file(self, in_file_path: str, out_file_path: str):
+        """
+        マークダウンファイルをHTMLファイルへ変換 ファイルの読み書きも委譲先で行う\n
+        ファイルの読み書き・大きさの取得はいずれもイベントループを止めるので、大きさによらず常に委譲する
+
+        :param in_file_path: 入力マークダウンファイルパス
+        :param out_file_path: 出力HTMLファイルパス
+        """
+
+        await self._offload(parse_md_to_html, in_file_path, out_file_path)
+
+    async def _offload(self, func: Callable, *args):
+        """
+        同時実行数の上限を守りながら、処理をExecutorへ委譲\n
+        呼び出し元がキャンセルされた場合、委譲先で未着手の処理は取り消す
+        着手済みの処理は中断できないので、処理を終えるまで同時実行数の枠を保持し、上限を超えて委譲しないようにする
+
+        :param func: 委譲する処理
+        :param args: 処理の引数
+        :return: 処理結果
+        """
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+        await semaphore.acquire()
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, semaphore))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 取り消しがイベントループを経由して伝わるのを待たず、委譲先で着手される前に取り消す
+            future.cancel()
+            raise
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore):
+        """
+        委譲先のスレッドから、イベントループ上でセマフォを解放
+
+        :param loop: セマフォを生成したイベントループ
+        :param semaphore: 解放対象
+        """
+
+        # 処理を終えるより先にイベントループが閉じられた場合、待ち合わせる処理も残っていないので解放は不要
+        if loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            pass
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        """
+        イベントループと対応するセマフォを取得
+
+        :param loop: 実行中のイベントループ
+        :return: 同時実行数を制限するセマフォ
+        """
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._semaphores[loop] = semaphore
+
+        return semaphore
+
+    def _get_executor(self) -> Executor:
+        """
+        委譲先のExecutorを取得
+
+        :return: Executor
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency,
+                                                thread_name_prefix='markdown-render')
+
+        return self._executor
+
+    def close(self):
+        """
+        自身が生成したExecutorを終了
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_default_renderer = AsyncRenderer()
+
+
+async def render_async(markdown_content: str) -> str:
+    """
+    イベントループを止めずに、マークダウン文字列をHTML文字列へ変換
+
+    :param markdown_content: マークダウン形式の文字列
+    :return: HTML形式の文字列
+    """
+    return await _default_renderer.render(markdown_content)
+
+
+async def render_stream_async(markdown_content: str,
+                              flush_size: int = DEFAULT_FLUSH_SIZE) -> AsyncGenerator[str, None]:
+    """
+    イベントループを止めずに、マークダウン文字列をHTML文字列の断片へ少しずつ変換
+
+    :param markdown_content: マークダウン形式の文字列
+    :param flush_size: まとめて出力する文字数の目安 0以下の場合は最上位のBlock要素ごとに出力
+    :return: ループで参照される度、HTML文字列の断片を返却
+    """
+    async for chunk in _default_renderer.render_stream(markdown_content, flush_size):
+        yield chunk
+
+
+async def render_file_async(in_file_path: str, out_file_path: str):
+    """
+    イベントループを止めずに、マークダウンファイルをHTMLファイルへ変換
+
+    :param in_file_path: 入力マークダウンファイルパス
+    :param out_file_path: 出力HTMLファイルパス
+    """
+    await _default_renderer.render_file(in_file_path, out_file_path)
@@ -0,0 +1,854 @@
+import concurrent.futures
+import contextlib
+import dataclasses
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Generator, Iterable
+
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.metrics import RenderMetrics
+from a_pompom_markdown_parser.profiling import SlowDocumentLog
+from a_pompom_markdown_parser.trace import TraceRecorder, SPAN_READ, SPAN_WRITE
+from a_pompom_markdown_parser.shared_buffer import Segment, SharedArena, SegmentWriter, read_segment
+from a_pompom_markdown_parser.worker_pool import RecycleEvent, RecyclePolicy, RecyclingWorkerPool, RECYCLE_BY_TASKS, \
+    run_in_worker
+
+# 1つの単位へまとめる文書数の上限
+# 小さな文書はまとめて受け渡すことで、プロセス間の受け渡しの回数を減らす
+DEFAULT_CHUNKSIZE = 64
+# 1つの単位へまとめる文字数の上限
+# 大きな文書は単独で受け渡し、1つの単位の処理時間が突出しないようにする
+CHUNK_MAX_CHARS = 256 * 1024
+# ワーカーあたりの、同時に受け渡しておく単位の数
+# 入力を先読みしすぎてメモリを圧迫しないよう、処理中のものに加えて少しだけ先行させる
+IN_FLIGHT_PER_WORKER = 2
+# この文字数以上の単位は、pickleの代わりに共有メモリを介してワーカーへ受け渡す
+# 小さな単位では、共有メモリの確保・解放のコストが、パイプを介した複製のコストを上回る
+SHARED_MEMORY_MIN_CHARS = 1024 * 1024
+# 変換結果を受け取る領域として、入力のバイト数に対してこの倍率の大きさを確保
+# HTMLはタグ・インデントが加わるので入力より大きくなる 収まらなかった変換結果はpickleで受け渡す
+HTML_OUTPUT_RATIO = 8
+# ファイルを一括変換するとき、小さなファイルをまとめる単位のバイト数
+# これ以上の大きさのファイルは単独の単位とする
+FILE_CHUNK_BYTES = 256 * 1024
+# ファイルを先読みするスレッド数
+# ネットワーク越しのファイルシステムでは1回の読み込みを長く待つので、複数のファイルを同時に読み込んで待ち時間を重ねる
+DEFAULT_READERS = 4
+# 変換結果を書き出すスレッド数
+DEFAULT_WRITERS = 2
+# ワーカープロセスの起動方式 利用できるものを先頭から順に選ぶ
+# forkserverは、生成元のプロセスで起動時の処理を一度だけ済ませ、ワーカーはそれを複製して生成される
+# forkも同様に複製して生成されるが、スレッドを持つプロセスを複製すると、他のスレッドが獲得していたロックが解放されないままとなりうる
+WORKER_START_METHODS = ('forkserver', 'fork', 'spawn')
+# forkserverの生成元のプロセスで読み込むモジュール 読み込んだ時点でワーカーの起動時の処理を済ませる
+PRELOAD_MODULE = 'a_pompom_markdown_parser.preload'
+
+# 変換を分担するワーカーの実行方式
+# スレッド: メモリ・Rendererを共有するので受け渡しのコストは無いが、GILにより同時に変換できるのは1つのみ
+BACKEND_THREAD = 'thread'
+# プロセス: 同時に変換できるが、文書・変換結果をプロセス間で受け渡し、ワーカーごとにメモリを確保する
+BACKEND_PROCESS = 'process'
+# サブインタプリタ: 1つのプロセスの中で、GILを共有しないインタプリタごとに同時に変換する
+# モジュールはインタプリタごとに読み込まれるので、正規表現のキャッシュ・テンプレートもインタプリタごとに保持する
+BACKEND_INTERPRETER = 'interpreter'
+BACKENDS = [BACKEND_THREAD, BACKEND_PROCESS, BACKEND_INTERPRETER]
+
+# ワーカーで使い回すRenderer
+_worker_renderer: Renderer = None
+
+
+class UnsupportedBackendException(Exception):
+    """ 指定された実行方式を利用できないことを表現 """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
+
+class DuplicateOutputException(Exception):
+    """ 複数の入力ファイルの出力先が同じファイルとなることを表現 """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
+
+def prewarm_worker():
+    """
+    ワーカーで使い回すRendererを組み立て、正規表現のコンパイルなど初回の変換でのみ生じる処理を済ませておく\n
+    組み立て済みであれば何もしないので、ワーカーの起動時・変換のたびに呼び出してよい
+    """
+
+    global _worker_renderer
+    if _worker_renderer is None:
+        renderer = Renderer()
+        renderer.warm_up()
+        _worker_renderer = renderer
+
+
+def create_worker_pool(jobs: int, start_method: str = None, recycle_policy: RecyclePolicy = None) -> Executor:
+    """
+    起動時の処理を済ませたワーカープロセスを保持するExecutorを生成\n
+    forkserver・forkでは、モジュールの読み込み・正規表現のコンパイル・テンプレートの組み立てを生成元のプロセスで一度だけ済ませ、
+    各ワーカーはそれを引き継ぐ\n
+    spawnではワーカーごとに同じ処理を行うが、最初の変換を受け取る前に済ませておく
+
+    :param jobs: ワーカープロセス数
+    :param start_method: ワーカープロセスの起動方式 省略した場合は、WORKER_START_METHODSのうち利用できるものを選ぶ
+    :param recycle_policy: ワーカープロセスを入れ替える条件 省略した場合は入れ替えない
+    :return: すべてのワーカープロセスを起動済みのExecutor
+    """
+
+    if recycle_policy is not None:
+        return RecyclingWorkerPool(lambda: _create_process_pool(jobs, start_method, recycle_policy.max_tasks_per_child),
+                                   recycle_policy)
+
+    return _create_process_pool(jobs, start_method)
+
+
+def create_executor(jobs: int, backend: str = BACKEND_PROCESS, recycle_policy: RecyclePolicy = None) -> Executor:
+    """
+    実行方式と対応する、起動時の処理を済ませたワーカーを保持するExecutorを生成
+
+    :param jobs: ワーカー数
+    :param backend: ワーカーの実行方式 BACKENDSのいずれか
+    :param recycle_policy: ワーカーを入れ替える条件 プロセスでのみ利用できる
+    :return: Executor
+    """
+
+    if backend not in BACKENDS:
+        raise UnsupportedBackendException(f'実行方式: "{backend}"は無効です。{BACKENDS}のいずれかを指定してください。')
+    if recycle_policy is not None and backend != BACKEND_PROCESS:
+        raise UnsupportedBackendException(f'ワーカーの入れ替えは、実行方式: "{BACKEND_PROCESS}"でのみ利用できます。')
+
+    if backend == BACKEND_THREAD:
+        # Rendererはスレッドセーフなので、すべてのスレッドで1つを共有する
+        prewarm_worker()
+        return ThreadPoolExecutor(max_workers=jobs)
+
+    if backend == BACKEND_INTERPRETER:
+        # Python 3.14以降でのみ提供される
+        interpreter_pool_executor = getattr(concurrent.futures, 'InterpreterPoolExecutor', None)
+        if interpreter_pool_executor is None:
+            raise UnsupportedBackendException(
+                f'実行方式: "{BACKEND_INTERPRETER}"は、InterpreterPoolExecutorを提供するPython 3.14以降でのみ利用できます。')
+        executor = interpreter_pool_executor(max_workers=jobs, initializer=prewarm_worker)
+        # インタプリタも受け渡した変換の数に応じて生成されるので、ワーカー数だけ受け渡して起動を済ませておく
+        wait([executor.submit(os.getpid) for _ in range(jobs)])
+        return executor
+
+    return create_worker_pool(jobs, recycle_policy=recycle_policy)
+
+
+def _create_process_pool(jobs: int, start_method: str = None, max_tasks_per_child: int = None) -> ProcessPoolExecutor:
+    """
+    起動時の処理を済ませたワーカープロセスを保持するProcessPoolExecutorを生成
+
+    :param jobs: ワーカープロセス数
+    :param start_method: ワーカープロセスの起動方式 省略した場合は、WORKER_START_METHODSのうち利用できるものを選ぶ
+    :param max_tasks_per_child: ワーカープロセスが処理する変換の数の上限 上限に達したワーカーは新たなワーカーと入れ替える
+    :return: すべてのワーカープロセスを起動済みのExecutor
+    """
+
+    if start_method is None:
+        available_methods = multiprocessing.get_all_start_methods()
+        # fork方式では、変換の数に応じてワーカーを入れ替えられない
+        if max_tasks_per_child is not None:
+            available_methods = [method for method in available_methods if method != 'fork']
+        start_method = next(method for method in WORKER_START_METHODS if method in available_methods)
+    context = multiprocessing.get_context(start_method)
+
+    if start_method == 'forkserver':
+        # 生成元のプロセスが起動済みの場合は反映されないが、その場合も各ワーカーが起動時に済ませるので変換結果は変わらない
+        context.set_forkserver_preload([PRELOAD_MODULE])
+    elif start_method == 'fork':
+        prewarm_worker()
+
+    executor = ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=prewarm_worker,
+                                   max_tasks_per_child=max_tasks_per_child)
+    # ワーカープロセスは受け渡した変換の数に応じて起動されるので、ワーカー数だけ受け渡して起動を済ませておく
+    # 最初の変換がワーカーの起動を待たずに済み、fork方式でも変換用のスレッドを生成する前に複製を終えられる
+    # 起動のための呼び出しも変換の数に含まれるので、ワーカーが数える変換の数と一致させる
+    wait([executor.submit(run_in_worker, os.getpid, False) for _ in range(jobs)])
+
+    return executor
+
+
+def split_to_chunks(markdown_contents: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE,
+                    max_chars: int = CHUNK_MAX_CHARS) -> Generator[list[str], None, None]:
+    """
+    入力の文書を、文書数・文字数の上限を超えない単位へまとめる 入力の順序は保つ
+
+    :param markdown_contents: マークダウン文字列 ジェネレータも受け付ける
+    :param chunksize: 1つの単位へまとめる文書数の上限
+    :param max_chars: 1つの単位へまとめる文字数の上限 上限を超える文書は単独の単位とする
+    :return: ループで参照される度、1つの単位を返却
+    """
+
+    chunk = []
+    chunk_chars = 0
+
+    for markdown_content in markdown_contents:
+        if chunk and (len(chunk) >= chunksize or chunk_chars + len(markdown_content) > max_chars):
+            yield chunk
+            chunk = []
+            chunk_chars = 0
+
+        chunk.append(markdown_content)
+        chunk_chars += len(markdown_content)
+
+    if chunk:
+        yield chunk
+
+
+def render_timed_chunk(chunk: list[str]) -> list[tuple[str, float]]:
+    """
+    ワーカーで、まとめた文書をHTML文字列へ変換し、文書ごとの変換にかかった時間を添える
+
+    :param chunk: マークダウン文字列のリスト
+    :return: HTML文字列と、変換にかかった時間[s]の組のリスト
+    """
+
+    prewarm_worker()
+    results = []
+    for markdown_content in chunk:
+        start = time.perf_counter()
+        html_text = _worker_renderer.render(markdown_content)
+        results.append((html_text, time.perf_counter() - start))
+
+    return results
+
+
+def render_traced_chunk(chunk: list[str], documents: list[str]) -> tuple[list[tuple[str, float]], list[dict]]:
+    """
+    ワーカーで、まとめた文書を区間を記録しながらHTML文字列へ変換\n
+    記録したイベントは変換結果とともに返却し、呼び出し元の記録先へ統合する
+
+    :param chunk: マークダウン文字列のリスト
+    :param documents: 文書ごとの、区間へ添える文書名
+    :return: HTML文字列と変換にかかった時間[s]の組のリストと、記録したイベント
+    """
+
+    prewarm_worker()
+    trace = TraceRecorder()
+    # スレッドで変換する場合は呼び出し元と同じプロセスなので、スレッドにのみ名前を付ける
+    if multiprocessing.parent_process() is not None:
+        trace.name_process(f'worker {os.getpid()}')
+    trace.name_thread('worker')
+
+    results = []
+    for markdown_content, document in zip(chunk, documents):
+        start = time.perf_counter()
+        html_text = _worker_renderer.render(markdown_content, trace=trace.for_document(document))
+        results.append((html_text, time.perf_counter() - start))
+
+    return results, trace.events
+
+
+def render_shared_chunk(input_segments: list[Segment], output_segment: Segment) -> list[tuple[Segment | str, float]]:
+    """
+    ワーカーで、共有メモリに配置された文書をHTML文字列へ変換し、変換結果を共有メモリの出力領域へ書き込む
+
+    :param input_segments: 文書ごとの、UTF-8のマークダウン文字列を配置した領域
+    :param output_segment: 変換結果を書き込む領域
+    :return: 変換結果を書き込んだ領域と、変換にかかった時間[s]の組のリスト 領域に収まらない変換結果はHTML文字列のまま返却
+    """
+
+    prewarm_worker()
+    results = []
+    with SegmentWriter(output_segment) as writer:
+        for input_segment in input_segments:
+            start = time.perf_counter()
+            html_text = _worker_renderer.render(read_segment(input_segment).decode('utf-8'))
+            elapsed = time.perf_counter() - start
+            results.append((writer.write(html_text.encode('utf-8')) or html_text, elapsed))
+
+    return results
+
+
+def _submit_chunk(executor: Executor, chunk: list[str],
+                  shared_memory_min_chars: int = SHARED_MEMORY_MIN_CHARS) -> tuple[Future, SharedArena]:
+    """
+    まとめた文書の変換をワーカーへ委譲 大きな単位は共有メモリを介して受け渡す
+
+    :param executor: 変換を委譲するExecutor
+    :param chunk: マークダウン文字列のリスト
+    :param shared_memory_min_chars: この文字数以上の単位は共有メモリを介して受け渡す 0以下の場合は常にpickleで受け渡す
+    :return: 変換結果を表すFutureと、受け渡しに用いた共有メモリ pickleで受け渡した場合はNone
+    """
+
+    chunk_chars = sum(len(markdown_content) for markdown_content in chunk)
+    if shared_memory_min_chars <= 0 or chunk_chars < shared_memory_min_chars:
+        return executor.submit(render_timed_chunk, chunk), None
+
+    encoded_contents = [markdown_content.encode('utf-8') for markdown_content in chunk]
+    input_size = sum(len(encoded_content) for encoded_content in encoded_contents)
+    # 共有メモリは書き込んだページのみ実際に割り当てられるので、出力領域を大きめに確保しても使わなかった分は消費しない
+    arena = SharedArena(input_size * (1 + HTML_OUTPUT_RATIO))
+    try:
+        input_segments = [arena.write(encoded_content) for encoded_content in encoded_contents]
+        output_segment = arena.allocate(input_size * HTML_OUTPUT_RATIO)
+        return executor.submit(render_shared_chunk, input_segments, output_segment), arena
+    except Exception:
+        arena.close()
+        raise
+
+
+def _receive_chunk(future: Future, arena: SharedArena = None) -> list[tuple[str, float]]:
+    """
+    ワーカーへ委譲した変換の結果を受け取り、受け渡しに用いた共有メモリを解放
+
+    :param future: 変換結果を表すFuture
+    :param arena: 受け渡しに用いた共有メモリ pickleで受け渡した場合はNone
+    :return: HTML文字列と、変換にかかった時間[s]の組のリスト
+    """
+
+    try:
+        results = future.result()
+        if arena is None:
+            return results
+
+        return [(arena.read(html_text).decode('utf-8') if isinstance(html_text, tuple) else html_text, elapsed)
+                for html_text, elapsed in results]
+    finally:
+        if arena is not None:
+            arena.close()
+
+
+class BatchRenderer:
+    """ 多数の文書を複数のプロセスで分担して変換することを責務に持つ """
+
+    def __init__(self, jobs: int = None, executor: Executor = None,
+                 shared_memory_min_chars: int = SHARED_MEMORY_MIN_CHARS, recycle_policy: RecyclePolicy = None,
+                 backend: str = BACKEND_PROCESS):
+        self._jobs = jobs or os.cpu_count() or 1
+        # 自身がワーカーを生成する場合の、ワーカーの実行方式と、ワーカープロセスを入れ替える条件
+        self._backend = backend
+        self._recycle_policy = recycle_policy
+        # この文字数以上の単位は、共有メモリを介してワーカーへ受け渡す
+        # スレッドは受け渡す文書をそのまま参照できるので、共有メモリへ複製しない
+        self._shared_memory_min_chars = shared_memory_min_chars if backend != BACKEND_THREAD else 0
+        # 呼び出し元から渡されたExecutorは呼び出し元が終了させる
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._serial_renderer = Renderer()
+
+    def render_many(self, markdown_contents: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE,
+                    ordered: bool = True) -> Generator[str, None, None]:
+        """
+        複数のマークダウン文字列をHTML文字列へ変換\n
+        入力は少しずつ読み込むので、ジェネレータを渡せばすべての文書を保持せずに済む
+
+        :param markdown_contents: マークダウン文字列 ジェネレータも受け付ける
+        :param chunksize: ワーカーへまとめて受け渡す文書数の上限
+        :param ordered: Trueの場合は入力と同じ順で、Falseの場合は変換を終えた順で出力
+        :return: ループで参照される度、HTML文字列を返却
+        """
+
+        # ワーカーが1つであればプロセス間の受け渡しは不要 ただし、ワーカーを入れ替えるにはプロセスを分ける必要がある
+        if self._jobs == 1 and self._executor is None and self._recycle_policy is None:
+            for markdown_content in markdown_contents:
+                yield self._serial_renderer.render(markdown_content)
+            return
+
+        executor = self._get_executor()
+        chunks = enumerate(split_to_chunks(markdown_contents, chunksize))
+        max_in_flight = self._jobs * IN_FLIGHT_PER_WORKER
+
+        # 処理中の単位 Futureをキーに、入力中の位置と、受け渡しに用いた共有メモリを保持
+        in_flight: dict[Future, tuple[int, SharedArena]] = {}
+        # 順序を保つとき、先に変換を終えた単位を、出力する順が来るまで保持
+        # 保持している単位も処理中の単位と合わせて数え、先頭の単位が遅れている間に入力を読み込み続けないようにする
+        reorder_buffer: dict[int, list[str]] = {}
+        next_index = 0
+        is_exhausted = False
+
+        try:
+            while True:
+                # 処理中・出力待ちの単位が上限に達するまで、入力を読み込んで受け渡す
+                while not is_exhausted and len(in_flight) + len(reorder_buffer) < max_in_flight:
+                    entry = next(chunks, None)
+                    if entry is None:
+                        is_exhausted = True
+                        break
+                    index, chunk = entry
+                    future, arena = _submit_chunk(executor, chunk, self._shared_memory_min_chars)
+                    in_flight[future] = (index, arena)
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, arena = in_flight.pop(future)
+                    html_texts = [html_text for html_text, _ in _receive_chunk(future, arena)]
+                    if not ordered:
+                        yield from html_texts
+                        continue
+                    reorder_buffer[index] = html_texts
+
+                while next_index in reorder_buffer:
+                    yield from reorder_buffer.pop(next_index)
+                    next_index += 1
+        finally:
+            # 出力を最後まで参照せずに打ち切られた場合、未着手の単位は変換しない
+            for future, (_, arena) in in_flight.items():
+                future.cancel()
+                if arena is not None:
+                    arena.close()
+
+    def _get_executor(self) -> Executor:
+        """
+        ワーカーを保持するExecutorを取得 初めて利用するときに生成
+
+        :return: Executor
+        """
+        if self._executor is None:
+            self._executor = create_executor(self._jobs, self._backend, self._recycle_policy)
+
+        return self._executor
+
+    def close(self):
+        """
+        自身が生成したワーカープロセスを終了
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> 'BatchRenderer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_many(markdown_contents: Iterable[str], jobs: int = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                ordered: bool = True, backend: str = BACKEND_PROCESS) -> Generator[str, None, None]:
+    """
+    複数のマークダウン文字列をHTML文字列へ変換 ワーカーは変換を終えた時点で終了
+
+    :param markdown_contents: マークダウン文字列 ジェネレータも受け付ける
+    :param jobs: ワーカー数 省略した場合はCPU数
+    :param chunksize: ワーカーへまとめて受け渡す文書数の上限
+    :param ordered: Trueの場合は入力と同じ順で、Falseの場合は変換を終えた順で出力
+    :param backend: ワーカーの実行方式 BACKENDSのいずれか
+    :return: ループで参照される度、HTML文字列を返却
+    """
+
+    with BatchRenderer(jobs, backend=backend) as batch_renderer:
+        yield from batch_renderer.render_many(markdown_contents, chunksize, ordered)
+
+
+@dataclasses.dataclass
+class BatchTask:
+    """ ワーカーへ受け渡す、1つ以上のファイルからなる変換単位を表現することを責務に持つ """
+
+    # 入力ファイルパスと出力ファイルパスの組
+    files: list[tuple[str, str]]
+    # 入力ファイルの合計バイト数
+    size: int
+
+
+@dataclasses.dataclass
+class BatchReport:
+    """ ファイルの一括変換にかかった時間の内訳を表現することを責務に持つ """
+
+    # ワーカー数
+    jobs: int
+    # 変換したファイル数
+    file_count: int
+    # 変換単位の数
+    task_count: int
+    # 一括変換を始めてから終えるまでの時間[s]
+    wall_time: float
+    # すべての変換単位の処理時間の合計[s] ワーカーが常に処理を続けた場合、wall_time = total_work / jobs となる
+    total_work: float
+    # 最も時間のかかった変換単位の処理時間[s] wall_timeはこれより短くならない
+    longest_task: float
+    # いずれかのワーカーが受け取る変換単位を失ってから、すべての変換を終えるまでの時間[s]
+    tail_time: float
+    # ファイルごとの変換時間[s] 読み書きの時間は含まない 長いものから順に並べる
+    file_times: list[tuple[str, float]]
+    # 読み込みスレッド・書き出しスレッドが、ファイルの読み書きに費やした時間の合計[s] 変換と重ねて進めるので、wall_timeには直接加わらない
+    read_time: float = 0.0
+    write_time: float = 0.0
+    # ワーカープロセスを入れ替えた履歴
+    recycle_events: list[RecycleEvent] = dataclasses.field(default_factory=list)
+    # 変換時間が閾値を超えたため保存した文書のファイルパス
+    slow_captures: list[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def ideal_time(self) -> float:
+        """ ワーカーが常に処理を続けた場合の時間[s] """
+        return max(self.total_work / self.jobs, self.longest_task)
+
+    def format(self, slowest_count: int = 5) -> str:
+        """
+        内訳を人が読める形の文字列へ変換
+
+        :param slowest_count: 処理時間の長いファイルを出力する件数
+        :return: 内訳を表現する文字列
+        """
+
+        times = sorted(elapsed for _, elapsed in self.file_times)
+        percentile = lambda p: times[min(len(times) - 1, int(len(times) * p))] if times else 0.0
+
+        lines = [
+            f'files: {self.file_count}, tasks: {self.task_count}, jobs: {self.jobs}',
+            f'wall: {self.wall_time:.3f}s, ideal: {self.ideal_time:.3f}s '
+            f'(total work {self.total_work:.3f}s / {self.jobs}, longest task {self.longest_task:.3f}s)',
+            f'tail: {self.tail_time:.3f}s (from first idle worker to finish)',
+            f'io: read {self.read_time:.3f}s, write {self.write_time:.3f}s (overlapped with rendering)',
+            f'recycled workers: {len(self.recycle_events)} '
+            f'(tasks: {sum(event.reason == RECYCLE_BY_TASKS for event in self.recycle_events)}, '
+            f'memory: {sum(event.reason != RECYCLE_BY_TASKS for event in self.recycle_events)})',
+            f'slow documents captured: {len(self.slow_captures)}',
+            f'per file: p50 {percentile(0.5) * 1000:.1f}ms, p90 {percentile(0.9) * 1000:.1f}ms, '
+            f'p99 {percentile(0.99) * 1000:.1f}ms, max {percentile(1.0) * 1000:.1f}ms',
+            'slowest:',
+        ]
+        lines += [f'  {elapsed * 1000:>10.1f}ms {path}' for path, elapsed in self.file_times[:slowest_count]]
+
+        return '\n'.join(lines)
+
+
+def plan_batch_tasks(in_file_paths: list[str], out_dir: str, chunk_bytes: int = FILE_CHUNK_BYTES) -> list[BatchTask]:
+    """
+    入力ファイルの大きさをもとに変換単位を組み立て、大きいものから順に並べる\n
+    大きなファイルを先に受け渡すことで、最後に受け渡した大きなファイルだけが処理を続け、
+    他のワーカーが待機し続ける事態を避ける\n
+    小さなファイルは合計がchunk_bytesに達するまでまとめ、プロセス間の受け渡しの回数を減らす
+
+    :param in_file_paths: 入力マークダウンファイルパス
+    :param out_dir: 出力先ディレクトリ 出力ファイル名は入力ファイル名の拡張子を.htmlとしたもの
+    :param chunk_bytes: 小さなファイルをまとめる単位のバイト数
+    :return: 大きいものから順に並べた変換単位
+    """
+
+    # 別のディレクトリにある同名のファイルは、互いの出力を上書きしてしまうので変換を始める前に受け付けない
+    out_file_paths = {}
+    for path in in_file_paths:
+        out_file_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.html')
+        if out_file_path in out_file_paths:
+            raise DuplicateOutputException(
+                f'入力ファイル: "{out_file_paths[out_file_path]}", "{path}"の出力先: "{out_file_path}"が重複しています。')
+        out_file_paths[out_file_path] = path
+    out_file_path_of = {path: out_file_path for out_file_path, path in out_file_paths.items()}
+
+    sized_files = sorted(((os.path.getsize(path), path) for path in in_file_paths), reverse=True)
+
+    tasks = []
+    chunk = BatchTask(files=[], size=0)
+    for size, path in sized_files:
+        out_file_path = out_file_path_of[path]
+
+        if size >= chunk_bytes:
+            tasks.append(BatchTask(files=[(path, out_file_path)], size=size))
+            continue
+
+        chunk.files.append((path, out_file_path))
+        chunk.size += size
+        if chunk.size >= chunk_bytes:
+            tasks.append(chunk)
+            chunk = BatchTask(files=[], size=0)
+
+    if chunk.files:
+        tasks.append(chunk)
+
+    # まとめた単位も含め、大きいものから順に受け渡す
+    return sorted(tasks, key=lambda task: task.size, reverse=True)
+
+
+class FilePipeline:
+    """
+    ファイルの読み込み・変換・書き出しを、別々の段で並行して進めることを責務に持つ\n
+    読み込みスレッド → 変換ワーカー → 書き出しスレッド の順に変換単位を受け渡すので、
+    ファイルの読み書きを待つ間も変換を止めずに済む\n
+    段の間で保持する変換単位の数には上限を設け、読み込みが変換より速くてもメモリを使い切らないようにする\n
+    区間の記録先を渡した場合、読み込み・書き出し・ワーカーでの変換を区間として記録する
+    ワーカーで記録したイベントは変換結果とともに受け取るので、共有メモリは利用しない
+
+    1つのインスタンスは1回の一括変換にのみ利用する
+    """
+
+    def __init__(self, executor: Executor, max_in_flight: int, readers: int = DEFAULT_READERS,
+                 writers: int = DEFAULT_WRITERS, shared_memory_min_chars: int = SHARED_MEMORY_MIN_CHARS,
+                 trace: TraceRecorder = None):
+        self._executor = executor
+        self._shared_memory_min_chars = shared_memory_min_chars
+        # 区間の記録先 省略した場合は記録しない
+        self._trace = trace
+        self._readers = readers
+        self._writers = writers
+        # 読み込む前の変換単位
+        self._task_queue: queue.Queue[BatchTask] = queue.Queue()
+        # 読み込みを終え、変換を待つ変換単位とその内容 読み込みスレッドの終了はNoneで表現
+        self._read_queue: queue.Queue = queue.Queue(maxsize=max_in_flight)
+        # 変換を委譲し、書き出しを待つ変換単位・変換結果を表すFuture・受け渡しに用いた共有メモリ
+        # 書き出しスレッドの終了はNoneで表現
+        self._write_queue: queue.Queue = queue.Queue()
+        # 変換へ受け渡してから書き出し終えるまでの変換単位の数を制限
+        # 書き出しを待つキューは上限を持たないので、代わりにここで制限する
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        # いずれかの段で例外が送出された場合、以降の読み込み・変換を打ち切る
+        self._stop = threading.Event()
+        self._error: Exception = None
+        self._lock = threading.Lock()
+
+        self._start = 0.0
+        # 変換単位ごとに、書き出しを終えた時点[s]
+        self.finished_at: list[float] = []
+        # 変換単位ごとの変換時間の合計[s]
+        self.task_times: list[float] = []
+        # 入力ファイルパスと、変換にかかった時間[s]の組
+        self.file_times: list[tuple[str, float]] = []
+        # すべての読み込みスレッド・書き出しスレッドが、読み書きに費やした時間の合計[s]
+        self.read_time = 0.0
+        self.write_time = 0.0
+
+    def run(self, tasks: list[BatchTask]):
+        """
+        変換単位を並べた順に読み込み、変換してから書き出す すべての変換単位を書き出すまで待機
+
+        :param tasks: 変換単位 先頭から順に読み込みを始める
+        """
+
+        self._start = time.perf_counter()
+        for task in tasks:
+            self._task_queue.put(task)
+        if self._trace is not None:
+            self._trace.name_process('batch')
+
+        readers = [threading.Thread(target=self._read, name=f'reader {index}', daemon=True)
+                   for index in range(max(1, min(self._readers, len(tasks))))]
+        writers = [threading.Thread(target=self._write, name=f'writer {index}', daemon=True)
+                   for index in range(self._writers)]
+        for thread in readers + writers:
+            thread.start()
+
+        self._dispatch(len(readers))
+
+        for _ in writers:
+            self._write_queue.put(None)
+        for thread in readers + writers:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _read(self):
+        """
+        読み込みスレッドで、変換単位のファイルを読み込み、変換を待つキューへ受け渡す
+        """
+
+        self._name_thread()
+        try:
+            while not self._stop.is_set():
+                try:
+                    task = self._task_queue.get_nowait()
+                except queue.Empty:
+                    return
+
+                start = time.perf_counter()
+                with self._span(SPAN_READ, task):
+                    contents = []
+                    for in_file_path, _ in task.files:
+                        with open(in_file_path, 'r') as f:
+                            contents.append(f.read())
+                elapsed = time.perf_counter() - start
+
+                with self._lock:
+                    self.read_time += elapsed
+                # 変換が追いついていなければ、キューに空きができるまで待機
+                self._read_queue.put((task, contents))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._read_queue.put(None)
+
+    def _dispatch(self, reader_count: int):
+        """
+        読み込みを終えた変換単位を変換ワーカーへ委譲し、書き出しを待つキューへ受け渡す\n
+        すべての読み込みスレッドが終了するまで、キューから取り出し続ける
+
+        :param reader_count: 読み込みスレッドの数
+        """
+
+        finished_readers = 0
+        while finished_readers < reader_count:
+            item = self._read_queue.get()
+            if item is None:
+                finished_readers += 1
+                continue
+
+            # 打ち切った後も、読み込みスレッドが待機し続けないよう、キューからは取り出し続ける
+            if self._stop.is_set():
+                continue
+
+            task, contents = item
+            # 書き出しが追いついていなければ、書き出しを終えるまで待機
+            self._in_flight.acquire()
+            try:
+                if self._trace is not None:
+                    future, arena = self._executor.submit(
+                        render_traced_chunk, contents, [in_file_path for in_file_path, _ in task.files]), None
+                else:
+                    future, arena = _submit_chunk(self._executor, contents, self._shared_memory_min_chars)
+            except Exception as e:
+                self._in_flight.release()
+                self._fail(e)
+                continue
+            self._write_queue.put((task, future, arena))
+
+    def _write(self):
+        """
+        書き出しスレッドで、変換を終えた変換単位を書き出す
+        """
+
+        self._name_thread()
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+
+            task, future, arena = item
+            try:
+                if self._trace is not None:
+                    results, events = future.result()
+                    self._trace.extend(events)
+                else:
+                    results = _receive_chunk(future, arena)
+                if self._stop.is_set():
+                    continue
+
+                start = time.perf_counter()
+                with self._span(SPAN_WRITE, task):
+                    for (_, out_file_path), (html_text, _) in zip(task.files, results):
+                        with open(out_file_path, 'w') as fw:
+                            fw.write(html_text)
+                elapsed = time.perf_counter() - start
+
+                with self._lock:
+                    self.write_time += elapsed
+                    self.finished_at.append(time.perf_counter() - self._start)
+                    self.task_times.append(sum(render_time for _, render_time in results))
+                    self.file_times += [(in_file_path, render_time)
+                                        for (in_file_path, _), (_, render_time) in zip(task.files, results)]
+            except Exception as e:
+                self._fail(e)
+            finally:
+                self._in_flight.release()
+
+    def _name_thread(self):
+        """
+        区間を記録する場合、呼び出したスレッドへ名前を付ける
+        """
+
+        if self._trace is not None:
+            self._trace.name_thread(threading.current_thread().name)
+
+    def _span(self, name: str, task: BatchTask) -> contextlib.AbstractContextManager:
+        """
+        変換単位の読み書きを記録する区間を生成 区間を記録しない場合は何もしない
+
+        :param name: 区間の名前
+        :param task: 変換単位
+        :return: withブロックの処理を区間として記録するコンテキストマネージャ
+        """
+
+        if self._trace is None:
+            return contextlib.nullcontext()
+
+        return self._trace.span(name, files=[in_file_path for in_file_path, _ in task.files])
+
+    def _fail(self, error: Exception):
+        """
+        最初に送出された例外を保持し、以降の読み込み・変換を打ち切る
+
+        :param error: 送出された例外
+        """
+
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+
+def convert_files(in_file_paths: list[str], out_dir: str, jobs: int = None,
+                  chunk_bytes: int = FILE_CHUNK_BYTES, executor: Executor = None,
+                  readers: int = DEFAULT_READERS, writers: int = DEFAULT_WRITERS,
+                  recycle_policy: RecyclePolicy = None, backend: str = None,
+                  slow_log: SlowDocumentLog = None, trace: TraceRecorder = None,
+                  metrics: RenderMetrics = None) -> BatchReport:
+    """
+    複数のマークダウンファイルを、大きなものから順に複数のプロセスで変換\n
+    ファイルの読み書きは別のスレッドで行い、変換と重ねて進める
+
+    :param in_file_paths: 入力マークダウンファイルパス
+    :param out_dir: 出力先ディレクトリ
+    :param jobs: ワーカープロセス数 省略した場合はCPU数
+    :param chunk_bytes: 小さなファイルをまとめる単位のバイト数
+    :param executor: 変換を委譲するExecutor 省略した場合はワーカーを生成
+    :param readers: ファイルを先読みするスレッド数
+    :param writers: 変換結果を書き出すスレッド数
+    :param recycle_policy: ワーカープロセスを入れ替える条件 executorを渡した場合は利用しない
+    :param backend: ワーカーの実行方式 BACKENDSのいずれか executorを渡した場合は利用しない
+                    省略した場合は、ワーカーが1つで入れ替えない場合はthread、それ以外はprocess
+    :param slow_log: 変換時間が閾値を超えた文書の保存先 省略した場合は保存しない
+    :param trace: 読み込み・書き出し・ワーカーでの変換を区間として記録する記録先 省略した場合は記録しない
+    :param metrics: ファイルごとの変換時間・ワーカーの入れ替えの記録先 省略した場合は記録しない
+    :return: 処理時間の内訳
+    """
+
+    jobs = jobs or os.cpu_count() or 1
+    tasks = plan_batch_tasks(in_file_paths, out_dir, chunk_bytes)
+
+    owns_executor = executor is None
+    if executor is None:
+        # ワーカーが1つであればプロセス間の受け渡しは不要 ファイルの読み書きはGILを解放するので、スレッドでも変換と重ねられる
+        # ただし、ワーカーを入れ替えるにはプロセスを分ける必要がある 実行方式を指定された場合はそれに従う
+        if backend is None:
+            backend = BACKEND_THREAD if jobs == 1 and recycle_policy is None else BACKEND_PROCESS
+        executor = create_executor(jobs, backend, recycle_policy)
+    # スレッドは受け渡す文書をそのまま参照できるので、共有メモリへ複製しない
+    shared_memory_min_chars = 0 if isinstance(executor, ThreadPoolExecutor) else SHARED_MEMORY_MIN_CHARS
+    pipeline = FilePipeline(executor, jobs * IN_FLIGHT_PER_WORKER, readers, writers, shared_memory_min_chars, trace)
+    try:
+        start = time.perf_counter()
+        pipeline.run(tasks)
+        wall_time = time.perf_counter() - start
+    finally:
+        if owns_executor:
+            executor.shutdown()
+
+    # 残りの変換単位がワーカー数を下回った時点で、いずれかのワーカーは受け取る変換単位を失う
+    finished_at = sorted(pipeline.finished_at)
+    first_idle_index = len(tasks) - jobs
+    tail_time = wall_time - finished_at[first_idle_index] if first_idle_index >= 0 else wall_time
+
+    # 閾値を超えるのは一部の文書に限られるので、変換を終えてから読み直して保存する
+    slow_captures = []
+    if slow_log is not None:
+        for in_file_path, elapsed in pipeline.file_times:
+            if elapsed > slow_log.threshold:
+                with open(in_file_path, 'r') as f:
+                    slow_captures.append(slow_log.capture(f.read(), elapsed, source=in_file_path))
+
+    recycle_events = executor.events if isinstance(executor, RecyclingWorkerPool) else []
+    if metrics is not None:
+        for in_file_path, elapsed in pipeline.file_times:
+            metrics.observe_render(elapsed, os.path.getsize(in_file_path))
+        for event in recycle_events:
+            metrics.count_recycle(event.reason)
+
+    return BatchReport(jobs=jobs, file_count=len(in_file_paths), task_count=len(tasks), wall_time=wall_time,
+                       total_work=sum(pipeline.task_times), longest_task=max(pipeline.task_times, default=0.0),
+                       tail_time=tail_time,
+                       file_times=sorted(pipeline.file_times, key=lambda file_time: file_time[1], reverse=True),
+                       read_time=pipeline.read_time, write_time=pipeline.write_time,
+                       recycle_events=recycle_events, slow_captures=slow_captures)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+# 変換を打ち切った段階
+STAGE_PARSE = 'parse'
+STAGE_CONVERT = 'convert'
+STAGE_BUILD = 'build'
+
+
+class RenderCancelledException(Exception):
+    """ 変換が取り消された、もしくは制限時間を超えたことを表現 """
+
+    def __init__(self, message: str, stage: str, line_number: int = None):
+        self.message = message
+        # 打ち切った段階 STAGE_PARSE・STAGE_CONVERT・STAGE_BUILDのいずれか
+        self.stage = stage
+        # 打ち切る直前に処理した行番号(1始まり) 行と対応しない段階で打ち切った場合はNone
+        self.line_number = line_number
+        super().__init__(message)
+
+
+class CancellationToken:
+    """
+    変換の取り消し・制限時間を表現することを責務に持つ\n
+    パーサ・コンバータ・ビルダは、行・Block要素を1つ処理するたびにcheckを呼び出し、取り消されていれば変換を打ち切る\n
+    1行のInline要素のパース処理では、前後の文字列を分割するたびにも確認する\n
+    ただし、1回の正規表現の評価の途中では打ち切れないので、制限時間を超えたことは、その評価を終えた時点で判明する
+
+    1つのトークンは1回の変換にのみ利用する 取り消しは他のスレッドから行ってよい
+    """
+
+    def __init__(self, timeout: float = None):
+        # 制限時間の期限 省略した場合は取り消されるまで打ち切らない
+        self._deadline = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+        self._error: RenderCancelledException = None
+
+    @property
+    def error(self) -> RenderCancelledException:
+        """ 変換を打ち切ったときに送出した例外 打ち切っていない場合はNone """
+        return self._error
+
+    def cancel(self):
+        """
+        変換を取り消す 次にcheckを呼び出した時点で打ち切られる
+        """
+        self._cancelled.set()
+
+    def check(self, stage: str, line_number: int = None):
+        """
+        取り消された、もしくは制限時間を超えていれば、変換を打ち切るための例外を送出
+
+        :param stage: 呼び出し元の段階
+        :param line_number: 直前に処理した行番号(1始まり) 行と対応しない段階では省略
+        """
+
+        if self._cancelled.is_set():
+            message = '変換が取り消されました。'
+        elif self._deadline is not None and time.monotonic() > self._deadline:
+            message = '変換が制限時間を超えました。'
+        else:
+            return
+
+        if line_number is not None:
+            message += f' {line_number}行目'
+
+        self._error = RenderCancelledException(message, stage, line_number)
+        raise self._error
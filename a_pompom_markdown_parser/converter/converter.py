@@ -1,67 +1,122 @@
-from typing import Generator, Literal
+from typing import Generator, Iterable
 
-from a_pompom_markdown_parser.element.block import Block, ParseResult, CodeBlock, CodeChildBlock, TableOfContentsBlock
+from a_pompom_markdown_parser.cancellation import CancellationToken, STAGE_CONVERT
+from a_pompom_markdown_parser.element.block import Block, ParseResult, HeadingBlock, TableOfContentsBlock
 from a_pompom_markdown_parser.converter.block_converter import BlockConverter
 from a_pompom_markdown_parser.converter.toc_converter import TocConverter
+from a_pompom_markdown_parser.limits import Limits, NO_LIMITS
+from a_pompom_markdown_parser.trace import TraceRecorder, SPAN_TOC
 
 
 class Converter:
     """ 複数行におよぶBlock要素をHTMLタグと対応した形へ変換することを責務に持つ """
 
-    def __init__(self):
+    def __init__(self, limits: Limits = None):
         self._block_converter = BlockConverter()
-        self._toc_converter = TocConverter()
+        # 目次の階層の上限のみ参照 省略した場合は上限を設けない
+        self._toc_converter = TocConverter((limits or NO_LIMITS).max_toc_depth)
 
-    def convert(self, markdown_result: ParseResult) -> ParseResult:
+    def convert(self, markdown_result: ParseResult, token: CancellationToken = None,
+                trace: TraceRecorder = None) -> ParseResult:
         """
         ビルダの責務を小さくするため、マークダウンのパース結果をビルダが解釈しやすい形へ変換
 
         :param markdown_result: 変換対象のマークダウンパース結果
+        :param token: 変換の取り消し・制限時間 変換単位を変換するたびに確認
+        :param trace: 区間の記録先 目次の組み立てを記録 省略した場合は記録しない
         :return: 変換結果
         """
-        convert_result_content = []
+        # 目次は変換を終えた時点でTableOfContentsBlockの子要素が目次の実体となるので、まとめて変換してから展開する
+        convert_result_content = list(self.convert_iter(markdown_result.content, token, trace))
+
+        return ParseResult(content=self._expand_table_of_contents(convert_result_content))
+
+    def convert_iter(self, blocks: Iterable[Block], token: CancellationToken = None,
+                     trace: TraceRecorder = None) -> Generator[Block, None, None]:
+        """
+        マークダウンのパース結果を先頭から順に変換し、変換単位ごとに出力\n
+        目次はすべてのヘッダを参照しないと組み立てられないので、目次の位置には空のTableOfContentsBlockを出力しておき、
+        入力をすべて変換し終えた時点で、その子要素へ目次の実体を表現するBlock要素を格納する
+
+        :param blocks: マークダウンのパース結果 ジェネレータも受け付ける
+        :param token: 変換の取り消し・制限時間 変換単位を変換するたびに確認
+        :param trace: 区間の記録先 目次の組み立てを記録 省略した場合は記録しない
+        :return: ループで参照される度、変換結果のBlock要素を返却
+        """
+
+        header_list = []
+        placeholders = []
 
         # 変換結果を同種のBlock単位へ分割してから変換
         # こうすることで、コンバータはただ入力を統合したものを出力するだけでよい
-        for convert_target in split_to_convert_target(markdown_result.content):
+        for convert_target in split_to_convert_target(blocks):
+            if token is not None:
+                token.check(STAGE_CONVERT)
+            header_list += [block for block in convert_target if isinstance(block, HeadingBlock)]
+
             # 目次
             if self._toc_converter.is_target(convert_target):
-                convert_result_content += self._toc_converter.convert(markdown_result)
+                placeholder = TableOfContentsBlock(children=[])
+                placeholders.append(placeholder)
+                yield placeholder
+                continue
+
+            yield from self._block_converter.convert(convert_target)
+
+        if not placeholders:
+            return
+
+        if trace is not None:
+            with trace.span(SPAN_TOC, headings=len(header_list)):
+                table_of_contents = self._toc_converter.generate(header_list)
+        else:
+            table_of_contents = self._toc_converter.generate(header_list)
+        for placeholder in placeholders:
+            placeholder.children = table_of_contents
+
+    def _expand_table_of_contents(self, blocks: list[Block]) -> list[Block]:
+        """
+        目次の位置に出力したTableOfContentsBlockを、子要素である目次の実体で置き換え
+
+        :param blocks: 変換結果のBlock要素
+        :return: 目次の実体を展開したBlock要素
+        """
+
+        expanded = []
+        for block in blocks:
+            if isinstance(block, TableOfContentsBlock):
+                expanded += block.children
                 continue
 
-            convert_result_content += self._block_converter.convert(convert_target)
+            expanded.append(block)
 
-        return ParseResult(content=convert_result_content)
+        return expanded
 
 
-def split_to_convert_target(blocks: list[Block]) -> Generator[list[Block], None, None]:
+def split_to_convert_target(blocks: Iterable[Block]) -> Generator[list[Block], None, None]:
     """
     マークダウンの変換結果をコンバータの変換単位へ分割
 
-    :param blocks: マークダウンの変換結果
+    :param blocks: マークダウンの変換結果 ジェネレータも受け付ける
     :return: ループで参照される度、1つのコンバータ変換単位を返却
     """
 
-    # 開始・終了のインデックスでリストを分割していくことで、サブリストを生成し、毎回初期化するような
-    # 煩雑な処理が要らなくなる
-    start = 0
-    end = 0
+    # 同種のBlock要素が続く間は変換単位へ蓄えておき、異なるBlock要素が現れた時点で返却する
+    # こうすることで、入力全体を保持せずとも、1種類のBlock要素で構成されるサブリストが得られる
+    convert_target = []
 
     for block in blocks:
         # 同種のブロックは同じコンバータで処理できるので、ひとまとめにする
-        if block.is_same_type(blocks[start]):
-            end += 1
+        if not convert_target or block.is_same_type(convert_target[0]):
+            convert_target.append(block)
             continue
 
-        # Block要素が異なったタイミングで、リストの開始から終了インデックスまでの要素を
-        # 返却すると、1種類のBlock要素で構成されるサブリストが得られる
-        # コンバータはこれをまとめて処理していくことで、リスト・引用のような複数行に渡るBlock要素を
+        # コンバータはサブリストをまとめて処理していくことで、リスト・引用のような複数行に渡るBlock要素を
         # 統合できる
-        yield blocks[start: end]
-        start = end
-        end += 1
+        yield convert_target
+        convert_target = [block]
 
     # 同じものが続いてループが終了した場合、ループ内のyield文だけではリストの中身全てを
     # 返却できないので、残りの要素を返却
-    if start != end:
-        yield blocks[start: end]
+    if convert_target:
+        yield convert_target
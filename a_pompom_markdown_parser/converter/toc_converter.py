@@ -214,6 +214,11 @@ class TocGenerator:
 class TocConverter:
     """ 目次の構成要素となるHeading Blockから目次の実体と対応するBlock要素へ変換することを責務に持つ """
 
+    def __init__(self, max_depth: int = None):
+        # 目次に含めるヘッダの階層の上限 上限より深いヘッダは目次に含めない 省略した場合は上限を設けない
+        # 目次の木は階層ごとに入れ子となるので、深いヘッダが続くと目次の組み立て・出力の再帰が深くなる
+        self._max_depth = max_depth
+
     def is_target(self, blocks: list[Block]) -> bool:
         """
         参照しているBlock要素が目次要素であるか判定
@@ -236,6 +241,20 @@ class TocConverter:
         # 目次の構成要素として必要なヘッダのみ抽出
         header_list = [block for block in markdown_result.content if isinstance(block, HeadingBlock)]
 
+        return self.generate(header_list)
+
+    def generate(self, header_list: list[HeadingBlock]) -> list[ListBlock]:
+        """
+        ヘッダのリストから目次を表現するul liの木を構築\n
+        パース結果を先頭から順に変換するときは、ヘッダを集めた時点で目次を組み立てる
+
+        :param header_list: 文書中のヘッダを出現順に格納したリスト
+        :return: 目次を表現するul li Blockのリスト
+        """
+
+        if self._max_depth is not None:
+            header_list = [header for header in header_list if header.size <= self._max_depth]
+
         # ヘッダ->TocNode->目次
         toc_node_list = TocNodeTreeGenerator().generate(header_list)
         return TocGenerator().generate(toc_node_list)
@@ -0,0 +1,294 @@
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import time
+
+from a_pompom_markdown_parser.limits import Limits, LimitExceededException, SERVICE_LIMITS
+from a_pompom_markdown_parser.metrics import RenderMetrics, start_metrics_server, ERROR_INVALID_ENCODING, \
+    ERROR_LIMIT_EXCEEDED, ERROR_REQUEST_TOO_LARGE, ERROR_INTERNAL
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.profiling import SlowDocumentLog
+
+# 要求・応答の形式
+# 要求: [本文のバイト長 4byte ビッグエンディアン][マークダウン文字列 UTF-8]
+# 応答: [状態 1byte][本文のバイト長 4byte ビッグエンディアン][HTML文字列 または エラーメッセージ UTF-8]
+# 1つの接続で、要求・応答を繰り返しやりとりできる
+LENGTH_FORMAT = '>I'
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+STATUS_FORMAT = '>B'
+STATUS_SIZE = struct.calcsize(STATUS_FORMAT)
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# 1つの要求で受け付けるマークダウン文字列の最大バイト長 Rendererが入力のバイト数の上限を持たない場合に利用
+# 不正な長さを受け取ったとき、巨大なバッファを確保しないよう制限
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+# ソケットファイルは同じユーザのみ読み書きできるようにする
+SOCKET_PERMISSION = 0o600
+
+
+class DaemonException(Exception):
+    """ 常駐プロセスとのやりとりに問題があったことを表現 """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
+
+def receive_exactly(sock: socket.socket, size: int) -> bytes:
+    """
+    指定したバイト数を受け取るまで受信を繰り返す
+
+    :param sock: 受信元ソケット
+    :param size: 受信するバイト数
+    :return: 受信したバイト列 受信を始める前に接続が閉じられた場合は空のバイト列
+    """
+
+    buffer = bytearray()
+    while len(buffer) < size:
+        received = sock.recv(size - len(buffer))
+        if not received:
+            if buffer:
+                raise DaemonException('受信の途中で接続が閉じられました。')
+            return b''
+        buffer += received
+
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, payload: bytes, status: int = None):
+    """
+    本文をバイト長と組にして送信
+
+    :param sock: 送信先ソケット
+    :param payload: 本文
+    :param status: 応答の状態 要求を送信する場合は省略
+    """
+
+    header = struct.pack(LENGTH_FORMAT, len(payload))
+    if status is not None:
+        header = struct.pack(STATUS_FORMAT, status) + header
+
+    sock.sendall(header + payload)
+
+
+class RenderRequestHandler(socketserver.BaseRequestHandler):
+    """ 1つの接続から受け取った要求を順に変換し、応答することを責務に持つ """
+
+    # サーバが保持するRendererを共有する
+    server: 'RenderDaemon'
+
+    def handle(self):
+        """
+        接続が閉じられるまで、要求を受け取ってはHTML文字列を応答
+        """
+
+        try:
+            self._handle_requests()
+        # 途中で接続を閉じたクライアントは、応答を待っていないので打ち切る
+        except (DaemonException, ConnectionError):
+            return
+
+    def _handle_requests(self):
+        """
+        要求を1つずつ受け取り、変換結果を応答
+        """
+
+        while True:
+            header = receive_exactly(self.request, LENGTH_SIZE)
+            # 要求を送り終えたクライアントが接続を閉じた
+            if not header:
+                return
+
+            (length,) = struct.unpack(LENGTH_FORMAT, header)
+            # 要求の長さを受け取った時点で受け付けたとみなし、応答を送り終えるまで待ち行列へ数える
+            with self.server.metrics.track_request():
+                if length > self.server.max_request_size:
+                    self.server.metrics.count_error(ERROR_REQUEST_TOO_LARGE)
+                    # 本文を読み捨てずに接続を閉じるので、以降の要求は受け付けない
+                    send_frame(self.request,
+                               f'要求が大きすぎます。上限: {self.server.max_request_size}バイト'.encode('utf-8'), STATUS_ERROR)
+                    return
+
+                payload = receive_exactly(self.request, length)
+                if len(payload) != length:
+                    return
+
+                try:
+                    markdown_content = payload.decode('utf-8')
+                    start = time.perf_counter()
+                    with self.server.metrics.measure_render(length):
+                        html_text = self.server.renderer.render(markdown_content)
+                    elapsed = time.perf_counter() - start
+                except UnicodeDecodeError:
+                    self.server.metrics.count_error(ERROR_INVALID_ENCODING)
+                    send_frame(self.request, 'マークダウン文字列はUTF-8で送信してください。'.encode('utf-8'),
+                               STATUS_ERROR)
+                    continue
+                except LimitExceededException as e:
+                    self.server.metrics.count_error(ERROR_LIMIT_EXCEEDED)
+                    send_frame(self.request, e.message.encode('utf-8'), STATUS_ERROR)
+                    continue
+                # 特定の入力でのみ生じる想定外の例外で、同じ接続の以降の要求まで失わないよう、エラーとして応答して続ける
+                except Exception:
+                    self.server.metrics.count_error(ERROR_INTERNAL)
+                    send_frame(self.request, '変換に失敗しました。'.encode('utf-8'), STATUS_ERROR)
+                    continue
+
+                send_frame(self.request, html_text.encode('utf-8'), STATUS_OK)
+            # 応答を返してから保存するので、クライアントは保存を待たない
+            if self.server.slow_log is not None:
+                self.server.slow_log.capture(markdown_content, elapsed, source=self.server.socket_path)
+
+
+class RenderDaemon(socketserver.ThreadingUnixStreamServer):
+    """
+    Unixドメインソケットで変換要求を受け付ける常駐プロセスを責務に持つ\n
+    起動時に組み立てたRendererを、すべての接続で共有する Rendererは複数のスレッドから同時に呼び出してよい
+    """
+
+    # 接続ごとのスレッドは、サーバの終了を待たずに打ち切る
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, renderer: Renderer = None, max_request_size: int = None,
+                 slow_log: SlowDocumentLog = None, metrics: RenderMetrics = None):
+        self.renderer = renderer or Renderer()
+        # 省略した場合はRendererの入力のバイト数の上限に揃え、変換できない大きさの要求は本文を読み込む前に断る
+        self.max_request_size = max_request_size or self.renderer.limits.max_bytes or MAX_REQUEST_SIZE
+        # 変換時間・失敗の件数などの記録先 すべての接続で共有する
+        self.metrics = metrics or RenderMetrics()
+        # 変換時間が閾値を超えた文書の保存先 省略した場合は保存しない
+        self.slow_log = slow_log
+        self.socket_path = socket_path
+
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, RenderRequestHandler)
+
+        # 初回の変換で生じる正規表現のコンパイルなどを、要求を受け付ける前に済ませておく
+        self.renderer.warm_up()
+
+    def server_bind(self):
+        """
+        ソケットファイルを生成 生成した時点から同じユーザのみ読み書きできるよう、生成する間はumaskを絞る\n
+        生成した後にパーミッションを変更すると、変更するまでの間に他のユーザから接続されうる
+        """
+
+        # umaskはプロセス全体の設定なので、ソケットファイルの生成を終えたら直ちに戻す
+        previous_umask = os.umask(0o777 & ~SOCKET_PERMISSION)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous_umask)
+
+    def server_close(self):
+        """
+        ソケットを閉じ、ソケットファイルを削除
+        """
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def remove_stale_socket(socket_path: str):
+    """
+    前回の起動で残ったソケットファイルを削除 ソケット以外のファイルは誤って削除しないよう、エラーとする
+
+    :param socket_path: ソケットファイルパス
+    """
+
+    if not os.path.exists(socket_path):
+        return
+
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise DaemonException(f'ソケットファイルパス: "{socket_path}"には、ソケット以外のファイルが存在します。')
+
+    os.unlink(socket_path)
+
+
+def serve(socket_path: str, slow_log: SlowDocumentLog = None, metrics_port: int = None, limits: Limits = None):
+    """
+    常駐プロセスを起動し、終了するまで変換要求を受け付ける
+
+    :param socket_path: ソケットファイルパス
+    :param slow_log: 変換時間が閾値を超えた文書の保存先 省略した場合は保存しない
+    :param metrics_port: メトリクスをHTTPで公開するポート番号 省略した場合は公開しない
+    :param limits: 受け付ける入力の大きさの上限 省略した場合はSERVICE_LIMITS
+    """
+
+    # 終了を要求されたときもソケットファイルを削除できるよう、割り込みと同様に扱う
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    with RenderDaemon(socket_path, Renderer(limits=limits or SERVICE_LIMITS), slow_log=slow_log) as daemon:
+        if metrics_port is not None:
+            # Unixドメインソケットの要求形式では区別できないので、メトリクスは別のポートで公開する
+            start_metrics_server(daemon.metrics.registry, metrics_port)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _raise_keyboard_interrupt(signum: int, frame):
+    raise KeyboardInterrupt
+
+
+class RenderClient:
+    """ 常駐プロセスへ変換を要求することを責務に持つ 接続は使い回す """
+
+    def __init__(self, socket_path: str):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+
+    def render(self, markdown_content: str) -> str:
+        """
+        マークダウン文字列をHTML文字列へ変換
+
+        :param markdown_content: マークダウン形式の文字列
+        :return: HTML形式の文字列
+        """
+
+        send_frame(self._socket, markdown_content.encode('utf-8'))
+
+        header = receive_exactly(self._socket, STATUS_SIZE + LENGTH_SIZE)
+        if not header:
+            raise DaemonException('応答を受け取る前に接続が閉じられました。')
+        (status,) = struct.unpack(STATUS_FORMAT, header[:STATUS_SIZE])
+        (length,) = struct.unpack(LENGTH_FORMAT, header[STATUS_SIZE:])
+
+        payload = receive_exactly(self._socket, length)
+        if len(payload) != length:
+            raise DaemonException('応答を受け取る前に接続が閉じられました。')
+        payload = payload.decode('utf-8')
+        if status != STATUS_OK:
+            raise DaemonException(payload)
+
+        return payload
+
+    def close(self):
+        """
+        常駐プロセスとの接続を閉じる
+        """
+        self._socket.close()
+
+    def __enter__(self) -> 'RenderClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_by_daemon(socket_path: str, markdown_content: str) -> str:
+    """
+    常駐プロセスへ接続し、マークダウン文字列をHTML文字列へ変換
+
+    :param socket_path: ソケットファイルパス
+    :param markdown_content: マークダウン形式の文字列
+    :return: HTML形式の文字列
+    """
+
+    with RenderClient(socket_path) as client:
+        return client.render(markdown_content)
@@ -0,0 +1,148 @@
+import dataclasses
+import threading
+import time
+
+# パーサ・ビルダの種別 呼び出される順に並べる
+GROUP_BLOCK_PARSER = 'block_parser'
+GROUP_MULTI_LINE_PARSER = 'multi_line_parser'
+GROUP_INLINE_PARSER = 'inline_parser'
+GROUP_BLOCK_BUILDER = 'block_builder'
+GROUP_INLINE_BUILDER = 'inline_builder'
+GROUPS = [GROUP_BLOCK_PARSER, GROUP_MULTI_LINE_PARSER, GROUP_INLINE_PARSER, GROUP_BLOCK_BUILDER,
+          GROUP_INLINE_BUILDER]
+
+
+@dataclasses.dataclass
+class DispatchCount:
+    """ 1つのパーサ・ビルダの呼び出し回数・処理時間を表現することを責務に持つ """
+
+    group: str
+    # パーサ・ビルダのクラス名
+    name: str
+    # is_targetの呼び出し回数
+    attempts: int = 0
+    # is_targetがTrueを返した回数
+    matches: int = 0
+    # is_targetに費やした時間の合計[s]
+    target_time: float = 0.0
+    # is_target以外のメソッド(extract_text・parse・buildなど)に費やした時間の合計[s]
+    work_time: float = 0.0
+
+    @property
+    def match_rate(self) -> float:
+        """ is_targetがTrueを返した割合 """
+        return self.matches / self.attempts if self.attempts else 0.0
+
+    @property
+    def total_time(self) -> float:
+        """ 処理時間の合計[s] """
+        return self.target_time + self.work_time
+
+
+class CountingDispatchTarget:
+    """
+    パーサ・ビルダを包み、呼び出し回数・処理時間を記録することを責務に持つ\n
+    パーサ・ビルダのリストの要素をこのオブジェクトで置き換えるので、呼び出し元の処理は変わらない
+    """
+
+    def __init__(self, target: object, count: DispatchCount, lock: threading.Lock):
+        self._target = target
+        self._count = count
+        # 複数のスレッドから同時に呼び出されても、記録が失われないよう加算はロックを獲得してから行う
+        self._lock = lock
+
+    def is_target(self, *args) -> bool:
+        """
+        包んだパーサ・ビルダのis_targetを呼び出し、呼び出し回数・Trueを返した回数・処理時間を記録
+
+        :param args: is_targetへ渡す引数
+        :return: is_targetの戻り値
+        """
+
+        start = time.perf_counter()
+        result = self._target.is_target(*args)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._count.attempts += 1
+            self._count.matches += result
+            self._count.target_time += elapsed
+
+        return result
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def _measured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._count.work_time += elapsed
+
+        return _measured
+
+
+class DispatchCounters:
+    """
+    パーサ・ビルダを先頭から順に試す処理において、パーサ・ビルダごとの呼び出し回数・処理時間を記録することを責務に持つ\n
+    記法ごとの処理の偏りや、記法を追加したときに既存の行の処理がどれだけ増えたかを把握するために利用
+
+    MarkdownParser・HtmlBuilderのinstrumentへ渡したときのみ記録するので、渡さなければ計測のための処理は生じない
+    """
+
+    def __init__(self):
+        # (種別, クラス名)をキーに記録を保持
+        self._counts: dict[tuple[str, str], DispatchCount] = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, group: str, targets: list) -> list[CountingDispatchTarget]:
+        """
+        パーサ・ビルダのリストを、記録するオブジェクトで包んだリストへ変換 順序は保つ
+
+        :param group: パーサ・ビルダの種別
+        :param targets: パーサ・ビルダのリスト
+        :return: 呼び出し回数・処理時間を記録するオブジェクトのリスト
+        """
+
+        wrapped = []
+        with self._lock:
+            for target in targets:
+                key = (group, type(target).__name__)
+                count = self._counts.setdefault(key, DispatchCount(group=group, name=key[1]))
+                wrapped.append(CountingDispatchTarget(target, count, self._lock))
+
+        return wrapped
+
+    def snapshot(self) -> list[DispatchCount]:
+        """
+        記録した値の複製を取得
+
+        :return: 種別・登録した順に並べた記録
+        """
+
+        with self._lock:
+            counts = [dataclasses.replace(count) for count in self._counts.values()]
+
+        # 同じ種別の中では登録した順、すなわちパーサ・ビルダが試される順を保つ
+        return sorted(counts, key=lambda count: GROUPS.index(count.group) if count.group in GROUPS else len(GROUPS))
+
+    def format(self) -> str:
+        """
+        記録した値を人が読める形の文字列へ変換
+
+        :return: 種別ごとに、パーサ・ビルダの呼び出し回数・処理時間を並べた文字列
+        """
+
+        lines = [f'{"group":<18}{"name":<24}{"attempts":>10}{"matches":>10}{"rate":>8}'
+                 f'{"target[ms]":>12}{"work[ms]":>12}']
+        for count in self.snapshot():
+            lines.append(f'{count.group:<18}{count.name:<24}{count.attempts:>10}{count.matches:>10}'
+                         f'{count.match_rate * 100:>7.1f}%{count.target_time * 1000:>12.3f}'
+                         f'{count.work_time * 1000:>12.3f}')
+
+        return '\n'.join(lines)
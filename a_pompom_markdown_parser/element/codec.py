@@ -0,0 +1,343 @@
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Callable, Generator, Iterable, Union
+
+from a_pompom_markdown_parser.element.block import Block, ParseResult, PlainBlock, ParagraphBlock, HeadingBlock, \
+    QuoteBlock, ListBlock, ListItemBlock, CodeBlock, CodeChildBlock, HorizontalRuleBlock, TableOfContentsBlock
+from a_pompom_markdown_parser.element.inline import Inline, PlainInline, LinkInline, CodeInline, ImageInline
+
+# パース結果をプロセス間で受け渡したり、キャッシュへ保存したりするためのバイナリ形式
+# pickleはクラス名や属性名も含めて保存するので、要素数の多いパース結果では遅く、かさばる
+# そこで、要素の種別をタグ・属性を固定の並びで表現した形式を定義する
+#
+# 形式
+# ヘッダ: マジックナンバー(4byte) + バージョン(1byte)
+# 本体: 最上位のBlock要素を一定数ずつまとめたレコードを繰り返す
+#   レコード: バイト長(4byte) + Block要素数(4byte) + 整数の個数(4byte) + 整数列(4byte * 個数) + 文字列(UTF-8)
+#   整数列: 要素ごとに タグ + 属性 + (Block要素のみ)子要素数 を木の行きがけ順に並べたもの
+#   属性: 整数はそのままの値・文字列は文字数 文字列の本体は出現順に連結し、レコードの末尾へまとめる
+# レコードごとにバイト長を持たせることで、文書全体を読み込まずに最上位のBlock要素を順に復元できる
+# また、整数列・文字列をまとめておくことで、復元時のバイト列の解釈は1レコードにつき数回で済む
+
+MAGIC = b'APMD'
+# 形式を変更したときはバージョンを上げ、古い形式のデータを誤って復元しないようにする
+VERSION = 1
+
+HEADER = struct.Struct('<4sB')
+LENGTH = struct.Struct('<I')
+RECORD_HEADER = struct.Struct('<II')
+# 1レコードにまとめる最上位のBlock要素の数
+# 小さなBlock要素ごとにレコードを分けると、レコード単位の処理のコストが支配的になる
+RECORD_BLOCK_COUNT = 256
+# 整数列はリトルエンディアンの4byte符号付き整数で表現
+INTEGER_TYPECODE = 'i'
+IS_BIG_ENDIAN = sys.byteorder == 'big'
+
+ATTRIBUTE_INTEGER = 'i'
+ATTRIBUTE_STRING = 's'
+
+Element = Union[Block, Inline]
+
+# 最も多く出現する記法を含まないInline要素のタグ 復元処理で特別に扱う
+PLAIN_INLINE_TAG = 32
+
+# タグ: (要素の型, 属性名と属性の型の組)
+# 新しい要素を追加するときは、既存のタグを変えずに末尾へ加える
+BLOCK_SCHEMA: dict[int, tuple[type, tuple[tuple[str, str], ...]]] = {
+    1: (PlainBlock, (('indent_depth', ATTRIBUTE_INTEGER),)),
+    2: (ParagraphBlock, (('indent_depth', ATTRIBUTE_INTEGER),)),
+    3: (HeadingBlock, (('size', ATTRIBUTE_INTEGER),)),
+    4: (QuoteBlock, ()),
+    5: (ListBlock, (('indent_depth', ATTRIBUTE_INTEGER),)),
+    6: (ListItemBlock, (('indent_depth', ATTRIBUTE_INTEGER),)),
+    7: (CodeBlock, (('language', ATTRIBUTE_STRING),)),
+    8: (CodeChildBlock, ()),
+    9: (HorizontalRuleBlock, ()),
+    10: (TableOfContentsBlock, ()),
+}
+INLINE_SCHEMA: dict[int, tuple[type, tuple[tuple[str, str], ...]]] = {
+    PLAIN_INLINE_TAG: (PlainInline, (('text', ATTRIBUTE_STRING),)),
+    33: (LinkInline, (('text', ATTRIBUTE_STRING), ('href', ATTRIBUTE_STRING))),
+    34: (CodeInline, (('text', ATTRIBUTE_STRING),)),
+    35: (ImageInline, (('text', ATTRIBUTE_STRING), ('src', ATTRIBUTE_STRING), ('alt', ATTRIBUTE_STRING))),
+}
+SCHEMA = {**BLOCK_SCHEMA, **INLINE_SCHEMA}
+# 符号化では要素の型からタグを引く
+TAG_BY_TYPE = {element_type: (tag, attributes) for tag, (element_type, attributes) in SCHEMA.items()}
+
+
+class CodecException(Exception):
+    """ バイナリ形式への変換・復元に失敗したことを表現 """
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(message)
+
+
+def encode_element(element: Element, integers: list[int], strings: list[str]):
+    """
+    Block/Inline要素を整数列・文字列へ変換し、それぞれのバッファへ追加
+
+    :param element: 対象要素
+    :param integers: 整数列を格納するバッファ
+    :param strings: 文字列を格納するバッファ
+    """
+
+    schema = TAG_BY_TYPE.get(type(element))
+    if schema is None:
+        raise CodecException(f'要素: {type(element).__name__}はバイナリ形式へ変換できません。')
+
+    tag, attributes = schema
+    integers.append(tag)
+
+    for name, attribute_type in attributes:
+        value = getattr(element, name)
+        if attribute_type == ATTRIBUTE_INTEGER:
+            integers.append(value)
+            continue
+
+        integers.append(len(value))
+        strings.append(value)
+
+    # Inline要素は子を持たない
+    if tag in INLINE_SCHEMA:
+        return
+
+    integers.append(len(element.children))
+    for child in element.children:
+        encode_element(child, integers, strings)
+
+
+def encode_record(blocks: list[Block]) -> bytes:
+    """
+    最上位のBlock要素群をレコードのバイト列へ変換
+
+    :param blocks: 対象Block要素群
+    :return: バイト列
+    """
+
+    integers, strings = [], []
+    for block in blocks:
+        encode_element(block, integers, strings)
+
+    integer_array = array(INTEGER_TYPECODE, integers)
+    if IS_BIG_ENDIAN:
+        integer_array.byteswap()
+    # 孤立したサロゲートを含む文字列も往復できるよう、surrogatepassを指定
+    payload = (RECORD_HEADER.pack(len(blocks), len(integers))
+               + integer_array.tobytes()
+               + ''.join(strings).encode('utf-8', 'surrogatepass'))
+
+    return LENGTH.pack(len(payload)) + payload
+
+
+def create_element_decoder(element_type: type, attributes: tuple[tuple[str, str], ...],
+                           has_children: bool) -> Callable:
+    """
+    タグと対応する要素を復元する関数を生成\n
+    属性の並びは要素の型ごとに固定なので、復元処理を前もって組み立てておくことで、要素ごとの分岐を減らす
+
+    :param element_type: 要素の型
+    :param attributes: 属性名と属性の型の組
+    :param has_children: 子要素を持つか
+    :return: (整数列, 整数列の位置, 文字列, 文字列の位置)を受け取り、(要素, 整数列の位置, 文字列の位置)を返す関数
+    """
+
+    # 要素の型の属性は、子要素を除いてスキーマと同じ順に定義されているので、位置引数で生成できる
+    is_string_attributes = [attribute_type == ATTRIBUTE_STRING for _, attribute_type in attributes]
+
+    def decode(integers: list[int], position: int, text: str, text_position: int) -> tuple[Element, int, int]:
+        values = []
+        for is_string in is_string_attributes:
+            value = integers[position]
+            position += 1
+            if is_string:
+                values.append(text[text_position:text_position + value])
+                text_position += value
+                continue
+
+            values.append(value)
+
+        if not has_children:
+            return element_type(*values), position, text_position
+
+        child_count = integers[position]
+        position += 1
+        children = []
+        for _ in range(child_count):
+            tag = integers[position]
+            # 子要素の大半を占める記法を含まないInline要素は、関数呼び出しを省いて直接復元
+            if tag == PLAIN_INLINE_TAG:
+                length = integers[position + 1]
+                children.append(PlainInline(text[text_position:text_position + length]))
+                position += 2
+                text_position += length
+                continue
+
+            child, position, text_position = DECODERS[tag](integers, position + 1, text, text_position)
+            children.append(child)
+
+        return element_type(children, *values), position, text_position
+
+    return decode
+
+
+class _UnknownTagDecoders(dict):
+    """ 未知のタグを参照したとき、例外を送出する復元関数の辞書 """
+
+    def __missing__(self, tag: int):
+        raise CodecException(f'タグ: {tag}と対応する要素が存在しません。')
+
+
+DECODERS = _UnknownTagDecoders({
+    tag: create_element_decoder(element_type, attributes, tag in BLOCK_SCHEMA)
+    for tag, (element_type, attributes) in SCHEMA.items()
+})
+
+
+def decode_record(payload: bytes) -> list[Block]:
+    """
+    レコードのバイト列から最上位のBlock要素群を復元
+
+    :param payload: バイト長を除いたレコードのバイト列
+    :return: 復元したBlock要素群
+    """
+
+    if len(payload) < RECORD_HEADER.size:
+        raise CodecException('レコードが不完全です。')
+
+    block_count, integer_count = RECORD_HEADER.unpack_from(payload, 0)
+    integer_end = RECORD_HEADER.size + integer_count * LENGTH.size
+    if len(payload) < integer_end:
+        raise CodecException('レコードが不完全です。')
+
+    integer_array = array(INTEGER_TYPECODE)
+    integer_array.frombytes(payload[RECORD_HEADER.size:integer_end])
+    if IS_BIG_ENDIAN:
+        integer_array.byteswap()
+    integers = integer_array.tolist()
+    try:
+        text = payload[integer_end:].decode('utf-8', 'surrogatepass')
+    except UnicodeDecodeError:
+        raise CodecException('レコードの文字列が不正です。')
+
+    blocks = []
+    position, text_position = 0, 0
+    try:
+        for _ in range(block_count):
+            block, position, text_position = DECODERS[integers[position]](integers, position + 1, text, text_position)
+            blocks.append(block)
+    except IndexError:
+        raise CodecException('レコードの整数列が不完全です。')
+
+    if position != len(integers) or text_position != len(text):
+        raise CodecException('レコードの長さが一致しません。')
+
+    return blocks
+
+
+def dumps(parse_result: ParseResult) -> bytes:
+    """
+    パース結果をバイナリ形式へ変換
+
+    :param parse_result: 対象パース結果
+    :return: バイナリ形式のバイト列
+    """
+
+    content = parse_result.content
+    records = [encode_record(content[start:start + RECORD_BLOCK_COUNT])
+               for start in range(0, len(content), RECORD_BLOCK_COUNT)]
+
+    return HEADER.pack(MAGIC, VERSION) + b''.join(records)
+
+
+def dump(blocks: Iterable[Block], stream: BinaryIO):
+    """
+    Block要素を順にバイナリ形式へ変換し、ストリームへ書き出す\n
+    レコードの単位でまとまった時点で書き出すので、文書全体を保持せずに済む
+
+    :param blocks: パース結果のBlock要素 ジェネレータも受け付ける
+    :param stream: 書き出し先ストリーム
+    """
+
+    stream.write(HEADER.pack(MAGIC, VERSION))
+
+    record_blocks = []
+    for block in blocks:
+        record_blocks.append(block)
+        if len(record_blocks) == RECORD_BLOCK_COUNT:
+            stream.write(encode_record(record_blocks))
+            record_blocks = []
+
+    if record_blocks:
+        stream.write(encode_record(record_blocks))
+
+
+def validate_header(header: bytes):
+    """
+    ヘッダが対応している形式のものか検証
+
+    :param header: ヘッダのバイト列
+    """
+
+    if len(header) != HEADER.size:
+        raise CodecException('ヘッダが不完全です。')
+
+    magic, version = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise CodecException('パース結果のバイナリ形式ではありません。')
+    if version != VERSION:
+        raise CodecException(f'バージョン: {version}の形式には対応していません。')
+
+
+def loads(data: bytes) -> ParseResult:
+    """
+    バイナリ形式からパース結果を復元
+
+    :param data: バイナリ形式のバイト列
+    :return: パース結果
+    """
+
+    validate_header(data[:HEADER.size])
+
+    content = []
+    offset = HEADER.size
+    while offset < len(data):
+        if offset + LENGTH.size > len(data):
+            raise CodecException('レコードのバイト長が不完全です。')
+        length = LENGTH.unpack_from(data, offset)[0]
+        offset += LENGTH.size
+        if offset + length > len(data):
+            raise CodecException('レコードが不完全です。')
+        content += decode_record(data[offset:offset + length])
+        offset += length
+
+    return ParseResult(content=content)
+
+
+def iter_load(stream: BinaryIO) -> Generator[Block, None, None]:
+    """
+    ストリームから最上位のBlock要素を順に復元\n
+    レコード単位で読み込むので、文書全体を読み込まずに済み、大きなパース結果も少ないメモリで扱える
+
+    :param stream: 読み込み元ストリーム
+    :return: ループで参照される度、1つのBlock要素を返却
+    """
+
+    validate_header(stream.read(HEADER.size))
+
+    while True:
+        length_bytes = stream.read(LENGTH.size)
+        # 読み切った
+        if not length_bytes:
+            return
+        if len(length_bytes) != LENGTH.size:
+            raise CodecException('レコードのバイト長が不完全です。')
+
+        length = LENGTH.unpack(length_bytes)[0]
+        payload = stream.read(length)
+        if len(payload) != length:
+            raise CodecException('レコードが不完全です。')
+
+        yield from decode_record(payload)
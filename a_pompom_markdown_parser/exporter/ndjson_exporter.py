@@ -0,0 +1,91 @@
+import dataclasses
+import json
+from typing import Iterable, TextIO, Union
+
+from a_pompom_markdown_parser.element.block import Block, PlainBlock, ParagraphBlock, HeadingBlock, QuoteBlock, \
+    ListBlock, ListItemBlock, CodeBlock, CodeChildBlock, HorizontalRuleBlock, TableOfContentsBlock
+from a_pompom_markdown_parser.element.inline import Inline, PlainInline, LinkInline, CodeInline, ImageInline
+
+# 要素の種別を表す名前
+# 後続のサービスが記法の種類で処理を振り分けられるよう、レコードへ含める
+KIND_NAMES: dict[type, str] = {
+    PlainBlock: 'plain',
+    ParagraphBlock: 'paragraph',
+    HeadingBlock: 'heading',
+    QuoteBlock: 'quote',
+    ListBlock: 'list',
+    ListItemBlock: 'list_item',
+    CodeBlock: 'code_block',
+    CodeChildBlock: 'code_child',
+    HorizontalRuleBlock: 'horizontal_rule',
+    TableOfContentsBlock: 'table_of_contents',
+
+    PlainInline: 'text',
+    LinkInline: 'link',
+    CodeInline: 'code',
+    ImageInline: 'image',
+}
+
+Element = Union[Block, Inline]
+
+
+def to_record(element: Element) -> dict:
+    """
+    Block/Inline要素をJSONへ変換できる辞書へ変換\n
+    ex) HeadingBlock(size=2, children=[PlainInline(text='概要')])
+    -> {'kind': 'heading', 'size': 2, 'children': [{'kind': 'text', 'text': '概要'}]}
+
+    :param element: 対象要素
+    :return: 種別・属性・子要素を格納した辞書
+    """
+
+    record = {'kind': KIND_NAMES[type(element)]}
+    for field in dataclasses.fields(element):
+        if field.name == 'children':
+            continue
+        record[field.name] = getattr(element, field.name)
+
+    if isinstance(element, Block):
+        record['children'] = [to_record(child) for child in element.children]
+
+    return record
+
+
+class NdjsonExporter:
+    """ 変換結果を最上位のBlock要素ごとに1行のJSONとして書き出すことを責務に持つ """
+
+    def export(self, blocks: Iterable[Block], stream: TextIO):
+        """
+        変換結果のBlock要素を受け取った順に書き出す\n
+        各行は文書中の位置を表すindexを持つ\n
+        目次はすべてのヘッダを変換し終えるまで実体が定まらないので、目次の位置には子を持たない行を出力しておき、
+        末尾で同じindexの行として目次の実体を出力し直す
+
+        :param blocks: Converter.convert_iterによる変換結果 ジェネレータも受け付ける
+        :param stream: 書き出し先ストリーム
+        """
+
+        placeholders: list[tuple[int, TableOfContentsBlock]] = []
+
+        for index, block in enumerate(blocks):
+            if isinstance(block, TableOfContentsBlock):
+                placeholders.append((index, block))
+
+            self._write_record(index, block, stream)
+
+        # 入力をすべて読み切った時点で、目次の子要素へ実体が格納されている
+        for index, placeholder in placeholders:
+            self._write_record(index, placeholder, stream)
+
+    def _write_record(self, index: int, block: Block, stream: TextIO):
+        """
+        Block要素を1行のJSONとして書き出す
+
+        :param index: 文書中の位置
+        :param block: 対象Block要素
+        :param stream: 書き出し先ストリーム
+        """
+
+        record = {'index': index, **to_record(block)}
+        stream.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        stream.write('\n')
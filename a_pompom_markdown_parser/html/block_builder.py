@@ -3,29 +3,75 @@ from a_pompom_markdown_parser.element.block import Block, PlainBlock, ParagraphB
     CodeBlock, HorizontalRuleBlock
 
 from a_pompom_markdown_parser.block_utility import get_text_from_block
-from a_pompom_markdown_parser.settings import setting
+from a_pompom_markdown_parser.settings import SettingsProfile, default_profile
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters, GROUP_BLOCK_BUILDER
 
-# 全体で参照する設定値
-LINE_BREAK = setting['newline_code']
-INDENT = setting['indent']
+# テンプレート中の改行コード・インデント1階層分の文字列
+# 設定値ごとに異なるので、ビルダを生成するときに設定値の文字列へ置き換える
+LINE_BREAK = '{line_break}'
+INDENT = '{indent_unit}'
 
 
-def get_indent_text_from_depth(depth: int):
+def get_indent_text_from_depth(depth: int, indent: str) -> str:
     """
     インデント文字列を階層の深さから取得
 
     :param depth: インデント階層の深さ
+    :param indent: インデント1階層分の文字列
     :return: インデントを表現する文字列
     """
-    return ''.join([INDENT for _ in range(depth)])
+    return indent * depth
+
+
+def compile_template(template: str, profile: SettingsProfile) -> str:
+    """
+    テンプレート中の改行コード・インデントを設定値の文字列へ置き換え\n
+    変換のたびに置き換えずに済むよう、ビルダを生成するときに一度だけ呼び出す
+
+    :param template: 改行コード・インデントを含むテンプレート
+    :param profile: 設定値
+    :return: 改行コード・インデントを置き換えたテンプレート
+    """
+    return template.replace(LINE_BREAK, profile.newline_code).replace(INDENT, profile.indent)
+
+
+def escape_html(text: str) -> str:
+    """
+    HTML文字列をエスケープ
+    :param text: 対象テキスト
+    :return: HTML文字列がエスケープされたテキスト
+    """
+    return text.replace(
+        '&', "&amp;"
+    ).replace(
+        '<', "&lt;"
+    ).replace(
+        '>', "&gt;"
+    ).replace(
+        '"', "&quot;"
+    ).replace(
+        "'", "&#039;"
+    )
 
 
 class BlockBuilder:
     """ Block要素をもとに対応するHTML文字列を組み立てることを責務に持つ"""
 
-    def __init__(self):
-        self._builders: list[IBuilder] = [ParagraphBuilder(), HeadingBuilder(), QuoteBuilder(), ListItemBuilder(),
-                                          ListBuilder(), CodeBlockBuilder(), HorizontalRuleBuilder()]
+    def __init__(self, profile: SettingsProfile = None):
+        # 省略した場合はsettings.settingの現在の値を利用
+        self._profile = profile or default_profile()
+        self._builders: list[IBuilder] = [
+            builder(self._profile) for builder in [ParagraphBuilder, HeadingBuilder, QuoteBuilder, ListItemBuilder,
+                                                   ListBuilder, CodeBlockBuilder, HorizontalRuleBuilder]
+        ]
+
+    def instrument(self, counters: DispatchCounters):
+        """
+        以降の組み立て処理で、ビルダごとの呼び出し回数・処理時間を記録
+
+        :param counters: 記録先
+        """
+        self._builders = counters.wrap(GROUP_BLOCK_BUILDER, self._builders)
 
     def build(self, block: Block, child_text: str) -> str:
         """
@@ -43,12 +89,20 @@ class BlockBuilder:
 
         # Plain
         if isinstance(block, PlainBlock):
-            return get_indent_text_from_depth(block.indent_depth) + child_text
+            return get_indent_text_from_depth(block.indent_depth, self._profile.indent) + child_text
 
 
 class IBuilder:
     """ 各タグと対応するHTML要素の組み立てを責務に持つ """
 
+    # 改行コード・インデントを含むテンプレート
+    TEMPLATE = ''
+
+    def __init__(self, profile: SettingsProfile = None):
+        # 省略した場合はsettings.settingの現在の値を利用
+        self._profile = profile or default_profile()
+        self._template = compile_template(self.TEMPLATE, self._profile)
+
     def is_target(self, block: Block) -> bool:
         """
         Block要素の種別がビルダと対応したものであるか判定
@@ -97,10 +151,10 @@ class ParagraphBuilder(IBuilder):
         :return: HTMLのpタグを含む文字列
         """
 
-        paragraph = self.TEMPLATE.replace(
-            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth)
+        paragraph = self._template.replace(
+            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth, self._profile.indent)
         ).replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['p']
+            self.CLASSNAME_EXPRESSION, self._profile.class_name['p']
         ).replace(
             self.TEXT_EXPRESSION, child_text
         )
@@ -138,12 +192,12 @@ class HeadingBuilder(IBuilder):
         """
 
         heading_tag = f'h{block.size}'
-        heading = self.TEMPLATE.replace(
+        heading = self._template.replace(
             self.HEADING_EXPRESSION, heading_tag
         ).replace(
             self.ID_EXPRESSION, f'{get_text_from_block(block)}'
         ).replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name'].get(heading_tag, '')
+            self.CLASSNAME_EXPRESSION, self._profile.class_name.get(heading_tag, '')
         ).replace(
             self.TEXT_EXPRESSION, child_text
         )
@@ -179,8 +233,8 @@ class QuoteBuilder(IBuilder):
         :return: HTMLのblockquoteタグを含む文字列
         """
 
-        blockquote = self.TEMPLATE.replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['blockquote']
+        blockquote = self._template.replace(
+            self.CLASSNAME_EXPRESSION, self._profile.class_name['blockquote']
         ).replace(
             self.TEXT_EXPRESSION, child_text
         )
@@ -220,10 +274,10 @@ class ListBuilder(IBuilder):
         :return: HTMLのulタグを含む文字列
         """
 
-        unordered_list = self.TEMPLATE.replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['ul']
+        unordered_list = self._template.replace(
+            self.CLASSNAME_EXPRESSION, self._profile.class_name['ul']
         ).replace(
-            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth)
+            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth, self._profile.indent)
         ).replace(
             self.TEXT_EXPRESSION, child_text
         )
@@ -255,6 +309,10 @@ class ListItemBuilder(IBuilder):
         f'{INDENT_EXPRESSION}</li>'
     )
 
+    def __init__(self, profile: SettingsProfile = None):
+        super().__init__(profile)
+        self._template_nested = compile_template(self.TEMPLATE_NESTED, self._profile)
+
     def is_target(self, block: Block) -> bool:
         return isinstance(block, ListItemBlock)
 
@@ -269,12 +327,13 @@ class ListItemBuilder(IBuilder):
 
         # li -> ulのようにリストがネストしているか
         is_nested = any(isinstance(child, ListBlock) for child in block.children)
-        template = self.TEMPLATE_NESTED if is_nested else self.TEMPLATE
+        template = self._template_nested if is_nested else self._template
 
         list_item = template.replace(
-            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth)
+            self.INDENT_EXPRESSION, get_indent_text_from_depth(block.indent_depth, self._profile.indent)
         ).replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['li_nested'] if is_nested else setting['class_name']['li']
+            self.CLASSNAME_EXPRESSION,
+            self._profile.class_name['li_nested'] if is_nested else self._profile.class_name['li']
         ).replace(
             self.TEXT_EXPRESSION, child_text
         )
@@ -315,36 +374,18 @@ class CodeBlockBuilder(IBuilder):
         """
 
         # highlight.jsでハイライトするとき、言語名は小文字を指定
-        language_class_name = setting['class_name_with_template']['code_block'].replace(
+        language_class_name = self._profile.class_name_with_template['code_block'].replace(
             self.LANGUAGE_EXPRESSION, block.language.lower()
         )
 
-        code_block = self.TEMPLATE.replace(
+        code_block = self._template.replace(
             self.LANGUAGE_EXPRESSION, language_class_name
         ).replace(
-            self.TEXT_EXPRESSION, self._escape_html(child_text)
+            self.TEXT_EXPRESSION, escape_html(child_text)
         )
 
         return code_block
 
-    def _escape_html(self, text: str) -> str:
-        """
-        HTML文字列をエスケープ
-        :param text: 対象テキスト
-        :return: HTML文字列がエスケープされたテキスト
-        """
-        return text.replace(
-            '&', "&amp;"
-        ).replace(
-            '<', "&lt;"
-        ).replace(
-            '>', "&gt;"
-        ).replace(
-            '"', "&quot;"
-        ).replace(
-            "'", "&#039;"
-        )
-
 
 class HorizontalRuleBuilder(IBuilder):
     """ hrタグで表現される水平罫線要素を生成することを責務に持つ """
@@ -364,4 +405,4 @@ class HorizontalRuleBuilder(IBuilder):
         :return: hrタグ文字列
         """
 
-        return self.TEMPLATE.replace(self.CLASSNAME_EXPRESSION, setting['class_name']['hr'])
+        return self._template.replace(self.CLASSNAME_EXPRESSION, self._profile.class_name['hr'])
@@ -1,32 +1,65 @@
-from a_pompom_markdown_parser.element.block import Block, ParseResult
+from typing import Generator, Iterable
+
+from a_pompom_markdown_parser.cancellation import CancellationToken, STAGE_BUILD
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters
+from a_pompom_markdown_parser.element.block import Block, ParseResult, TableOfContentsBlock
 from a_pompom_markdown_parser.element.inline import Inline
 from a_pompom_markdown_parser.html.block_builder import BlockBuilder
 from a_pompom_markdown_parser.html.inline_builder import InlineBuilder
 
-from a_pompom_markdown_parser.settings import setting
+from a_pompom_markdown_parser.settings import SettingsProfile, default_profile
 
 
 class HtmlBuilder:
     """ マークダウンのパース結果からHTML文字列を組み立てることを責務に持つ """
 
-    def __init__(self):
-        self._block_builder = BlockBuilder()
-        self._inline_builder = InlineBuilder()
+    def __init__(self, profile: SettingsProfile = None):
+        # 省略した場合はsettings.settingの現在の値を利用
+        self._profile = profile or default_profile()
+        self._block_builder = BlockBuilder(self._profile)
+        self._inline_builder = InlineBuilder(self._profile)
+
+    def instrument(self, counters: DispatchCounters):
+        """
+        以降の組み立て処理で、Block・Inlineのビルダごとの呼び出し回数・処理時間を記録\n
+        1つのビルダに対して一度だけ呼び出す
+
+        :param counters: 記録先
+        """
+
+        self._block_builder.instrument(counters)
+        self._inline_builder.instrument(counters)
 
-    def build(self, parse_result: ParseResult) -> str:
+    def build(self, parse_result: ParseResult, token: CancellationToken = None) -> str:
         """
         パース結果をもとにHTML文字列を組み立て
 
         :param parse_result: マークダウンのパース結果
+        :param token: 変換の取り消し・制限時間 最上位のBlock要素を組み立てるたびに確認
         :return: HTML文字列
         """
 
-        html_text = ''
+        return ''.join(self.build_iter(parse_result.content, token))
+
+    def build_iter(self, blocks: Iterable[Block], token: CancellationToken = None) -> Generator[str, None, None]:
+        """
+        最上位のBlock要素ごとにHTML文字列を組み立て\n
+        目次を表現するTableOfContentsBlockは、子要素である目次の実体を組み立てたものとする
+
+        :param blocks: Converterによる変換結果 ジェネレータも受け付ける
+        :param token: 変換の取り消し・制限時間 最上位のBlock要素を組み立てるたびに確認
+        :return: ループで参照される度、1つのBlock要素と対応するHTML文字列を返却
+        """
 
-        for block in parse_result.content:
-            html_text += self._build_block(block)
+        for block in blocks:
+            if isinstance(block, TableOfContentsBlock):
+                html_text = ''.join(self._build_block(child) for child in block.children)
+            else:
+                html_text = self._build_block(block)
 
-        return html_text
+            if token is not None:
+                token.check(STAGE_BUILD)
+            yield html_text
 
     def _build_block(self, block: Block) -> str:
         """
@@ -52,4 +85,4 @@ class HtmlBuilder:
 
         # childrenの組み立て結果文字列とBlock要素の組み立て結果を組み合わせることで、
         # Block要素のHTML文字列への変換を実現
-        return self._block_builder.build(block, child_text) + setting['newline_code']
+        return self._block_builder.build(block, child_text) + self._profile.newline_code
@@ -1,12 +1,23 @@
 from a_pompom_markdown_parser.element.inline import Inline, LinkInline, CodeInline, ImageInline
-from a_pompom_markdown_parser.settings import setting
+from a_pompom_markdown_parser.settings import SettingsProfile, default_profile
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters, GROUP_INLINE_BUILDER
 
 
 class InlineBuilder:
     """ Inline要素と対応するHTML文字列を組み立てることを責務に持つ """
 
-    def __init__(self):
-        self._builders: list[IBuilder] = [LinkBuilder(), CodeBuilder(), ImageBuilder()]
+    def __init__(self, profile: SettingsProfile = None):
+        # 省略した場合はsettings.settingの現在の値を利用
+        profile = profile or default_profile()
+        self._builders: list[IBuilder] = [LinkBuilder(profile), CodeBuilder(profile), ImageBuilder(profile)]
+
+    def instrument(self, counters: DispatchCounters):
+        """
+        以降の組み立て処理で、ビルダごとの呼び出し回数・処理時間を記録
+
+        :param counters: 記録先
+        """
+        self._builders = counters.wrap(GROUP_INLINE_BUILDER, self._builders)
 
     def build(self, inline: Inline) -> str:
         """
@@ -28,6 +39,10 @@ class InlineBuilder:
 class IBuilder:
     """ Inline要素を解釈し、HTMLタグを表現する文字列を生成することを責務に持つ """
 
+    def __init__(self, profile: SettingsProfile = None):
+        # 省略した場合はsettings.settingの現在の値を利用
+        self._profile = profile or default_profile()
+
     def is_target(self, inline: Inline) -> bool:
         """
         Inline要素の種別がビルダと対応したものであるか判定
@@ -71,7 +86,7 @@ class LinkBuilder(IBuilder):
         anchor_tag = self.TEMPLATE.replace(
             self.HREF_EXPRESSION, href,
         ).replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['a']
+            self.CLASSNAME_EXPRESSION, self._profile.class_name['a']
         ).replace(
             self.TEXT_EXPRESSION, inline.text
         )
@@ -98,7 +113,7 @@ class CodeBuilder(IBuilder):
         """
 
         code_tag = self.TEMPLATE.replace(
-            self.CLASSNAME_EXPRESSION, setting['class_name']['code']
+            self.CLASSNAME_EXPRESSION, self._profile.class_name['code']
         ).replace(
             self.TEXT_EXPRESSION, inline.text
         )
@@ -0,0 +1,337 @@
+import collections
+import hashlib
+import os
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from a_pompom_markdown_parser.limits import Limits, LimitExceededException, SERVICE_LIMITS
+from a_pompom_markdown_parser.metrics import RenderMetrics, METRICS_PATH, CONTENT_TYPE, CACHE_HIT, CACHE_MISS, \
+    CACHE_NOT_MODIFIED, ERROR_BAD_REQUEST, ERROR_INVALID_ENCODING, ERROR_LIMIT_EXCEEDED, ERROR_NOT_FOUND, \
+    ERROR_REQUEST_TOO_LARGE, ERROR_INTERNAL
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.settings import SettingsProfile
+
+# 変換結果を保持する上限のバイト数
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# 1つの要求で受け付けるマークダウン文字列の最大バイト長 Rendererが入力のバイト数の上限を持たない場合に利用
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+# 本文を送信して変換を要求するパス
+RENDER_PATH = '/render'
+DEFAULT_HOST = '127.0.0.1'
+
+
+def compute_etag(markdown_content: bytes, profile: SettingsProfile) -> str:
+    """
+    マークダウン文字列と設定値から、変換結果を識別するETagを生成\n
+    変換結果はマークダウン文字列と設定値のみで定まるので、変換せずとも変換結果が同一か判定できる
+
+    :param markdown_content: マークダウン文字列のバイト列
+    :param profile: 変換に用いる設定値
+    :return: 強いETag 引用符を含む
+    """
+
+    digest = hashlib.sha256(profile.fingerprint.encode('ascii') + b'\0' + markdown_content).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def match_etag(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Matchヘッダが、ETagと合致するか判定\n
+    If-None-Matchの比較は弱い比較で行うので、「W/」の有無は問わない
+
+    :param if_none_match: If-None-Matchヘッダの値 「,」区切りで複数のETagを含む
+    :param etag: 比較対象のETag
+    :return: 合致 -> True, 合致しない -> False
+    """
+
+    if if_none_match.strip() == '*':
+        return True
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+class RenderCache:
+    """
+    変換結果のHTMLを、保持するバイト数の上限を超えない範囲で保持することを責務に持つ\n
+    上限を超えた場合は、最も長く参照されていないものから破棄する
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self._max_bytes = max_bytes
+        self._size = 0
+        # ETagをキーに、変換結果のバイト列を保持 末尾ほど最近参照されたもの
+        self._entries: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> bytes:
+        """
+        ETagと対応する変換結果を取得
+
+        :param etag: 変換結果を識別するETag
+        :return: 変換結果 保持していない場合はNone
+        """
+
+        with self._lock:
+            html_content = self._entries.get(etag)
+            if html_content is not None:
+                self._entries.move_to_end(etag)
+
+            return html_content
+
+    def put(self, etag: str, html_content: bytes):
+        """
+        変換結果を保持 上限を超える大きさのものは保持しない
+
+        :param etag: 変換結果を識別するETag
+        :param html_content: 変換結果
+        """
+
+        if len(html_content) > self._max_bytes:
+            return
+
+        with self._lock:
+            if etag in self._entries:
+                self._entries.move_to_end(etag)
+                return
+
+            self._entries[etag] = html_content
+            self._size += len(html_content)
+
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    @property
+    def size(self) -> int:
+        """ 保持している変換結果のバイト数の合計 """
+        return self._size
+
+
+class RenderHTTPRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTPの要求を受け取り、マークダウンをHTMLへ変換して応答することを責務に持つ\n
+    POST /render: 本文のマークダウンを変換
+    GET /metrics: 変換時間・キャッシュ・失敗の件数などのメトリクスを、Prometheusのテキスト形式で応答
+    GET /<path>: 文書ルート配下のマークダウンファイルを変換
+    """
+
+    server: 'RenderHTTPServer'
+    # 1つの接続で複数の要求を受け付ける
+    protocol_version = 'HTTP/1.1'
+    # ヘッダと本文は別々に書き込むので、Nagleアルゴリズムにより本文の送信が遅延しないようにする
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        """
+        本文のマークダウンを変換
+        """
+
+        # 要求を受け付けてから応答を送り終えるまで、待ち行列へ数える
+        with self.server.metrics.track_request():
+            if urlsplit(self.path).path != RENDER_PATH:
+                self.server.metrics.count_error(ERROR_NOT_FOUND)
+                self._send_error(HTTPStatus.NOT_FOUND, f'{RENDER_PATH}へ送信してください。')
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            # 負の長さで読み込むと、クライアントが接続を閉じるまで待機し続けてしまう
+            if length < 0:
+                self.server.metrics.count_error(ERROR_BAD_REQUEST)
+                self._send_error(HTTPStatus.BAD_REQUEST, 'Content-Lengthが不正です。')
+                self.close_connection = True
+                return
+
+            if length > self.server.max_request_size:
+                self.server.metrics.count_error(ERROR_REQUEST_TOO_LARGE)
+                self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                 f'要求が大きすぎます。上限: {self.server.max_request_size}バイト')
+                self.close_connection = True
+                return
+
+            self._respond(self.rfile.read(length))
+
+    def do_GET(self):
+        """
+        パスで指定された、文書ルート配下のマークダウンファイルを変換
+        """
+
+        # メトリクスの収集は変換の要求ではないので、待ち行列へ数えない
+        if urlsplit(self.path).path == METRICS_PATH:
+            self._send_metrics()
+            return
+
+        with self.server.metrics.track_request():
+            file_path = self._resolve_file_path()
+            if file_path is None:
+                self.server.metrics.count_error(ERROR_NOT_FOUND)
+                self._send_error(HTTPStatus.NOT_FOUND, 'ファイルが見つかりません。')
+                return
+
+            try:
+                with open(file_path, 'rb') as f:
+                    markdown_content = f.read()
+            # 存在を確かめてから読み込むまでの間に、削除されることもある
+            except FileNotFoundError:
+                self.server.metrics.count_error(ERROR_NOT_FOUND)
+                self._send_error(HTTPStatus.NOT_FOUND, 'ファイルが見つかりません。')
+                return
+            except OSError:
+                self.server.metrics.count_error(ERROR_INTERNAL)
+                self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, 'ファイルを読み込めません。')
+                return
+
+            self._respond(markdown_content)
+
+    def _resolve_file_path(self) -> str:
+        """
+        要求されたパスと対応する、文書ルート配下のファイルパスを取得
+
+        :return: ファイルパス 文書ルートが無い・文書ルートの外側を指す・ファイルが存在しない場合はNone
+        """
+
+        document_root = self.server.document_root
+        if document_root is None:
+            return None
+
+        relative_path = unquote(urlsplit(self.path).path).lstrip('/')
+        file_path = os.path.realpath(os.path.join(document_root, relative_path))
+        # 「..」などで文書ルートの外側のファイルを読み出されないようにする
+        if os.path.commonpath([document_root, file_path]) != document_root or not os.path.isfile(file_path):
+            return None
+
+        return file_path
+
+    def _respond(self, markdown_content: bytes):
+        """
+        マークダウンを変換した結果を応答\n
+        クライアントが同じETagの変換結果を保持していれば、変換せずに304を応答
+
+        :param markdown_content: マークダウン文字列のバイト列
+        """
+
+        etag = compute_etag(markdown_content, self.server.renderer.profile)
+
+        if match_etag(self.headers.get('If-None-Match', ''), etag):
+            self.server.metrics.count_cache(CACHE_NOT_MODIFIED)
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        html_content = self.server.cache.get(etag)
+        self.server.metrics.count_cache(CACHE_HIT if html_content is not None else CACHE_MISS)
+        if html_content is None:
+            try:
+                markdown_text = markdown_content.decode('utf-8')
+            except UnicodeDecodeError:
+                self.server.metrics.count_error(ERROR_INVALID_ENCODING)
+                self._send_error(HTTPStatus.BAD_REQUEST, 'マークダウン文字列はUTF-8で送信してください。')
+                return
+
+            try:
+                with self.server.metrics.measure_render(len(markdown_content)):
+                    html_content = self.server.renderer.render(markdown_text).encode('utf-8')
+            except LimitExceededException as e:
+                self.server.metrics.count_error(ERROR_LIMIT_EXCEEDED)
+                self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, e.message)
+                return
+            # 特定の入力でのみ生じる想定外の例外で、応答を返さずに接続が閉じられないよう、エラーとして応答する
+            except Exception:
+                self.server.metrics.count_error(ERROR_INTERNAL)
+                self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, '変換に失敗しました。')
+                return
+            self.server.cache.put(etag, html_content)
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(html_content)))
+        self.send_header('ETag', etag)
+        # 再利用する前に必ずETagで検証させる
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(html_content)
+
+    def _send_metrics(self):
+        """
+        メトリクスをPrometheusのテキスト形式で応答
+        """
+
+        content = self.server.metrics.registry.expose().encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        """
+        エラーメッセージを応答
+
+        :param status: 応答の状態
+        :param message: エラーメッセージ
+        """
+
+        content = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args):
+        # 要求ごとに標準エラーへ出力すると、負荷が高いときに出力処理が応答を遅らせるので出力しない
+        pass
+
+
+class RenderHTTPServer(ThreadingHTTPServer):
+    """
+    マークダウン→HTMLへの変換をHTTPで受け付けることを責務に持つ\n
+    Renderer・変換結果のキャッシュ・メトリクスは、すべての要求で共有する
+    """
+
+    # 接続ごとのスレッドは、サーバの終了を待たずに打ち切る
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], document_root: str = None, renderer: Renderer = None,
+                 cache: RenderCache = None, max_request_size: int = None, metrics: RenderMetrics = None):
+        # 文書ルート 省略した場合はパスによるファイルの指定を受け付けない
+        self.document_root = os.path.realpath(document_root) if document_root is not None else None
+        self.renderer = renderer or Renderer()
+        self.cache = cache or RenderCache()
+        # 省略した場合はRendererの入力のバイト数の上限に揃え、変換できない大きさの要求は本文を読み込む前に断る
+        self.max_request_size = max_request_size or self.renderer.limits.max_bytes or MAX_REQUEST_SIZE
+        self.metrics = metrics or RenderMetrics()
+        # キャッシュの大きさは、収集されるたびに参照する
+        self.metrics.registry.gauge('markdown_render_cache_bytes', 'Bytes of rendered HTML held in the render cache.',
+                                    function=lambda: self.cache.size)
+
+        super().__init__(address, RenderHTTPRequestHandler)
+
+
+def serve_http(port: int, document_root: str = None, host: str = DEFAULT_HOST, limits: Limits = None):
+    """
+    HTTPサーバを起動し、終了するまで変換要求を受け付ける
+
+    :param port: ポート番号
+    :param document_root: 文書ルート 省略した場合はパスによるファイルの指定を受け付けない
+    :param host: 待ち受けるアドレス 省略した場合は同じホストからの接続のみ受け付ける
+    :param limits: 受け付ける入力の大きさの上限 省略した場合はSERVICE_LIMITS
+    """
+
+    with RenderHTTPServer((host, port), document_root, Renderer(limits=limits or SERVICE_LIMITS)) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
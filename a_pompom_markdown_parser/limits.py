@@ -0,0 +1,82 @@
+import dataclasses
+
+# 上限を超えた項目
+LIMIT_BYTES = 'bytes'
+LIMIT_LINES = 'lines'
+
+# UTF-8で1文字を表すのに必要な最大のバイト数
+MAX_BYTES_PER_CHAR = 4
+
+
+class LimitExceededException(Exception):
+    """ 入力が上限を超えたため、変換できないことを表現 """
+
+    def __init__(self, message: str, limit: str):
+        self.message = message
+        # 上限を超えた項目 LIMIT_BYTES・LIMIT_LINESのいずれか
+        self.limit = limit
+        super().__init__(message)
+
+
+@dataclasses.dataclass(frozen=True)
+class Limits:
+    """
+    変換する入力の大きさの上限を表現することを責務に持つ\n
+    利用者が書いたマークダウンを受け付けるとき、1つの入力が変換処理を占有し続けないよう上限を設ける
+
+    - 文書全体(バイト数・行数): 上限を超えた場合は変換せず、LimitExceededExceptionを送出
+    - 1行(文字数・Inline要素の数): 上限を超えた行のみInline要素を解釈せず、記法を含めたテキストとして出力
+    - 目次の階層: 上限より深いヘッダは、本文には出力するが目次には含めない
+
+    いずれの項目も、省略した場合は上限を設けない すべて省略した場合は、上限の判定はほとんど処理時間を要さない
+    """
+
+    # 入力をUTF-8で表したときのバイト数の上限
+    max_bytes: int = None
+    # 入力の行数の上限
+    max_lines: int = None
+    # 1行の文字数の上限 Inline要素の正規表現は長い行ほど急激に処理時間が延びるので、解釈する前に判定する
+    max_line_length: int = None
+    # 1行に含まれるInline要素の数の上限
+    max_inline_elements: int = None
+    # 目次に含めるヘッダの階層の上限 「#」の数で表す
+    max_toc_depth: int = None
+
+    def check_bytes(self, markdown_content: str):
+        """
+        入力のバイト数が上限を超えていれば、例外を送出\n
+        UTF-8の1文字は高々4バイトなので、文字数から上限を超えないと判明すればエンコードを省略できる
+
+        :param markdown_content: マークダウン文字列
+        """
+
+        if self.max_bytes is None or len(markdown_content) * MAX_BYTES_PER_CHAR <= self.max_bytes:
+            return
+
+        if len(markdown_content) > self.max_bytes or len(markdown_content.encode('utf-8')) > self.max_bytes:
+            raise LimitExceededException(f'入力が大きすぎます。上限: {self.max_bytes}バイト', LIMIT_BYTES)
+
+    def check_lines(self, line_count: int):
+        """
+        入力の行数が上限を超えていれば、例外を送出
+
+        :param line_count: 入力の行数
+        """
+
+        if self.max_lines is not None and line_count > self.max_lines:
+            raise LimitExceededException(f'入力の行数が多すぎます。上限: {self.max_lines}行', LIMIT_LINES)
+
+    def exceeds_line_length(self, line: str) -> bool:
+        """
+        1行の文字数が上限を超えているか判定
+
+        :param line: 判定対象行
+        :return: 上限を超えている -> True, それ以外 -> False
+        """
+        return self.max_line_length is not None and len(line) > self.max_line_length
+
+
+# 上限を設けない場合に利用
+NO_LIMITS = Limits()
+# 常駐プロセス・HTTPサーバの既定の上限 通常の文書は収まり、1つの要求が変換処理を占有し続けない程度とする
+SERVICE_LIMITS = Limits(max_bytes=4 * 1024 * 1024, max_lines=100_000, max_line_length=10_000, max_inline_elements=1_000)
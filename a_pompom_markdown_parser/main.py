@@ -1,15 +1,91 @@
+import copy
+import dataclasses
 import os
 import sys
+import threading
+from typing import Generator
 
 from a_pompom_markdown_parser.markdown.parser import MarkdownParser
 from a_pompom_markdown_parser.converter.converter import Converter
-from a_pompom_markdown_parser.html.builder import HtmlBuilder
+from a_pompom_markdown_parser.renderer import Renderer, DEFAULT_FLUSH_SIZE
+from a_pompom_markdown_parser.exporter.ndjson_exporter import NdjsonExporter
+from a_pompom_markdown_parser.daemon import serve, DaemonException
+from a_pompom_markdown_parser.http_server import serve_http
+from a_pompom_markdown_parser.batch import convert_files, UnsupportedBackendException, DuplicateOutputException, \
+    BACKENDS, BACKEND_PROCESS
+from a_pompom_markdown_parser.worker_pool import RecyclePolicy
+from a_pompom_markdown_parser.stats import RenderStats
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters
+from a_pompom_markdown_parser.profiling import SlowDocumentLog
+from a_pompom_markdown_parser.trace import TraceRecorder
+from a_pompom_markdown_parser.metrics import RenderMetrics
+from a_pompom_markdown_parser.limits import Limits, SERVICE_LIMITS
+from a_pompom_markdown_parser import settings
 
 # コマンドライン引数定義
 ARG_POS_IN_FILE = 1
 ARG_POS_OUT_FILE = 2
 IN_AND_OUT_ARG_COUNT = 3
 
+# オプション 「--name value」の形式で指定
+OPTION_PREFIX = '--'
+OPTION_FORMAT = '--format'
+FORMAT_HTML = 'html'
+FORMAT_NDJSON = 'ndjson'
+FORMATS = [FORMAT_HTML, FORMAT_NDJSON]
+# 指定した場合、入出力ファイルの代わりにUnixドメインソケットのパスを受け取り、常駐プロセスとして起動
+OPTION_SERVE = '--serve'
+# 指定した場合、入出力ファイルの代わりにポート番号を受け取り、HTTPサーバとして起動
+OPTION_HTTP = '--http'
+# HTTPサーバでパスと対応するマークダウンファイルを探索する文書ルート
+OPTION_ROOT = '--root'
+# 指定した場合、出力先ディレクトリを受け取り、入力ファイルを複数受け付けて一括変換
+OPTION_BATCH = '--batch'
+# 一括変換するときのワーカープロセス数
+OPTION_JOBS = '--jobs'
+# 一括変換するときのワーカーの実行方式 thread・process・interpreterのいずれか
+OPTION_BACKEND = '--backend'
+# 一括変換するとき、ワーカープロセスが処理する変換の数の上限 上限に達したワーカーは入れ替える
+OPTION_MAX_TASKS_PER_CHILD = '--max-tasks-per-child'
+# 一括変換するとき、ワーカープロセスの常駐メモリの上限[MiB] 上限を超えたワーカーは入れ替える
+OPTION_MAX_RSS = '--max-rss'
+# 指定した場合、変換処理の段階ごとの時間・入出力の大きさと、パーサ・ビルダごとの呼び出し回数・処理時間を標準エラーへ出力
+OPTION_STATS = '--stats'
+# 指定した場合、行ごとのパース処理を計測し、処理時間の長い行を指定した件数だけ標準エラーへ出力
+OPTION_PROFILE_LINES = '--profile-lines'
+# 一括変換・常駐プロセスで、変換時間が閾値を超えた文書を保存するディレクトリ
+OPTION_SLOW_LOG = '--slow-log'
+# 文書を保存する変換時間の閾値[ms]
+OPTION_SLOW_THRESHOLD = '--slow-threshold'
+DEFAULT_SLOW_THRESHOLD = '1000'
+# 変換処理の区間を、Perfettoで読み込めるChrome Trace Event形式のJSONとして書き出すファイル
+OPTION_TRACE = '--trace'
+# 常駐プロセスで、メトリクスをPrometheusのテキスト形式で公開するポート番号 HTTPサーバでは常に/metricsで公開する
+OPTION_METRICS_PORT = '--metrics-port'
+# 一括変換で、メトリクスをPrometheusのテキスト形式で書き出すファイル
+OPTION_METRICS_FILE = '--metrics-file'
+# 常駐プロセス・HTTPサーバで受け付ける入力の上限 省略した項目はSERVICE_LIMITSの上限とし、0を指定した項目は上限を設けない
+OPTION_MAX_BYTES = '--max-bytes'
+OPTION_MAX_LINES = '--max-lines'
+OPTION_MAX_LINE_LENGTH = '--max-line-length'
+OPTION_MAX_INLINE_ELEMENTS = '--max-inline-elements'
+OPTION_MAX_TOC_DEPTH = '--max-toc-depth'
+# オプションと、対応するLimitsの項目名
+LIMIT_OPTIONS = {
+    OPTION_MAX_BYTES: 'max_bytes',
+    OPTION_MAX_LINES: 'max_lines',
+    OPTION_MAX_LINE_LENGTH: 'max_line_length',
+    OPTION_MAX_INLINE_ELEMENTS: 'max_inline_elements',
+    OPTION_MAX_TOC_DEPTH: 'max_toc_depth',
+}
+# 値を取らないオプション 指定された場合は空文字を値とする
+FLAG_OPTIONS = [OPTION_STATS]
+
+# 変換処理で共有するパイプラインと、組み立てたときのsettings.settingの複製
+# Rendererは複数のスレッドから同時に呼び出してもよいので、1つを使い回す 組にして保持し、両者を不整合なく読み出す
+_default_pipeline: tuple[dict, Renderer] = (copy.deepcopy(settings.setting), Renderer())
+_default_pipeline_lock = threading.Lock()
+
 
 class InvalidArgumentException(Exception):
     """ コマンドライン引数に問題があったことを表現 """
@@ -19,45 +95,233 @@ class InvalidArgumentException(Exception):
         super().__init__(message)
 
 
-def validate_args():
+def extract_options(args: list[str]) -> tuple[list[str], dict[str, str]]:
+    """
+    コマンドライン引数から「--name value」形式のオプションを取り出す 値を取らないオプションは「--name」の形式
+
+    :param args: コマンドライン引数
+    :return: オプションを除いたコマンドライン引数と、オプション名をキー・値を値とする辞書
+    """
+
+    positional_args = []
+    options = {}
+
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if not arg.startswith(OPTION_PREFIX):
+            positional_args.append(arg)
+            index += 1
+            continue
+
+        if arg in FLAG_OPTIONS:
+            options[arg] = ''
+            index += 1
+            continue
+
+        if index + 1 >= len(args):
+            raise InvalidArgumentException(f'オプション: "{arg}"の値を指定してください。')
+
+        options[arg] = args[index + 1]
+        index += 2
+
+    return positional_args, options
+
+
+def validate_args(args: list[str] = None):
     """
     コマンドライン引数を検証
+
+    :param args: オプションを除いたコマンドライン引数 省略した場合はsys.argvを検証
     """
+    if args is None:
+        args = sys.argv
 
     # 引数の数
-    if len(sys.argv) != IN_AND_OUT_ARG_COUNT:
+    if len(args) != IN_AND_OUT_ARG_COUNT:
         raise InvalidArgumentException('入力ファイルパス, 出力ファイルパスを指定してください。')
 
     # 入力ファイルがあるか
-    if not os.path.exists(sys.argv[ARG_POS_IN_FILE]):
+    if not os.path.exists(args[ARG_POS_IN_FILE]):
         raise InvalidArgumentException('入力ファイルが見つかりません。')
 
     # 出力ファイルが出力できるか
     try:
-        f = open(sys.argv[ARG_POS_OUT_FILE], 'w')
+        f = open(args[ARG_POS_OUT_FILE], 'w')
     except OSError:
-        raise InvalidArgumentException(f'出力先: "{sys.argv[ARG_POS_OUT_FILE]}"は無効です。')
+        raise InvalidArgumentException(f'出力先: "{args[ARG_POS_OUT_FILE]}"は無効です。')
+
+
+def validate_options(options: dict[str, str]):
+    """
+    オプションを検証
+
+    :param options: オプション名をキー・値を値とする辞書
+    """
+
+    output_format = options.get(OPTION_FORMAT, FORMAT_HTML)
+    if output_format not in FORMATS:
+        raise InvalidArgumentException(f'出力形式: "{output_format}"は無効です。{", ".join(FORMATS)}のいずれかを指定してください。')
+
+    for option in [OPTION_STATS, OPTION_PROFILE_LINES, OPTION_TRACE]:
+        if option in options and output_format != FORMAT_HTML:
+            raise InvalidArgumentException(f'{option}は出力形式: "{FORMAT_HTML}"でのみ指定できます。')
+
+    # 区間を記録する処理が段階ごとの時間を歪めるので、同時には計測しない
+    if OPTION_STATS in options and OPTION_TRACE in options:
+        raise InvalidArgumentException(f'{OPTION_STATS}と{OPTION_TRACE}は同時に指定できません。')
+
+    top_count = options.get(OPTION_PROFILE_LINES, '1')
+    if not top_count.isdigit() or int(top_count) < 1:
+        raise InvalidArgumentException(f'{OPTION_PROFILE_LINES}: "{top_count}"は無効です。')
+
+
+def validate_port(port: str) -> int:
+    """
+    ポート番号を検証
+
+    :param port: ポート番号の文字列
+    :return: ポート番号
+    """
+
+    if not port.isdigit() or not 0 <= int(port) <= 65535:
+        raise InvalidArgumentException(f'ポート番号: "{port}"は無効です。')
+
+    return int(port)
+
+
+def validate_batch_args(in_file_paths: list[str], options: dict[str, str]):
+    """
+    一括変換のコマンドライン引数を検証
+
+    :param in_file_paths: 入力ファイルパス
+    :param options: オプション名をキー・値を値とする辞書
+    """
+
+    if len(in_file_paths) == 0:
+        raise InvalidArgumentException('入力ファイルパスを指定してください。')
+
+    for in_file_path in in_file_paths:
+        if not os.path.isfile(in_file_path):
+            raise InvalidArgumentException(f'入力ファイル: "{in_file_path}"が見つかりません。')
+
+    if not os.path.isdir(options[OPTION_BATCH]):
+        raise InvalidArgumentException(f'出力先: "{options[OPTION_BATCH]}"はディレクトリではありません。')
+
+    # 省略した場合はCPU数とする
+    jobs = options.get(OPTION_JOBS)
+    if jobs is not None and (not jobs.isdigit() or int(jobs) < 1):
+        raise InvalidArgumentException(f'ワーカー数: "{jobs}"は無効です。')
+
+    backend = options.get(OPTION_BACKEND, BACKEND_PROCESS)
+    if backend not in BACKENDS:
+        raise InvalidArgumentException(f'実行方式: "{backend}"は無効です。{BACKENDS}のいずれかを指定してください。')
+
+    for option in [OPTION_MAX_TASKS_PER_CHILD, OPTION_MAX_RSS]:
+        if option in options and (not options[option].isdigit() or int(options[option]) < 1):
+            raise InvalidArgumentException(f'{option}: "{options[option]}"は無効です。')
+
+
+def build_recycle_policy(options: dict[str, str]) -> RecyclePolicy:
+    """
+    コマンドライン引数から、一括変換でワーカープロセスを入れ替える条件を組み立てる\n
+    入れ替えるたびに標準エラーへ出力するので、長時間の一括変換でも進行中に把握できる
+
+    :param options: オプション名をキー・値を値とする辞書
+    :return: ワーカープロセスを入れ替える条件 いずれも指定されていない場合はNone
+    """
+
+    if OPTION_MAX_TASKS_PER_CHILD not in options and OPTION_MAX_RSS not in options:
+        return None
+
+    max_tasks_per_child = options.get(OPTION_MAX_TASKS_PER_CHILD)
+    max_rss = options.get(OPTION_MAX_RSS)
 
+    return RecyclePolicy(
+        max_tasks_per_child=int(max_tasks_per_child) if max_tasks_per_child is not None else None,
+        max_rss=int(max_rss) * 1024 * 1024 if max_rss is not None else None,
+        on_recycle=lambda event: print(f'recycled worker {event.pid}: {event.reason} '
+                                       f'(tasks: {event.tasks}, rss: {event.rss})', file=sys.stderr)
+    )
 
-def parse_md_to_html(in_file_path: str, out_file_path: str):
+
+def build_slow_log(options: dict[str, str]) -> SlowDocumentLog:
+    """
+    コマンドライン引数から、変換時間が閾値を超えた文書の保存先を組み立てる
+
+    :param options: オプション名をキー・値を値とする辞書
+    :return: 文書の保存先 保存先のディレクトリが指定されていない場合はNone
+    """
+
+    if OPTION_SLOW_LOG not in options:
+        return None
+
+    threshold = options.get(OPTION_SLOW_THRESHOLD, DEFAULT_SLOW_THRESHOLD)
+    if not threshold.isdigit():
+        raise InvalidArgumentException(f'{OPTION_SLOW_THRESHOLD}: "{threshold}"は無効です。')
+
+    return SlowDocumentLog(options[OPTION_SLOW_LOG], int(threshold) / 1000)
+
+
+def build_limits(options: dict[str, str]) -> Limits:
+    """
+    コマンドライン引数から、常駐プロセス・HTTPサーバで受け付ける入力の上限を組み立てる
+
+    :param options: オプション名をキー・値を値とする辞書
+    :return: 入力の上限 指定されていない項目はSERVICE_LIMITSの上限
+    """
+
+    values = {}
+    for option, field in LIMIT_OPTIONS.items():
+        if option not in options:
+            continue
+        if not options[option].isdigit():
+            raise InvalidArgumentException(f'{option}: "{options[option]}"は無効です。')
+        values[field] = int(options[option]) or None
+
+    return dataclasses.replace(SERVICE_LIMITS, **values)
+
+
+def get_default_renderer() -> Renderer:
+    """
+    変換処理で共有するパイプラインを取得\n
+    Rendererは生成時の設定値で変換するので、実行中にsettings.settingが書き換えられた場合は組み立て直す
+
+    :return: settings.settingの現在の値で変換するRenderer
+    """
+
+    global _default_pipeline
+
+    # 設定値は小さな辞書なので、変換のたびに比較しても変換時間と比べて無視できる
+    pipeline_setting, renderer = _default_pipeline
+    if pipeline_setting == settings.setting:
+        return renderer
+
+    with _default_pipeline_lock:
+        pipeline_setting, renderer = _default_pipeline
+        if pipeline_setting != settings.setting:
+            pipeline_setting = copy.deepcopy(settings.setting)
+            renderer = Renderer(settings.SettingsProfile.from_dict(pipeline_setting))
+            _default_pipeline = (pipeline_setting, renderer)
+
+    return renderer
+
+
+def parse_md_to_html(in_file_path: str, out_file_path: str, stats: RenderStats = None,
+                     counters: DispatchCounters = None, trace: TraceRecorder = None):
     """
     マークダウン→HTMLへ変換するメイン処理
 
     :param in_file_path: 入力マークダウンファイルパス
     :param out_file_path: 出力HTMLファイルパス
+    :param stats: 段階ごとの時間・入出力の大きさの記録先 省略した場合は計測しない
+    :param counters: パーサ・ビルダごとの呼び出し回数・処理時間の記録先 省略した場合は記録しない
+    :param trace: ファイルの読み書き・変換処理の区間の記録先 省略した場合は記録しない
     """
 
-    # マークダウンをパース
-    with open(in_file_path, 'r') as f:
-        # 改行コードはHTMLを組み立てるときに制御するので、入力からは除外しておく
-        markdown_parse_result = MarkdownParser().parse(f.read().splitlines())
-
-    # マークダウン・HTMLを中継
-    html_input = Converter().convert(markdown_parse_result)
-
-    # 変換結果HTMLを生成
-    with open(out_file_path, 'w') as fw:
-        fw.write(HtmlBuilder().build(html_input))
+    # 記録するパーサ・ビルダは他の変換と共有しないよう、記録先ごとにパイプラインを組み立てる
+    renderer = Renderer(counters=counters) if counters is not None else get_default_renderer()
+    renderer.render_file(in_file_path, out_file_path, stats=stats, trace=trace)
 
 
 def parse_md_to_html_by_string(markdown_content: str) -> str:
@@ -67,11 +331,39 @@ def parse_md_to_html_by_string(markdown_content: str) -> str:
     :param markdown_content: マークダウン形式の文字列
     :return: HTML形式の文字列
     """
-    markdown_parse_result = MarkdownParser().parse(markdown_content.splitlines())
+    return get_default_renderer().render(markdown_content)
+
+
+def parse_md_to_html_chunks(markdown_content: str,
+                            flush_size: int = DEFAULT_FLUSH_SIZE) -> Generator[str, None, None]:
+    """
+    マークダウン文字列を先頭から変換し、HTML文字列を少しずつ出力\n
+    出力を連結したものは、parse_md_to_html_by_stringの変換結果と一致する
+
+    :param markdown_content: マークダウン形式の文字列
+    :param flush_size: まとめて出力する文字数の目安 最上位のBlock要素の途中では区切らない 0以下の場合はBlock要素ごとに出力
+    :return: ループで参照される度、HTML文字列の断片を返却
+    """
+    return get_default_renderer().render_chunks(markdown_content, flush_size)
+
+
+def parse_md_to_ndjson(in_file_path: str, out_file_path: str):
+    """
+    マークダウンを、最上位のBlock要素ごとに1行のJSONとしたNDJSONへ変換\n
+    変換できたBlock要素から順に書き出すので、パース結果・変換結果の全体は保持せずに済む\n
+    ただし、行の種別の判定・コードブロックの終了要素の探索は後続の行を参照するので、入力ファイルは全体を読み込んでから解釈する
+
+    :param in_file_path: 入力マークダウンファイルパス
+    :param out_file_path: 出力NDJSONファイルパス
+    """
+
+    with open(in_file_path, 'r') as f:
+        lines = f.read().splitlines()
 
-    html_input = Converter().convert(markdown_parse_result)
+    blocks = Converter().convert_iter(MarkdownParser().parse_iter(lines))
 
-    return HtmlBuilder().build(html_input)
+    with open(out_file_path, 'w') as fw:
+        NdjsonExporter().export(blocks, fw)
 
 
 def execute():
@@ -79,12 +371,62 @@ def execute():
     マークダウン文字列をHTMLへ変換
     """
     try:
-        validate_args()
-    except InvalidArgumentException as e:
+        args, options = extract_options(sys.argv)
+        if OPTION_SERVE in options:
+            metrics_port = options.get(OPTION_METRICS_PORT)
+            serve(options[OPTION_SERVE], build_slow_log(options),
+                  validate_port(metrics_port) if metrics_port is not None else None, build_limits(options))
+            return
+        if OPTION_HTTP in options:
+            serve_http(validate_port(options[OPTION_HTTP]), options.get(OPTION_ROOT), limits=build_limits(options))
+            return
+        if OPTION_BATCH in options:
+            in_file_paths = args[ARG_POS_IN_FILE:]
+            validate_batch_args(in_file_paths, options)
+            trace = TraceRecorder() if OPTION_TRACE in options else None
+            metrics = RenderMetrics() if OPTION_METRICS_FILE in options else None
+            # 出力ファイル名の重複は、変換単位を組み立てるときに判定する
+            try:
+                jobs = int(options[OPTION_JOBS]) if OPTION_JOBS in options else None
+                report = convert_files(in_file_paths, options[OPTION_BATCH], jobs=jobs,
+                                       recycle_policy=build_recycle_policy(options),
+                                       backend=options.get(OPTION_BACKEND),
+                                       slow_log=build_slow_log(options), trace=trace, metrics=metrics)
+            except DuplicateOutputException as e:
+                raise InvalidArgumentException(e.message)
+            print(report.format())
+            if trace is not None:
+                trace.write(options[OPTION_TRACE])
+            if metrics is not None:
+                metrics.registry.write(options[OPTION_METRICS_FILE])
+            return
+
+        validate_args(args)
+        validate_options(options)
+    except (InvalidArgumentException, DaemonException, UnsupportedBackendException) as e:
         print(e.message)
         sys.exit(1)
 
-    parse_md_to_html(sys.argv[ARG_POS_IN_FILE], sys.argv[ARG_POS_OUT_FILE])
+    if options.get(OPTION_FORMAT, FORMAT_HTML) == FORMAT_NDJSON:
+        parse_md_to_ndjson(args[ARG_POS_IN_FILE], args[ARG_POS_OUT_FILE])
+        return
+
+    stats = RenderStats() if OPTION_STATS in options else None
+    counters = DispatchCounters() if OPTION_STATS in options else None
+    trace = TraceRecorder() if OPTION_TRACE in options else None
+    parse_md_to_html(args[ARG_POS_IN_FILE], args[ARG_POS_OUT_FILE], stats, counters, trace)
+
+    if trace is not None:
+        trace.write(options[OPTION_TRACE])
+
+    # 標準出力へ変換結果を書き出す使い方を妨げないよう、標準エラーへ出力
+    if stats is not None:
+        print(stats.format(), file=sys.stderr)
+        print(counters.format(), file=sys.stderr)
+    if OPTION_PROFILE_LINES in options:
+        with open(args[ARG_POS_IN_FILE], 'r') as f:
+            profile = get_default_renderer().profile_lines(f.read())
+        print(profile.format(int(options[OPTION_PROFILE_LINES])), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -1,3 +1,4 @@
+from a_pompom_markdown_parser.cancellation import CancellationToken, STAGE_PARSE
 from a_pompom_markdown_parser.regex import regex
 from a_pompom_markdown_parser.element.inline import Inline, PlainInline, LinkInline, CodeInline, ImageInline
 
@@ -18,28 +19,97 @@ class InlineParser:
         """
 
         children = []
+        self._parse_into(text, children)
+        return children
 
-        for parser in self.parsers:
-            # Inline要素が存在したとき、ただInline要素を抜き出すだけでは元のテキストのどの部分が対応していたか判別できない
-            # 順序関係を維持し、複数のInline要素にも対応できるよう、前後の文字列も抜き出す
-            if parser.is_target(text):
-                head, inline_text, tail = parser.extract_text(text)
-                inline = parser.parse(inline_text)
+    def parse_limited(self, text: str, max_elements: int = None, token: CancellationToken = None,
+                      line_number: int = None) -> list[Inline]:
+        """
+        マークダウンの文字列をInline要素へ分割 Inline要素の数が上限を超えた場合は、記法を含めたテキストのまま扱う\n
+        上限を超えた時点で分割を打ち切るので、残りの文字列の解釈に時間を費やさない
 
-                # 前方
-                if head:
-                    children = [*children, *self.parse(head)]
+        :param text: 対象文字列
+        :param max_elements: Inline要素の数の上限 省略した場合は上限を設けない
+        :param token: 変換の取り消し・制限時間 前後の文字列を分割するたびに確認 省略した場合は打ち切らない
+        :param line_number: 対象文字列の行番号(1始まり) 打ち切ったときの例外へ添える
+        :return: Block要素が持つ子要素
+        """
+
+        if max_elements is None and token is None:
+            return self.parse(text)
+
+        children = []
+        if not self._parse_into(text, children, max_elements, token, line_number):
+            return [create_plain_inline(text)]
 
-                # Inline
-                children.append(inline)
+        return children
 
-                # 後方
+    def _parse_into(self, text: str, children: list[Inline], max_elements: int = None,
+                    token: CancellationToken = None, line_number: int = None) -> bool:
+        """
+        マークダウンの文字列をInline要素へ分割し、子要素へ先頭から順に追加\n
+        前後の文字列の分割は再帰呼び出しではなくスタックで辿るので、Inline要素の多い行でも呼び出しの深さは増えない
+
+        :param text: 対象文字列
+        :param children: 分割したInline要素の追加先
+        :param max_elements: Inline要素の数の上限 省略した場合は上限を設けない
+        :param token: 変換の取り消し・制限時間 省略した場合は打ち切らない
+        :param line_number: 対象文字列の行番号(1始まり)
+        :return: 上限を超えずに分割できた -> True, 上限を超えたため打ち切った -> False
+        """
+
+        # 積む要素は(文字列, 分割の深さ, パーサ) パーサがNoneの場合はさらに分割する文字列、それ以外はInline要素文字列
+        # 先頭から順に子要素へ追加できるよう、後に処理するものほど先に積む
+        stack: list[tuple[str, int, IParser]] = [(text, 1, None)]
+        # 抜き出したものの、子要素へまだ追加していないInline要素の数
+        pending = 0
+
+        while stack:
+            text, depth, parser = stack.pop()
+            if parser is not None:
+                children.append(parser.parse(text))
+                pending -= 1
+                continue
+
+            # 1行に多くのInline要素を含む場合も、行を処理し終えるのを待たずに打ち切れるよう、分割するたびに確認
+            if token is not None:
+                token.check(STAGE_PARSE, line_number)
+
+            extracted = self._extract(text, depth)
+            if extracted is None:
+                children.append(PlainInline(text=text))
+            else:
+                head, parser, inline_text, tail = extracted
                 if tail:
-                    children = [*children, *self.parse(tail)]
+                    stack.append((tail, depth + 1, None))
+                stack.append((inline_text, depth, parser))
+                if head:
+                    stack.append((head, depth + 1, None))
+                pending += 1
 
-                return children
+            # 追加待ちのInline要素もいずれ子要素となるので、前方の文字列を分割し終えるのを待たずに打ち切る
+            if max_elements is not None and len(children) + pending > max_elements:
+                return False
 
-        return [PlainInline(text=text)]
+        return True
+
+    def _extract(self, text: str, depth: int) -> tuple[str, 'IParser', str, str]:
+        """
+        文字列に含まれるInline要素を1つ抜き出す
+
+        :param text: 対象文字列
+        :param depth: 行全体を1とした、対象文字列を分割した深さ
+        :return: 先頭, 対応するパーサ, Inline要素文字列, 末尾を格納したタプル Inline要素を含まない場合はNone
+        """
+
+        for parser in self.parsers:
+            # Inline要素が存在したとき、ただInline要素を抜き出すだけでは元のテキストのどの部分が対応していたか判別できない
+            # 順序関係を維持し、複数のInline要素にも対応できるよう、前後の文字列も抜き出す
+            if parser.is_target(text):
+                head, inline_text, tail = parser.extract_text(text)
+                return head, parser, inline_text, tail
+
+        return None
 
 
 class IParser:
@@ -171,3 +241,61 @@ def create_plain_inline(markdown_text: str) -> PlainInline:
     :return: 元の文字列をそのまま格納したInline要素
     """
     return PlainInline(text=markdown_text)
+
+
+class LazyInlineChildren(list):
+    """
+    Inline要素の記法を含むテキストを保持し、初めて参照されたときにInline要素へ解釈するBlock要素の子要素\n
+    listとして振る舞うので、コンバータ・ビルダは通常の子要素と区別せずに扱うことができる\n
+    見出しの一覧やBlock要素の数のようにBlock要素の構造のみを参照する場合は、Inline要素のパース処理を省略できる
+    """
+
+    def __init__(self, inline_parser: InlineParser, text: str, max_elements: int = None):
+        super().__init__()
+        self._inline_parser = inline_parser
+        self.text = text
+        # Inline要素の数の上限 InlineParser.parse_limitedへ渡す
+        self._max_elements = max_elements
+        self._is_parsed = False
+
+    def _parse(self):
+        """
+        未解釈であれば、保持しているテキストをInline要素へ解釈して格納\n
+        複数のスレッドから同時に参照された場合は二重に解釈されうるが、スライスへの代入は要素を置き換えるだけなので、結果は変わらない
+        """
+
+        if self._is_parsed:
+            return
+
+        list.__setitem__(self, slice(None), self._inline_parser.parse_limited(self.text, self._max_elements))
+        self._is_parsed = True
+
+    def __reduce_ex__(self, protocol):
+        # pickle・copyでは解釈済みの通常のlistとして扱う
+        self._parse()
+        return list, (list(self),)
+
+
+def _delegate_after_parse(name: str):
+    """
+    Inline要素を解釈してから、listのメソッドを呼び出すメソッドを生成
+
+    :param name: listのメソッド名
+    :return: LazyInlineChildrenのメソッド
+    """
+    list_method = getattr(list, name)
+
+    def method(self: LazyInlineChildren, *args, **kwargs):
+        self._parse()
+        return list_method(self, *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+# 要素を参照・変更するメソッドはすべて、解釈を済ませてからlistの処理へ委譲
+for _name in ['__iter__', '__len__', '__getitem__', '__contains__', '__reversed__', '__repr__',
+              '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__',
+              '__add__', '__iadd__', '__mul__', '__rmul__', '__imul__', '__setitem__', '__delitem__',
+              'append', 'extend', 'insert', 'pop', 'remove', 'index', 'count', 'copy', 'sort', 'reverse', 'clear']:
+    setattr(LazyInlineChildren, _name, _delegate_after_parse(_name))
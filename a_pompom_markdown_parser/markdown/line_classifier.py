@@ -0,0 +1,147 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 行の種別コード
+# 各行は先頭数バイトを参照すれば、Block要素の記法を含みうるか判別できる
+# 判別結果を前もって求めておくことで、記法を含まない行は各パーサのis_targetによる正規表現の照合を省略できる
+# ※ 種別はあくまで「候補」を表現し、記法として成立するかの最終判定は各パーサが責務を持つ
+
+# Block要素の記法を含まない行 段落となる
+KIND_PLAIN = 0
+# Block要素の記法を含みうる行 「#」「>」「*」「-」「[」から始まる
+KIND_BLOCK_CANDIDATE = 1
+# コードブロックの開始・終了を含みうる行 「`」から始まる
+KIND_CODE_FENCE_CANDIDATE = 2
+# Inline要素の記法を含みうるか表すフラグ 種別とビット和で組み合わせる
+# リンク・画像は「[」・コードは「`」を必ず含むので、どちらも含まない行はInline要素のパースを省略できる
+FLAG_INLINE_CANDIDATE = 4
+
+BLOCK_NOTATION_HEAD = '#>*-['
+CODE_FENCE_HEAD = '`'
+
+# NumPyによるベクトル化の方が速くなる行数の下限
+# 配列を組み立てる固定コストがあるため、小さな文書では純Pythonの方が速い
+# benchmark/line_classifier_benchmark.pyの計測結果をもとに設定
+NUMPY_THRESHOLD_LINES = 500
+
+LINE_FEED = ord('\n')
+
+
+def classify_line(line: str) -> int:
+    """
+    1行の種別コードを判定
+
+    :param line: 判定対象行
+    :return: 種別コード
+    """
+
+    head = line[:1]
+    if head == '':
+        kind = KIND_PLAIN
+    elif head in BLOCK_NOTATION_HEAD:
+        kind = KIND_BLOCK_CANDIDATE
+    elif head == CODE_FENCE_HEAD:
+        kind = KIND_CODE_FENCE_CANDIDATE
+    else:
+        kind = KIND_PLAIN
+
+    if '[' in line or '`' in line:
+        kind |= FLAG_INLINE_CANDIDATE
+
+    return kind
+
+
+def classify_lines_python(lines: list[str]) -> list[int]:
+    """
+    純Pythonで全行の種別コードを判定 NumPyが利用できない、あるいは小さな文書で利用
+
+    :param lines: 判定対象の行リスト
+    :return: 行と対応する種別コードのリスト
+    """
+    return [classify_line(line) for line in lines]
+
+
+def find_line_offsets(buffer: bytes) -> 'numpy.ndarray':
+    """
+    改行コード「\\n」で区切られたバイト列から、各行の開始位置を抽出
+
+    :param buffer: 文書全体を表現するバイト列
+    :return: 各行の開始オフセット
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    return numpy.concatenate(([0], numpy.flatnonzero(data == LINE_FEED) + 1))
+
+
+def classify_buffer(buffer: bytes, offsets: 'numpy.ndarray') -> list[int]:
+    """
+    文書全体のバイト列・行の開始オフセットをもとに、全行の種別コードをベクトル化して判定\n
+    UTF-8では記法の文字はASCIIとしてのみ出現するので、バイト単位で判定しても文字単位の判定と一致する
+
+    :param buffer: 文書全体を表現するバイト列 行は「\\n」で区切られる
+    :param offsets: 各行の開始オフセット
+    :return: 行と対応する種別コードのリスト
+    """
+
+    # 末尾の空行は開始位置がバッファの長さと一致するので、番兵を置いて範囲外参照を防ぐ
+    data = numpy.frombuffer(buffer + b'\n', dtype=numpy.uint8)
+    heads = data[offsets]
+
+    is_block = numpy.isin(heads, numpy.frombuffer(BLOCK_NOTATION_HEAD.encode(), dtype=numpy.uint8))
+    is_code_fence = heads == ord(CODE_FENCE_HEAD)
+
+    # 記法の文字が出現した位置を、その位置を含む行へ対応づけることで各行が記法を含むか求める
+    # 記法の文字は文書全体から見ると疎なので、全バイトを集計するより出現位置のみを扱う方が速い
+    positions = numpy.flatnonzero((data == ord('[')) | (data == ord('`')))
+    has_inline = numpy.zeros(len(offsets), dtype=numpy.int64)
+    has_inline[numpy.searchsorted(offsets, positions, side='right') - 1] = 1
+
+    kinds = (is_block * KIND_BLOCK_CANDIDATE
+             + is_code_fence * KIND_CODE_FENCE_CANDIDATE
+             + has_inline * FLAG_INLINE_CANDIDATE)
+    return kinds.tolist()
+
+
+def classify_lines_numpy(lines: list[str]) -> list[int]:
+    """
+    NumPyで全行の種別コードを判定
+
+    :param lines: 判定対象の行リスト
+    :return: 行と対応する種別コードのリスト
+    """
+
+    # 孤立したサロゲートを含む文字列もバイト列へ変換できるよう、surrogatepassを指定
+    buffer = '\n'.join(lines).encode('utf-8', 'surrogatepass')
+    offsets = find_line_offsets(buffer)
+
+    # 行の中に改行コードが含まれていた場合、行とオフセットが対応しなくなるので純Pythonで判定
+    if len(offsets) != len(lines):
+        return classify_lines_python(lines)
+
+    return classify_buffer(buffer, offsets)
+
+
+def classify_lines(lines: list[str]) -> list[int]:
+    """
+    全行の種別コードを判定\n
+    NumPyが利用でき、かつ文書が十分に大きい場合はベクトル化した処理を利用
+
+    :param lines: 判定対象の行リスト
+    :return: 行と対応する種別コードのリスト
+    """
+
+    if numpy is None or len(lines) < NUMPY_THRESHOLD_LINES:
+        return classify_lines_python(lines)
+
+    return classify_lines_numpy(lines)
+
+
+def is_inline_candidate(kind: int) -> bool:
+    """
+    種別コードがInline要素の記法を含みうるか判定
+
+    :param kind: 種別コード
+    :return: 含みうる -> True, 含まない -> False
+    """
+    return kind & FLAG_INLINE_CANDIDATE != 0
@@ -0,0 +1,203 @@
+import bisect
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from a_pompom_markdown_parser.element import codec
+from a_pompom_markdown_parser.element.block import ParseResult
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.markdown.multi_line_parser import MultiLineParser
+from a_pompom_markdown_parser.markdown.line_classifier import classify_lines, KIND_CODE_FENCE_CANDIDATE
+from a_pompom_markdown_parser.shared_buffer import Segment, SharedArena, SegmentWriter, read_segment
+
+# 行範囲 開始・終了のインデックスをいずれも含む
+LineRange = tuple[int, int]
+
+# パース結果を受け取る領域として、分割した範囲のバイト数に対してこの倍率の大きさを確保
+# 収まらなかったパース結果はpickleで受け渡す
+PARSE_OUTPUT_RATIO = 4
+
+# ワーカープロセスで使い回すパーサ
+_worker_parser: MarkdownParser = None
+
+
+def find_code_block_ranges(lines: list[str], kinds: list[int]) -> list[LineRange]:
+    """
+    コードブロックの開始「```」から終了「```」までの行範囲を抽出\n
+    コードブロックの開始要素は、次にコードブロックの記法と合致する行で閉じられるので、記法と合致する行を2つずつ組にすればよい
+
+    :param lines: 入力テキスト
+    :param kinds: 各行の種別コード
+    :return: コードブロックの行範囲のリスト 終了要素の無いものは末尾の行までを範囲とする
+    """
+
+    multi_line_parser = MultiLineParser()
+    fences = [index for index, kind in enumerate(kinds)
+              if kind & KIND_CODE_FENCE_CANDIDATE and multi_line_parser.is_target(lines[index])]
+
+    ranges = [(fences[index], fences[index + 1]) for index in range(0, len(fences) - 1, 2)]
+    if len(fences) % 2 == 1:
+        ranges.append((fences[-1], len(lines) - 1))
+
+    return ranges
+
+
+def split_at_safe_boundaries(lines: list[str], chunk_count: int) -> list[LineRange]:
+    """
+    入力テキストを、コードブロックの内部を避けておおよそ等分した行範囲へ分割\n
+    コードブロック以外の記法は1行で完結するので、コードブロックの外側であればどこで分割しても、
+    分割した範囲ごとのパース結果を連結したものは、全体をまとめてパースした結果と一致する
+
+    :param lines: 入力テキスト
+    :param chunk_count: 分割数
+    :return: 分割した行範囲のリスト
+    """
+
+    if len(lines) == 0:
+        return []
+
+    code_block_ranges = find_code_block_ranges(lines, classify_lines(lines))
+    code_block_starts = [start for start, _ in code_block_ranges]
+
+    boundaries = [0]
+    for chunk in range(1, chunk_count):
+        boundary = max(len(lines) * chunk // chunk_count, boundaries[-1])
+
+        # コードブロックの内部であれば、コードブロックの直後へずらす
+        position = bisect.bisect_left(code_block_starts, boundary) - 1
+        if position >= 0 and code_block_ranges[position][0] < boundary <= code_block_ranges[position][1]:
+            boundary = code_block_ranges[position][1] + 1
+
+        if boundaries[-1] < boundary < len(lines):
+            boundaries.append(boundary)
+
+    boundaries.append(len(lines))
+    return [(start, end - 1) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def parse_chunk(lines: list[str]) -> bytes:
+    """
+    ワーカープロセスで分割した範囲をパース\n
+    プロセス間の受け渡しはpickleよりも小さく速いバイナリ形式で行う
+
+    :param lines: 分割した範囲の行
+    :return: パース結果をバイナリ形式へ変換したもの
+    """
+
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = MarkdownParser()
+
+    return codec.dumps(_worker_parser.parse(lines))
+
+
+def parse_shared_chunk(input_segment: Segment, output_segment: Segment) -> Segment | bytes:
+    """
+    ワーカープロセスで、共有メモリに配置された範囲をパースし、パース結果を共有メモリの出力領域へ書き込む
+
+    :param input_segment: 分割した範囲の行を「\\n」で連結し、UTF-8で配置した領域
+    :param output_segment: パース結果を書き込む領域
+    :return: パース結果を書き込んだ領域 領域に収まらない場合はパース結果のバイナリ形式そのもの
+    """
+
+    encoded = parse_chunk(read_segment(input_segment).decode('utf-8').split('\n'))
+    with SegmentWriter(output_segment) as writer:
+        return writer.write(encoded) or encoded
+
+
+class ParallelMarkdownParser:
+    """ 1つの大きな文書を複数のプロセスで分担してパースすることを責務に持つ """
+
+    # 分割した範囲あたりの最小の行数
+    # 小さく分割しすぎると、プロセス間の受け渡しのコストがパース処理を上回る
+    MIN_CHUNK_LINES = 20000
+    # ワーカーあたりの分割数
+    # ワーカーより多めに分割しておくことで、範囲ごとの処理時間のばらつきを均す
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, workers: int = None, executor: Executor = None, min_chunk_lines: int = MIN_CHUNK_LINES,
+                 use_shared_memory: bool = True):
+        self._workers = workers or os.cpu_count() or 1
+        # 分割した範囲・パース結果を、pickleの代わりに共有メモリを介して受け渡す
+        self._use_shared_memory = use_shared_memory
+        # 呼び出し元から渡されたExecutorは呼び出し元が終了させる
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._min_chunk_lines = min_chunk_lines
+        self._serial_parser = MarkdownParser()
+
+    def parse(self, markdown_text: list[str]) -> ParseResult:
+        """
+        入力テキストを分割してワーカープロセスでパースし、パース結果を連結\n
+        リスト・引用のように分割した範囲をまたいで続くBlock要素は、後続のConverterが連結後の結果から統合するので、
+        パース結果は1つのプロセスでパースしたものと一致する
+
+        :param markdown_text: 入力テキスト
+        :return: ツリー構造による変換結果オブジェクト
+        """
+
+        chunk_count = min(self._workers * self.CHUNKS_PER_WORKER, len(markdown_text) // self._min_chunk_lines)
+        # 分割するほど大きくない文書はプロセス間の受け渡しを省き、そのままパース
+        if chunk_count <= 1:
+            return self._serial_parser.parse(markdown_text)
+
+        chunks = [markdown_text[start:end + 1]
+                  for start, end in split_at_safe_boundaries(markdown_text, chunk_count)]
+
+        if self._use_shared_memory:
+            return ParseResult(self._parse_shared(chunks))
+
+        content = []
+        for encoded in self._get_executor().map(parse_chunk, chunks):
+            content += codec.loads(encoded).content
+
+        return ParseResult(content)
+
+    def _parse_shared(self, chunks: list[list[str]]) -> list:
+        """
+        分割した範囲を1つの共有メモリへ配置し、ワーカープロセスには領域を指す記述子のみを受け渡してパース\n
+        入力の行は改行を含まないので、「\\n」で連結したものはワーカープロセスで元の行へ分割し直せる
+
+        :param chunks: 分割した範囲の行
+        :return: 範囲ごとのパース結果を連結したもの
+        """
+
+        encoded_chunks = ['\n'.join(chunk).encode('utf-8') for chunk in chunks]
+        input_size = sum(len(encoded_chunk) for encoded_chunk in encoded_chunks)
+
+        content = []
+        with SharedArena(input_size * (1 + PARSE_OUTPUT_RATIO)) as arena:
+            input_segments = [arena.write(encoded_chunk) for encoded_chunk in encoded_chunks]
+            # 範囲ごとに別々のワーカーが書き込むので、出力領域は範囲ごとに分けて確保
+            output_segments = [arena.allocate(len(encoded_chunk) * PARSE_OUTPUT_RATIO)
+                               for encoded_chunk in encoded_chunks]
+
+            for result in self._get_executor().map(parse_shared_chunk, input_segments, output_segments):
+                encoded = arena.read(result) if isinstance(result, tuple) else result
+                content += codec.loads(encoded).content
+
+        return content
+
+    def _get_executor(self) -> Executor:
+        """
+        ワーカープロセスを保持するExecutorを取得 初めて利用するときに生成
+
+        :return: Executor
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+
+        return self._executor
+
+    def close(self):
+        """
+        自身が生成したワーカープロセスを終了
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> 'ParallelMarkdownParser':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,56 +1,207 @@
-from a_pompom_markdown_parser.element.block import ParseResult, Block
+from typing import Generator
+
+from a_pompom_markdown_parser.cancellation import CancellationToken, STAGE_PARSE
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters, GROUP_BLOCK_PARSER, GROUP_MULTI_LINE_PARSER, \
+    GROUP_INLINE_PARSER
+from a_pompom_markdown_parser.element.block import ParseResult, Block, ParagraphBlock, HeadingBlock
+from a_pompom_markdown_parser.element.inline import Inline
+from a_pompom_markdown_parser.limits import Limits, NO_LIMITS
+from a_pompom_markdown_parser.profiling import LineProfile
+from a_pompom_markdown_parser.trace import TraceRecorder, SPAN_CLASSIFY
 from a_pompom_markdown_parser.markdown.block_parser import BlockParser
-from a_pompom_markdown_parser.markdown.inline_parser import InlineParser
+from a_pompom_markdown_parser.markdown.inline_parser import InlineParser, LazyInlineChildren, create_plain_inline
 from a_pompom_markdown_parser.markdown.multi_line_parser import MultiLineParser
+from a_pompom_markdown_parser.markdown.line_classifier import classify_lines, is_inline_candidate, \
+    KIND_BLOCK_CANDIDATE, KIND_CODE_FENCE_CANDIDATE
 
 
 class MarkdownParser:
     """ マークダウン変換処理を責務に持つ """
 
-    def __init__(self):
+    def __init__(self, lazy_inline: bool = False, limits: Limits = None):
         self.block_parser = BlockParser()
         self.inline_parser = InlineParser()
         self.multi_line_parser = MultiLineParser()
+        # Trueの場合、Inline要素は子要素が初めて参照されたときに解釈
+        # Block要素の構造のみを参照する処理では、Inline要素のパース処理を省略できる
+        self.lazy_inline = lazy_inline
+        # 入力の大きさの上限 省略した場合は上限を設けない
+        self.limits = limits or NO_LIMITS
+
+    def instrument(self, counters: DispatchCounters):
+        """
+        以降のパース処理で、Block・複数行・Inlineのパーサごとの呼び出し回数・処理時間を記録\n
+        1つのパーサに対して一度だけ呼び出す
+
+        :param counters: 記録先
+        """
+
+        self.block_parser.parsers = counters.wrap(GROUP_BLOCK_PARSER, self.block_parser.parsers)
+        self.multi_line_parser.parsers = counters.wrap(GROUP_MULTI_LINE_PARSER, self.multi_line_parser.parsers)
+        self.inline_parser.parsers = counters.wrap(GROUP_INLINE_PARSER, self.inline_parser.parsers)
 
-    def parse(self, markdown_text: list[str]) -> ParseResult:
+    def parse(self, markdown_text: list[str], token: CancellationToken = None,
+              trace: TraceRecorder = None) -> ParseResult:
         """
         変換結果オブジェクトを生成
 
         :param markdown_text: 入力テキスト
+        :param token: 変換の取り消し・制限時間 行を解釈するたびに確認
+        :param trace: 区間の記録先 省略した場合は記録しない
         :return: ツリー構造による変換結果オブジェクト
         """
+        return ParseResult(list(self.parse_iter(markdown_text, token, trace=trace)))
 
-        result = []
-        # 探索範囲を順々に狭めていくことで、単一の行・複数の行それぞれを対象としたマークダウンの記法を同質に解釈することができる
-        while True:
+    def parse_iter(self, markdown_text: list[str], token: CancellationToken = None,
+                   profile: LineProfile = None, trace: TraceRecorder = None) -> Generator[Block, None, None]:
+        """
+        入力テキストを先頭から解釈し、Block要素を1つずつ生成\n
+        パース結果全体を待たずに後続の処理を始められるので、変換結果を逐次出力するときに利用\n
+        入力の行数が上限を超えた場合は、LimitExceededExceptionを送出
+
+        :param markdown_text: 入力テキスト
+        :param token: 変換の取り消し・制限時間 行を解釈するたびと、Inline要素の前後の文字列を分割するたびに確認
+        :param profile: 行ごとの処理の記録先 LineProfile.instrumentで組み立て直したパーサでのみ指定する
+        :param trace: 区間の記録先 行の種別の判定を記録 Inline要素のパース処理は、TraceRecorder.instrumentで組み立て直したパーサでのみ記録
+        :return: ループで参照される度、1つのBlock要素を返却
+        """
 
-            # テキストをすべて走査するまで
-            if len(markdown_text) == 0:
-                break
+        self.limits.check_lines(len(markdown_text))
+
+        # 各行の種別を前もって判定しておくことで、記法を含まない行は各パーサによる判定を省略できる
+        if trace is not None:
+            with trace.span(SPAN_CLASSIFY, lines=len(markdown_text)):
+                kinds = classify_lines(markdown_text)
+        else:
+            kinds = classify_lines(markdown_text)
+
+        # 探索範囲を順々に狭めていくことで、単一の行・複数の行それぞれを対象としたマークダウンの記法を同質に解釈することができる
+        index = 0
+        while index < len(markdown_text):
+            if profile is not None:
+                profile.start_line()
 
             # 単一行のみ解釈
-            if not self.multi_line_parser.is_target(markdown_text[0]):
-                result.append(self._create_block(markdown_text.pop(0)))
+            if not self._is_code_fence(markdown_text[index], kinds[index]):
+                block = self._create_block(markdown_text[index], kinds[index], token, index + 1)
+                if profile is not None:
+                    profile.finish_line(index + 1, markdown_text[index])
+                if token is not None:
+                    token.check(STAGE_PARSE, index + 1)
+                yield block
+                index += 1
                 continue
 
             # 複数行を解釈
-            parsed, parse_range = MultiLineParser().parse(markdown_text)
-            result = [*result, *parsed]
-            del markdown_text[0:parse_range + 1]
+            # 終了要素の候補となる行までに範囲を絞っておくことで、残りの行すべてを複製せずに済む
+            end = self._find_code_fence_end(markdown_text, kinds, index)
+            parsed, parse_range = self.multi_line_parser.parse(markdown_text[index:end + 1])
+            if profile is not None:
+                profile.finish_line(index + 1, markdown_text[index])
+            if token is not None:
+                token.check(STAGE_PARSE, index + 1)
+            yield from parsed
+            index += parse_range + 1
+
+    def parse_headings(self, markdown_text: list[str], token: CancellationToken = None) -> list[HeadingBlock]:
+        """
+        入力テキストからヘッダのみを解釈\n
+        目次を文書の先頭付近で出力するとき、後続のヘッダをすべてパースし終えるのを待たずに目次を組み立てるために利用
+
+        :param markdown_text: 入力テキスト
+        :param token: 変換の取り消し・制限時間 ヘッダを解釈するたびに確認
+        :return: 文書中に現れる順のヘッダBlock要素
+        """
+
+        kinds = classify_lines(markdown_text)
+        headings = []
+
+        index = 0
+        while index < len(markdown_text):
+            # コードブロック内部の「#」はヘッダではないので読み飛ばす
+            if self._is_code_fence(markdown_text[index], kinds[index]):
+                index = self._find_code_fence_end(markdown_text, kinds, index) + 1
+                continue
+
+            # ヘッダは行頭の「#」で始まる1行で完結するので、候補となる行のみを解釈すればよい
+            if kinds[index] & KIND_BLOCK_CANDIDATE and markdown_text[index].startswith('#'):
+                block = self._create_block(markdown_text[index], kinds[index])
+                if token is not None:
+                    token.check(STAGE_PARSE, index + 1)
+                if isinstance(block, HeadingBlock):
+                    headings.append(block)
+
+            index += 1
 
-        return ParseResult(result)
+        return headings
 
-    def _create_block(self, line: str) -> Block:
+    def _is_code_fence(self, line: str, kind: int) -> bool:
+        """
+        行がコードブロックの開始・終了要素であるか判定
+
+        :param line: 判定対象行
+        :param kind: 行の種別コード
+        :return: コードブロックの開始・終了要素 -> True, それ以外 -> False
+        """
+        return kind & KIND_CODE_FENCE_CANDIDATE != 0 and self.multi_line_parser.is_target(line)
+
+    def _find_code_fence_end(self, lines: list[str], kinds: list[int], start: int) -> int:
+        """
+        コードブロックの終了要素となる行を探索
+
+        :param lines: 入力テキスト
+        :param kinds: 各行の種別コード
+        :param start: コードブロックの開始行のインデックス
+        :return: 終了要素の行のインデックス 終了要素が無い場合は末尾の行のインデックス
+        """
+
+        for index in range(start + 1, len(lines)):
+            if self._is_code_fence(lines[index], kinds[index]):
+                return index
+
+        return len(lines) - 1
+
+    def _create_block(self, line: str, kind: int, token: CancellationToken = None, line_number: int = None) -> Block:
         """
         1行のテキストからBlock要素を生成
 
         :param line: 1行のテキスト
+        :param kind: 行の種別コード
+        :param token: 変換の取り消し・制限時間 Inline要素のパース処理の途中でも確認 省略した場合は打ち切らない
+        :param line_number: 行番号(1始まり)
         :return: パース処理により生成されたBlock要素
         """
 
+        # Block要素の記法を含まない行は、いずれのパーサにも該当しないので段落となる
+        if not kind & KIND_BLOCK_CANDIDATE:
+            return ParagraphBlock(self._parse_inline(line, kind, token, line_number))
+
         # 通常、変換後のHTML要素にはBlock要素の記法を含むべきではないので、
         # Inline要素は記法を除外したものを入力とする
         inline_text = self.block_parser.extract_inline_text(line)
-        children = self.inline_parser.parse(inline_text)
+        children = self._parse_inline(inline_text, kind, token, line_number)
 
         return self.block_parser.parse(line, children)
+
+    def _parse_inline(self, inline_text: str, kind: int, token: CancellationToken = None,
+                      line_number: int = None) -> list[Inline]:
+        """
+        Inline要素を解釈 記法を含まない行・上限を超えた行はパース処理を省略\n
+        遅延評価が有効な場合は、子要素が参照されるまでパース処理を遅らせる
+
+        :param inline_text: Block要素の記法を除いたテキスト
+        :param kind: 行の種別コード
+        :param token: 変換の取り消し・制限時間 省略した場合は打ち切らない
+        :param line_number: 行番号(1始まり)
+        :return: Block要素の子となるInline要素
+        """
+
+        # 上限を超えて長い行は、Inline要素の正規表現の処理時間が急激に延びるので、記法を含めたテキストのまま扱う
+        if not is_inline_candidate(kind) or self.limits.exceeds_line_length(inline_text):
+            return [create_plain_inline(inline_text)]
+
+        # 遅延評価した場合は変換を終えた後に解釈されうるので、トークンは渡さない
+        if self.lazy_inline:
+            return LazyInlineChildren(self.inline_parser, inline_text, self.limits.max_inline_elements)
+
+        return self.inline_parser.parse_limited(inline_text, self.limits.max_inline_elements, token, line_number)
@@ -0,0 +1,517 @@
+import bisect
+import contextlib
+import math
+import os
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Generator
+
+# Prometheusのテキスト形式を表すContent-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# メトリクスを応答するパス
+METRICS_PATH = '/metrics'
+# 書き出すファイルのパーミッション openで生成したファイルと同じく、umaskを適用する
+FILE_PERMISSION = 0o666
+
+# 変換時間のヒストグラムの区間の上限[s]
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+# 変換時間を分類する文書の大きさの上限[byte] 大きさによって変換時間は大きく異なるので、大きさごとに分布を記録する
+SIZE_CLASSES = [1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024]
+
+# 変換に失敗した理由
+ERROR_LIMIT_EXCEEDED = 'limit_exceeded'
+ERROR_INVALID_ENCODING = 'invalid_encoding'
+ERROR_REQUEST_TOO_LARGE = 'request_too_large'
+ERROR_NOT_FOUND = 'not_found'
+ERROR_BAD_REQUEST = 'bad_request'
+# 変換処理が想定外の例外を送出した
+ERROR_INTERNAL = 'internal'
+# 変換結果のキャッシュを参照した結果
+CACHE_HIT = 'hit'
+CACHE_MISS = 'miss'
+# クライアントが保持する変換結果を利用させ、キャッシュ・変換とも不要だった
+CACHE_NOT_MODIFIED = 'not_modified'
+
+
+def format_value(value: float) -> str:
+    """
+    値をPrometheusのテキスト形式で表現
+
+    :param value: 値
+    :return: 整数は小数点を含まない文字列 無限大は「+Inf」
+    """
+
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+
+    return repr(value)
+
+
+def escape_label_value(value: str) -> str:
+    """
+    ラベルの値をPrometheusのテキスト形式で表現できるようエスケープ
+
+    :param value: ラベルの値
+    :return: 「\\」「"」・改行をエスケープした文字列
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(label_names: list[str], label_values: tuple[str, ...]) -> str:
+    """
+    ラベルをPrometheusのテキスト形式で表現
+
+    :param label_names: ラベル名
+    :param label_values: ラベル名と同じ順に並べたラベルの値
+    :return: 「{name="value",...}」形式の文字列 ラベルを持たない場合は空文字
+    """
+
+    if not label_names:
+        return ''
+
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+def size_class(size: int) -> str:
+    """
+    文書の大きさを、変換時間を分類する区間の上限で表現
+
+    :param size: 文書のバイト数
+    :return: 大きさが収まる最小の上限 いずれにも収まらない場合は「+Inf」
+    """
+
+    index = bisect.bisect_left(SIZE_CLASSES, size)
+    return str(SIZE_CLASSES[index]) if index < len(SIZE_CLASSES) else '+Inf'
+
+
+class Metric:
+    """
+    ラベルの値の組ごとに値を保持するメトリクスを表現することを責務に持つ\n
+    複数のスレッドから同時に更新してよい
+    """
+
+    # Prometheusのメトリクスの種別
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, label_names: list[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = list(label_names or [])
+        # ラベル名と同じ順に並べたラベルの値をキーに、値を保持
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def expose(self) -> list[str]:
+        """
+        メトリクスをPrometheusのテキスト形式の行へ変換
+
+        :return: HELP・TYPEと、ラベルの値の組ごとの値を表す行
+        """
+
+        documentation = self.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        return [f'# HELP {self.name} {documentation}', f'# TYPE {self.name} {self.metric_type}'] + self._samples()
+
+    def _samples(self) -> list[str]:
+        """
+        ラベルの値の組ごとの値を表す行を生成 ラベルを持たないメトリクスは、更新されていなくても0を出力
+
+        :return: 値を表す行
+        """
+
+        with self._lock:
+            values = dict(self._values)
+        if not self.label_names and not values:
+            values[()] = 0
+
+        return [f'{self.name}{format_labels(self.label_names, key)} {format_value(value)}'
+                for key, value in sorted(values.items())]
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        """
+        ラベルを、値を保持する辞書のキーへ変換
+
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書 生成時に渡したラベル名をすべて含む
+        :return: ラベル名と同じ順に並べたラベルの値
+        """
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class Counter(Metric):
+    """ 増加のみする値を表現することを責務に持つ """
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str):
+        """
+        値を加算
+
+        :param amount: 加算する値
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    増減する値を表現することを責務に持つ\n
+    関数を渡した場合は、出力するたびに関数の戻り値を値とする
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, label_names: list[str] = None,
+                 function: Callable[[], float] = None):
+        super().__init__(name, documentation, label_names)
+        # 出力するたびに値を取得する関数 ラベルを持たないメトリクスでのみ利用する
+        self._function = function
+
+    def set(self, value: float, **labels: str):
+        """
+        値を設定
+
+        :param value: 値
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書
+        """
+
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        """
+        値を加算
+
+        :param amount: 加算する値
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        """
+        値を減算
+
+        :param amount: 減算する値
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書
+        """
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f'{self.name} {format_value(self._function())}']
+
+        return super()._samples()
+
+
+class Histogram(Metric):
+    """
+    観測した値の分布を、区間ごとの累積の件数で表現することを責務に持つ\n
+    区間の上限は昇順に並べ、最後には必ず無限大の区間を含める
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: list[str] = None,
+                 buckets: list[float] = None):
+        super().__init__(name, documentation, label_names)
+        self.buckets = sorted(buckets or LATENCY_BUCKETS)
+        if not math.isinf(self.buckets[-1]):
+            self.buckets.append(math.inf)
+
+    def observe(self, value: float, **labels: str):
+        """
+        値を観測
+
+        :param value: 観測した値
+        :param labels: ラベル名をキー・ラベルの値を値とする辞書
+        """
+
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # 区間ごとの件数・合計・件数の組 区間ごとの件数は出力するときに累積する
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = list(counts)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.label_names + ['le'], key + (format_value(float(bucket)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+
+        return lines
+
+
+class MetricsRegistry:
+    """
+    メトリクスを登録し、まとめてPrometheusのテキスト形式で出力することを責務に持つ\n
+    HTTPで応答するほか、node_exporterのtextfile collectorが読み込むファイルとして書き出せる
+    """
+
+    def __init__(self):
+        # メトリクス名をキーに、登録した順に保持
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: list[str] = None) -> Counter:
+        """
+        カウンタを登録
+
+        :param name: メトリクス名 「_total」で終える
+        :param documentation: メトリクスの説明
+        :param label_names: ラベル名
+        :return: 登録したカウンタ
+        """
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: list[str] = None,
+              function: Callable[[], float] = None) -> Gauge:
+        """
+        ゲージを登録
+
+        :param name: メトリクス名
+        :param documentation: メトリクスの説明
+        :param label_names: ラベル名
+        :param function: 出力するたびに値を取得する関数 省略した場合は設定した値を出力
+        :return: 登録したゲージ
+        """
+        return self.register(Gauge(name, documentation, label_names, function))
+
+    def histogram(self, name: str, documentation: str, label_names: list[str] = None,
+                  buckets: list[float] = None) -> Histogram:
+        """
+        ヒストグラムを登録
+
+        :param name: メトリクス名
+        :param documentation: メトリクスの説明
+        :param label_names: ラベル名 「le」は区間の上限を表すので利用できない
+        :param buckets: 区間の上限 省略した場合はLATENCY_BUCKETS
+        :return: 登録したヒストグラム
+        """
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        メトリクスを登録 同じ名前のメトリクスは置き換える
+
+        :param metric: メトリクス
+        :return: 登録したメトリクス
+        """
+
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+        return metric
+
+    def expose(self) -> str:
+        """
+        登録したすべてのメトリクスを、Prometheusのテキスト形式へ変換
+
+        :return: 登録した順にメトリクスを並べた文字列 末尾は改行で終える
+        """
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        return ''.join(line + '\n' for metric in metrics for line in metric.expose())
+
+    def write(self, file_path: str):
+        """
+        登録したすべてのメトリクスをファイルへ書き出す\n
+        読み込む側が書きかけのファイルを参照しないよう、同じディレクトリへ書き出してから置き換える
+
+        :param file_path: 出力ファイルパス
+        """
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        try:
+            # mkstempは所有者のみ読み書きできるファイルを生成するので、別のユーザで動くnode_exporterからも読み込めるようにする
+            os.fchmod(fd, FILE_PERMISSION & ~current_umask())
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.expose())
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def current_umask() -> int:
+    """
+    プロセスのumaskを取得 取得するには設定し直すしかないので、直ちに元の値へ戻す
+
+    :return: umask
+    """
+
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+class RenderMetrics:
+    """
+    変換処理を提供するサービスのメトリクスを組み立て、記録することを責務に持つ
+
+    - 変換時間: 文書の大きさの区間(size_le)ごとのヒストグラム
+    - 変換結果のキャッシュ: 参照した結果ごとの件数 ヒット率はhit / (hit + miss)で求まる
+    - 待ち行列の深さ: 受け付けてから応答を送り終えるまでの要求の数 変換を待つ要求・応答を送信中の要求も含む
+    - ワーカーの入れ替え: 入れ替えた理由ごとの件数
+    - 失敗: 理由ごとの件数
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or MetricsRegistry()
+        self.render_duration = self.registry.histogram(
+            'markdown_render_duration_seconds', 'Time spent rendering a document, by document size class.',
+            ['size_le'], LATENCY_BUCKETS)
+        self.cache_requests = self.registry.counter(
+            'markdown_render_cache_requests_total', 'Render cache lookups by result.', ['result'])
+        self.queue_depth = self.registry.gauge(
+            'markdown_render_queue_depth', 'Render requests accepted but not yet answered.')
+        # 要求を受け付ける前から、収集する側が0として参照できるようにする
+        self.queue_depth.set(0)
+        self.worker_recycles = self.registry.counter(
+            'markdown_worker_recycles_total', 'Worker processes replaced, by reason.', ['reason'])
+        self.errors = self.registry.counter(
+            'markdown_render_errors_total', 'Render requests that failed, by reason.', ['reason'])
+
+    @contextlib.contextmanager
+    def track_request(self) -> Generator[None, None, None]:
+        """
+        withブロックの間、要求を待ち行列へ数える 要求を受け付けてから応答を送り終えるまでを囲む
+        """
+
+        self.queue_depth.inc()
+        try:
+            yield
+        finally:
+            self.queue_depth.dec()
+
+    @contextlib.contextmanager
+    def measure_render(self, size: int) -> Generator[None, None, None]:
+        """
+        withブロックの変換処理の時間を記録 例外を送出した変換の時間は記録しない
+
+        :param size: 文書のバイト数
+        """
+
+        start = time.perf_counter()
+        yield
+        self.render_duration.observe(time.perf_counter() - start, size_le=size_class(size))
+
+    def observe_render(self, elapsed: float, size: int):
+        """
+        別の場所で計測した変換時間を記録
+
+        :param elapsed: 変換時間[s]
+        :param size: 文書のバイト数
+        """
+        self.render_duration.observe(elapsed, size_le=size_class(size))
+
+    def count_error(self, reason: str):
+        """
+        変換に失敗したことを記録
+
+        :param reason: 失敗した理由 ERROR_*のいずれか
+        """
+        self.errors.inc(reason=reason)
+
+    def count_cache(self, result: str):
+        """
+        変換結果のキャッシュを参照した結果を記録
+
+        :param result: 参照した結果 CACHE_*のいずれか
+        """
+        self.cache_requests.inc(result=result)
+
+    def count_recycle(self, reason: str):
+        """
+        ワーカーを入れ替えたことを記録
+
+        :param reason: 入れ替えた理由
+        """
+        self.worker_recycles.inc(reason=reason)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """ GET /metrics へ、登録したメトリクスをPrometheusのテキスト形式で応答することを責務に持つ """
+
+    server: 'MetricsHTTPServer'
+
+    def do_GET(self):
+        """
+        登録したメトリクスを応答
+        """
+
+        if self.path.split('?', 1)[0] != METRICS_PATH:
+            self._send(HTTPStatus.NOT_FOUND, f'{METRICS_PATH}を指定してください。'.encode('utf-8'))
+            return
+
+        self._send(HTTPStatus.OK, self.server.registry.expose().encode('utf-8'))
+
+    def _send(self, status: HTTPStatus, content: bytes):
+        """
+        本文を応答
+
+        :param status: 応答の状態
+        :param content: 本文
+        """
+
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args):
+        # 定期的な収集のたびに標準エラーへ出力しない
+        pass
+
+
+class MetricsHTTPServer(ThreadingHTTPServer):
+    """ HTTPを受け付けない常駐プロセスで、メトリクスのみをHTTPで公開することを責務に持つ """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], registry: MetricsRegistry):
+        self.registry = registry
+        super().__init__(address, MetricsRequestHandler)
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = '127.0.0.1') -> MetricsHTTPServer:
+    """
+    メトリクスを公開するHTTPサーバを別スレッドで起動 スレッドは生成元のプロセスの終了を妨げない
+
+    :param registry: 公開するメトリクス
+    :param port: ポート番号 0の場合は空いているものを選ぶ
+    :param host: 待ち受けるアドレス 省略した場合は同じホストからの接続のみ受け付ける
+    :return: 起動したサーバ 終了するときはshutdownを呼び出す
+    """
+
+    server = MetricsHTTPServer((host, port), registry)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -0,0 +1,5 @@
+from a_pompom_markdown_parser.batch import prewarm_worker
+
+# forkserverの生成元のプロセスで読み込まれるモジュール
+# 読み込んだ時点でワーカーの起動時の処理を済ませるので、複製されて生成されるワーカーは起動時の処理を繰り返さずに済む
+prewarm_worker()
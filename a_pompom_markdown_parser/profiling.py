@@ -0,0 +1,225 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+from a_pompom_markdown_parser.markdown.inline_parser import InlineParser, IParser
+
+# 処理時間の長い行を出力する件数
+DEFAULT_TOP_COUNT = 10
+# 行の内容を出力するときの最大文字数 長い行ほど時間がかかりやすいので、先頭のみ出力する
+PREVIEW_LENGTH = 60
+# 時間のかかった文書を保存したディレクトリで、文書の一覧を記録するファイル
+SLOW_LOG_INDEX = 'index.jsonl'
+
+
+@dataclasses.dataclass(frozen=True)
+class LineCost:
+    """ 1つの行のパースに要した処理を表現することを責務に持つ """
+
+    # 行番号(1始まり) コードブロックは開始行の行番号で、コードブロック全体の処理を表す
+    line_number: int
+    # 行の内容
+    text: str
+    # パースに要した時間[s]
+    elapsed: float
+    # パーサのメソッドを呼び出した回数 いずれのメソッドも正規表現による判定・抽出を1度行う
+    regex_calls: int
+    # Inline要素のパース処理で前後の文字列を分割した深さ Inline要素を解釈しなかった場合は0
+    inline_depth: int
+
+
+class LineProfile:
+    """
+    パース処理を行ごとに計測し、処理時間の長い行を特定することを責務に持つ\n
+    instrumentで計測用に組み立てたパーサへ渡した場合のみ記録する 1つの文書のパースにのみ利用する
+    """
+
+    def __init__(self):
+        self._costs: list[LineCost] = []
+        # 計測中の行の開始時刻・正規表現の呼び出し回数・Inline要素のパース処理の深さ
+        self._start = 0.0
+        self._regex_calls = 0
+        self._max_inline_depth = 0
+
+    @property
+    def costs(self) -> list[LineCost]:
+        """ 行ごとの処理 行番号の順 """
+        return list(self._costs)
+
+    @property
+    def total_time(self) -> float:
+        """ すべての行のパースに要した時間の合計[s] """
+        return sum(cost.elapsed for cost in self._costs)
+
+    def instrument(self, markdown_parser: 'MarkdownParser'):
+        """
+        パーサを計測用に組み立て直す\n
+        パーサのメソッド呼び出し・Inline要素のパース処理の深さを数えるので、変換処理で共有するパーサには利用しない
+
+        :param markdown_parser: 計測用に生成したパーサ
+        """
+
+        markdown_parser.inline_parser = ProfilingInlineParser(self)
+        for component in [markdown_parser.block_parser, markdown_parser.multi_line_parser,
+                          markdown_parser.inline_parser]:
+            component.parsers = [RegexCallCounter(parser, self) for parser in component.parsers]
+
+    def start_line(self):
+        """
+        行のパースを始めたことを記録
+        """
+
+        self._start = time.perf_counter()
+        self._regex_calls = 0
+        self._max_inline_depth = 0
+
+    def finish_line(self, line_number: int, line: str):
+        """
+        行のパースを終えたことを記録
+
+        :param line_number: 行番号(1始まり)
+        :param line: 行の内容
+        """
+        self._costs.append(LineCost(line_number=line_number, text=line, elapsed=time.perf_counter() - self._start,
+                                    regex_calls=self._regex_calls, inline_depth=self._max_inline_depth))
+
+    def count_regex_call(self):
+        """
+        パーサのメソッドを呼び出したことを記録
+        """
+        self._regex_calls += 1
+
+    def reach_inline(self, depth: int):
+        """
+        Inline要素のパース処理で、文字列を分割したことを記録
+
+        :param depth: 行全体を1とした、文字列を分割した深さ
+        """
+        self._max_inline_depth = max(self._max_inline_depth, depth)
+
+    def slowest(self, count: int = DEFAULT_TOP_COUNT) -> list[LineCost]:
+        """
+        処理時間の長い行を取得
+
+        :param count: 取得する件数
+        :return: 処理時間の長い順に並べた行ごとの処理
+        """
+        return sorted(self._costs, key=lambda cost: cost.elapsed, reverse=True)[:count]
+
+    def format(self, count: int = DEFAULT_TOP_COUNT) -> str:
+        """
+        処理時間の長い行を人が読める形の文字列へ変換
+
+        :param count: 出力する件数
+        :return: 行番号・処理時間・正規表現の呼び出し回数・Inline要素の深さ・行の先頭を並べた文字列
+        """
+
+        total_time = self.total_time
+        # コードブロックは1つの行として数える
+        lines = [f'lines: {len(self._costs)}, parse: {total_time * 1000:.3f}ms',
+                 f'{"line":>8}{"time[ms]":>12}{"share":>8}{"regex":>8}{"depth":>7}  text']
+        for cost in self.slowest(count):
+            share = cost.elapsed / total_time * 100 if total_time else 0.0
+            preview = cost.text if len(cost.text) <= PREVIEW_LENGTH else f'{cost.text[:PREVIEW_LENGTH]}...'
+            lines.append(f'{cost.line_number:>8}{cost.elapsed * 1000:>12.3f}{share:>7.1f}%{cost.regex_calls:>8}'
+                         f'{cost.inline_depth:>7}  {preview}')
+
+        return '\n'.join(lines)
+
+
+class ProfilingInlineParser(InlineParser):
+    """ Inline要素のパース処理で前後の文字列を分割した深さを記録することを責務に持つ """
+
+    def __init__(self, profile: LineProfile):
+        super().__init__()
+        self._profile = profile
+
+    def _extract(self, text: str, depth: int) -> tuple[str, IParser, str, str]:
+        """
+        Inline要素を1つ抜き出す 前後の文字列を分割するときも、この処理を経由する
+
+        :param text: 対象文字列
+        :param depth: 行全体を1とした、対象文字列を分割した深さ
+        :return: 先頭, 対応するパーサ, Inline要素文字列, 末尾を格納したタプル Inline要素を含まない場合はNone
+        """
+
+        self._profile.reach_inline(depth)
+        return super()._extract(text, depth)
+
+
+class RegexCallCounter:
+    """
+    パーサを包み、メソッドを呼び出した回数を記録することを責務に持つ\n
+    パーサのメソッドはいずれも正規表現による判定・抽出を1度行うので、正規表現を評価した回数とみなせる
+    """
+
+    def __init__(self, parser: object, profile: LineProfile):
+        self._parser = parser
+        self._profile = profile
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._parser, name)
+        if not callable(attribute):
+            return attribute
+
+        def _counted(*args, **kwargs):
+            self._profile.count_regex_call()
+            return attribute(*args, **kwargs)
+
+        return _counted
+
+
+class SlowDocumentLog:
+    """
+    変換に時間のかかった文書を保存することを責務に持つ\n
+    保存した文書は、後から行ごとの処理時間を計測して原因となった行を特定するために利用する
+
+    文書はディレクトリへ内容のハッシュ値をファイル名として保存し、変換時間などをindex.jsonlへ1行ずつ追記する
+    同じ内容の文書は1つのファイルへ保存する 複数のスレッドから同時に呼び出してよい
+    """
+
+    def __init__(self, directory: str, threshold: float):
+        # 文書を保存するディレクトリ 存在しない場合は生成する
+        self._directory = directory
+        # 変換時間がこれを超えた文書を保存する[s]
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def capture(self, markdown_content: str, elapsed: float, source: str = None) -> str:
+        """
+        変換時間が閾値を超えていれば、文書を保存
+
+        :param markdown_content: 変換したマークダウン文字列
+        :param elapsed: 変換時間[s]
+        :param source: 文書の出所 入力ファイルパスなど
+        :return: 保存したファイルパス 閾値を超えていない場合はNone
+        """
+
+        if elapsed <= self.threshold:
+            return None
+
+        content = markdown_content.encode('utf-8')
+        file_path = os.path.join(self._directory, f'{hashlib.sha256(content).hexdigest()[:16]}.md')
+        entry = {
+            'file': os.path.basename(file_path),
+            'source': source,
+            'elapsed': elapsed,
+            'bytes': len(content),
+            'lines': len(markdown_content.splitlines()),
+            'captured_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+
+        with self._lock:
+            if not os.path.exists(file_path):
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+            with open(os.path.join(self._directory, SLOW_LOG_INDEX), 'a') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+        return file_path
@@ -0,0 +1,329 @@
+import threading
+from typing import Generator
+
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.converter.converter import Converter
+from a_pompom_markdown_parser.converter.toc_converter import TocConverter
+from a_pompom_markdown_parser.html.builder import HtmlBuilder
+from a_pompom_markdown_parser.element.block import TableOfContentsBlock
+from a_pompom_markdown_parser.html.block_builder import escape_html
+from a_pompom_markdown_parser.cancellation import CancellationToken, RenderCancelledException, STAGE_PARSE, \
+    STAGE_CONVERT, STAGE_BUILD
+from a_pompom_markdown_parser.limits import Limits, NO_LIMITS
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters
+from a_pompom_markdown_parser.profiling import LineProfile
+from a_pompom_markdown_parser.settings import SettingsProfile, default_profile
+from a_pompom_markdown_parser.stats import RenderStats
+from a_pompom_markdown_parser.trace import TraceRecorder, SPAN_RENDER, SPAN_READ, SPAN_WRITE
+
+# HTMLを逐次出力するとき、まとめて出力する文字数の目安
+# 小さすぎると書き出しの回数が増え、大きすぎると最初の出力までの時間が延びる
+DEFAULT_FLUSH_SIZE = 4096
+# 設定値ごとのビルダを保持する上限
+# 上限を超えた場合は最も古いものから破棄するので、設定値の種類が増え続けてもメモリを使い切らない
+MAX_CACHED_PROFILES = 128
+# 事前に変換しておくマークダウン すべての記法を含める
+# 初回の変換で生じる正規表現のコンパイルなどを、変換を要求される前に済ませておく
+WARM_UP_CONTENT = '\n'.join(['[toc]', '# heading', '> quote', '* list', '---',
+                             '[link](url) `code` ![image](src)', '```Python', 'print()', '```'])
+
+
+class Renderer:
+    """
+    マークダウン→HTMLへ変換するパイプラインを保持し、繰り返し変換することを責務に持つ\n
+    パーサ・コンバータ・ビルダは生成時に一度だけ組み立てるので、変換ごとの生成処理が不要となる\n
+    ビルダは設定値(SettingsProfile)のfingerprintごとに組み立てたものを保持するので、
+    変換ごとに異なる設定値を渡しても、テンプレートの組み立ては設定値ごとに一度で済む
+
+    スレッドセーフティ
+    - 保持するパーサ・コンバータ・ビルダは、生成後に状態を変更しない
+    - 設定値は不変であり、ビルダは設定値ごとに別のものを使うので、異なる設定値による変換が互いに影響しない
+    - 設定値ごとのビルダを保持する辞書のみ変換中に更新するが、更新はロックを獲得してから行う
+    - 変換途中の状態はすべて呼び出しごとのローカル変数・ジェネレータが保持する
+    - よって、1つのRendererを任意の数のスレッドから同時に呼び出してよい
+      共有する状態はロックの内側でのみ書き換えるので、GILに依存せず、GILを持たないビルドでも同様に安全
+    - 変換処理は自身を呼び出し直しても状態が壊れないので、変換中に同じRendererで別の文書を変換してもよい(再入可能)
+    - ただし、render_chunksの返すジェネレータは呼び出しごとの状態なので、複数のスレッドから同時に進めてはならない
+    - 設定値を省略した場合は、生成した時点のsettings.settingの値を利用する 生成後に書き換えても影響しない
+
+    入力の大きさの上限(Limits)を渡した場合、文書全体が上限を超えた入力はLimitExceededExceptionを送出して変換しない\n
+    DispatchCountersを渡した場合、すべての変換でパーサ・ビルダごとの呼び出し回数・処理時間を記録する\n
+    変換時にTraceRecorderを渡した場合、その変換のみ記録用のパーサを組み立てて区間を記録する
+    """
+
+    def __init__(self, profile: SettingsProfile = None, limits: Limits = None, counters: DispatchCounters = None):
+        # 入力の大きさの上限 省略した場合は上限を設けない
+        self._limits = limits or NO_LIMITS
+        # パーサ・ビルダごとの呼び出し回数・処理時間の記録先 省略した場合は記録しない
+        self._counters = counters
+        self._markdown_parser = MarkdownParser(limits=self._limits)
+        if counters is not None:
+            self._markdown_parser.instrument(counters)
+        self._converter = Converter(self._limits)
+        self._toc_converter = TocConverter(self._limits.max_toc_depth)
+        # 変換時に設定値を省略した場合に利用
+        self._profile = profile or default_profile()
+        # 設定値のfingerprintをキーに、ビルダを保持
+        self._html_builders: dict[str, HtmlBuilder] = {
+            self._profile.fingerprint: self._create_html_builder(self._profile)
+        }
+        self._html_builders_lock = threading.Lock()
+
+    @property
+    def profile(self) -> SettingsProfile:
+        """ 変換時に設定値を省略した場合に利用する設定値 """
+        return self._profile
+
+    @property
+    def limits(self) -> Limits:
+        """ 入力の大きさの上限 """
+        return self._limits
+
+    def warm_up(self):
+        """
+        すべての記法を含むマークダウンを変換し、正規表現のコンパイルなど初回の変換でのみ生じる処理を済ませておく
+        """
+        self.render(WARM_UP_CONTENT)
+
+    def render(self, markdown_content: str, profile: SettingsProfile = None, token: CancellationToken = None,
+               stats: RenderStats = None, trace: TraceRecorder = None) -> str:
+        """
+        マークダウン文字列をHTML文字列へ変換\n
+        変換が取り消された・制限時間を超えた場合は、入力をエスケープしてそのまま表示するHTMLを返却
+        打ち切った理由・行番号は、token.errorで参照できる\n
+        入力が上限を超えた場合は、LimitExceededExceptionを送出
+
+        :param markdown_content: マークダウン形式の文字列
+        :param profile: 設定値 省略した場合は生成時に渡したものを利用
+        :param token: 変換の取り消し・制限時間 省略した場合は打ち切らない
+        :param stats: 段階ごとの時間・入出力の大きさの記録先 省略した場合は計測しない
+        :param trace: 区間の記録先 省略した場合は記録しない 区間を記録する処理が計測結果を歪めるので、statsとは同時に指定しない
+        :return: HTML形式の文字列
+        """
+
+        self._limits.check_bytes(markdown_content)
+
+        html_builder = self._get_html_builder(profile)
+        try:
+            if trace is not None:
+                return self._render_traced(markdown_content, html_builder, token, trace)
+            if stats is not None:
+                return self._render_measured(markdown_content, html_builder, token, stats)
+
+            # 改行コードはHTMLを組み立てるときに制御するので、入力からは除外しておく
+            markdown_parse_result = self._markdown_parser.parse(markdown_content.splitlines(), token)
+
+            # マークダウン・HTMLを中継
+            html_input = self._converter.convert(markdown_parse_result, token)
+
+            return html_builder.build(html_input, token)
+        except RenderCancelledException:
+            return self._build_fallback(markdown_content, profile)
+
+    def _render_measured(self, markdown_content: str, html_builder: HtmlBuilder, token: CancellationToken,
+                         stats: RenderStats) -> str:
+        """
+        段階ごとの時間を計測しながら変換 変換処理はrenderと同じ
+
+        :param markdown_content: マークダウン形式の文字列
+        :param html_builder: 設定値と対応するビルダ
+        :param token: 変換の取り消し・制限時間
+        :param stats: 計測結果の記録先
+        :return: HTML形式の文字列
+        """
+
+        with stats.measure(STAGE_PARSE):
+            lines = markdown_content.splitlines()
+            markdown_parse_result = self._markdown_parser.parse(lines, token)
+
+        # 要素の数はコンバータが統合する前に数える
+        stats.record_input(markdown_content, len(lines), markdown_parse_result.content)
+
+        with stats.measure(STAGE_CONVERT):
+            html_input = self._converter.convert(markdown_parse_result, token)
+
+        with stats.measure(STAGE_BUILD):
+            html_text = html_builder.build(html_input, token)
+
+        stats.record_output(html_text)
+        return html_text
+
+    def _render_traced(self, markdown_content: str, html_builder: HtmlBuilder, token: CancellationToken,
+                       trace: TraceRecorder) -> str:
+        """
+        段階ごと・行の種別の判定・1行ごとのInline要素・目次の組み立てを区間として記録しながら変換 変換処理はrenderと同じ\n
+        Inline要素の区間を記録するパーサは、変換ごとに別に組み立てる
+
+        :param markdown_content: マークダウン形式の文字列
+        :param html_builder: 設定値と対応するビルダ
+        :param token: 変換の取り消し・制限時間
+        :param trace: 区間の記録先
+        :return: HTML形式の文字列
+        """
+
+        markdown_parser = MarkdownParser(limits=self._limits)
+        trace.instrument(markdown_parser)
+        if self._counters is not None:
+            markdown_parser.instrument(self._counters)
+
+        with trace.span(SPAN_RENDER, chars=len(markdown_content)):
+            with trace.span(STAGE_PARSE):
+                markdown_parse_result = markdown_parser.parse(markdown_content.splitlines(), token, trace)
+
+            with trace.span(STAGE_CONVERT):
+                html_input = self._converter.convert(markdown_parse_result, token, trace)
+
+            with trace.span(STAGE_BUILD):
+                return html_builder.build(html_input, token)
+
+    def _build_fallback(self, markdown_content: str, profile: SettingsProfile = None) -> str:
+        """
+        変換を打ち切った場合に、入力をエスケープしてそのまま表示するHTML文字列を組み立て
+
+        :param markdown_content: マークダウン形式の文字列
+        :param profile: 設定値 省略した場合は生成時に渡したものを利用
+        :return: preタグで入力を囲んだHTML文字列
+        """
+
+        profile = profile or self._profile
+        return f'<pre>{escape_html(markdown_content)}</pre>{profile.newline_code}'
+
+    def profile_lines(self, markdown_content: str) -> LineProfile:
+        """
+        マークダウン文字列を1行ずつパースし、行ごとの処理時間・正規表現の呼び出し回数・Inline要素のパース処理の深さを計測\n
+        計測用のパーサを別に組み立てるので、同時に行われている変換には影響しない
+
+        :param markdown_content: マークダウン形式の文字列
+        :return: 行ごとの処理
+        """
+
+        self._limits.check_bytes(markdown_content)
+
+        profile = LineProfile()
+        markdown_parser = MarkdownParser(limits=self._limits)
+        profile.instrument(markdown_parser)
+        for _ in markdown_parser.parse_iter(markdown_content.splitlines(), profile=profile):
+            pass
+
+        return profile
+
+    def render_file(self, in_file_path: str, out_file_path: str, profile: SettingsProfile = None,
+                    stats: RenderStats = None, trace: TraceRecorder = None):
+        """
+        マークダウンファイルをHTMLファイルへ変換
+
+        :param in_file_path: 入力マークダウンファイルパス
+        :param out_file_path: 出力HTMLファイルパス
+        :param profile: 設定値 省略した場合は生成時に渡したものを利用
+        :param stats: 段階ごとの時間・入出力の大きさの記録先 省略した場合は計測しない ファイルの読み書きの時間は含まない
+        :param trace: 区間の記録先 変換処理に加え、ファイルの読み書きも記録 省略した場合は記録しない
+        """
+
+        if trace is None:
+            with open(in_file_path, 'r') as f:
+                markdown_content = f.read()
+
+            html_text = self.render(markdown_content, profile, stats=stats)
+
+            with open(out_file_path, 'w') as fw:
+                fw.write(html_text)
+            return
+
+        trace = trace.for_document(in_file_path)
+        with trace.span(SPAN_READ):
+            with open(in_file_path, 'r') as f:
+                markdown_content = f.read()
+
+        html_text = self.render(markdown_content, profile, trace=trace)
+
+        with trace.span(SPAN_WRITE):
+            with open(out_file_path, 'w') as fw:
+                fw.write(html_text)
+
+    def render_chunks(self, markdown_content: str, flush_size: int = DEFAULT_FLUSH_SIZE,
+                      profile: SettingsProfile = None, token: CancellationToken = None) -> Generator[str, None, None]:
+        """
+        マークダウン文字列を先頭から変換し、HTML文字列を少しずつ出力\n
+        出力を連結したものは、renderの変換結果と一致する\n
+        目次は後続のヘッダを参照しないと組み立てられないので、目次の位置へ到達した時点でヘッダのみを先にパースしておく\n
+        出力済みの断片は取り消せないので、変換が取り消された・制限時間を超えた場合はRenderCancelledExceptionを送出\n
+        入力が上限を超えた場合は、最初の断片を出力する前にLimitExceededExceptionを送出
+
+        :param markdown_content: マークダウン形式の文字列
+        :param flush_size: まとめて出力する文字数の目安 最上位のBlock要素の途中では区切らない 0以下の場合はBlock要素ごとに出力
+        :param profile: 設定値 省略した場合は生成時に渡したものを利用
+        :param token: 変換の取り消し・制限時間 省略した場合は打ち切らない
+        :return: ループで参照される度、HTML文字列の断片を返却
+        """
+
+        self._limits.check_bytes(markdown_content)
+
+        html_builder = self._get_html_builder(profile)
+        lines = markdown_content.splitlines()
+        blocks = self._converter.convert_iter(self._markdown_parser.parse_iter(lines, token), token)
+        table_of_contents = None
+
+        def _resolve_table_of_contents():
+            nonlocal table_of_contents
+
+            for block in blocks:
+                # 目次の子要素は入力をすべて変換し終えるまで空のままなので、先にパースしたヘッダから組み立てておく
+                if isinstance(block, TableOfContentsBlock):
+                    if table_of_contents is None:
+                        table_of_contents = self._toc_converter.generate(
+                            self._markdown_parser.parse_headings(lines, token))
+                    block.children = table_of_contents
+
+                yield block
+
+        buffer = []
+        buffer_size = 0
+        for html_text in html_builder.build_iter(_resolve_table_of_contents(), token):
+            buffer.append(html_text)
+            buffer_size += len(html_text)
+
+            if buffer_size >= flush_size:
+                yield ''.join(buffer)
+                buffer = []
+                buffer_size = 0
+
+        if buffer:
+            yield ''.join(buffer)
+
+    def _get_html_builder(self, profile: SettingsProfile = None) -> HtmlBuilder:
+        """
+        設定値と対応するビルダを取得 初めて利用する設定値であれば組み立てて保持
+
+        :param profile: 設定値 省略した場合は生成時に渡したもの
+        :return: 設定値と対応するビルダ
+        """
+
+        profile = profile or self._profile
+        html_builder = self._html_builders.get(profile.fingerprint)
+        if html_builder is not None:
+            return html_builder
+
+        with self._html_builders_lock:
+            html_builder = self._html_builders.get(profile.fingerprint)
+            if html_builder is None:
+                if len(self._html_builders) >= MAX_CACHED_PROFILES:
+                    # 辞書は追加した順を保持するので、先頭が最も古い
+                    del self._html_builders[next(iter(self._html_builders))]
+                html_builder = self._create_html_builder(profile)
+                self._html_builders[profile.fingerprint] = html_builder
+
+        return html_builder
+
+    def _create_html_builder(self, profile: SettingsProfile) -> HtmlBuilder:
+        """
+        設定値と対応するビルダを組み立て 記録先を渡されていれば、ビルダごとの呼び出し回数・処理時間を記録させる
+
+        :param profile: 設定値
+        :return: 設定値と対応するビルダ
+        """
+
+        html_builder = HtmlBuilder(profile)
+        if self._counters is not None:
+            html_builder.instrument(self._counters)
+
+        return html_builder
@@ -1,3 +1,9 @@
+import dataclasses
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Mapping
+
 # 変換するときの改行コード・インデント・クラス名などの設定値
 setting = {
     'newline_code': '\n',
@@ -25,3 +31,91 @@ setting = {
         'code_block': 'language-{language} hljs'
     }
 }
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class SettingsProfile:
+    """
+    変換するときの設定値一式を不変な形で表現することを責務に持つ\n
+    変換ごとに異なる設定値を渡せるので、1つのプロセスでクラス名などの異なる複数の設定値を同時に扱える
+    """
+
+    # 改行コード
+    newline_code: str
+    # インデント1階層分の文字列
+    indent: str
+    # スタイルのクラス名
+    class_name: Mapping[str, str]
+    # 言語名などを埋め込んで使うクラス名
+    class_name_with_template: Mapping[str, str]
+
+    # 設定値から導出した識別子 同じ設定値であれば同じ値となる
+    # テンプレートなど、設定値から組み立てたものを使い回すときのキーとして利用
+    fingerprint: str = dataclasses.field(init=False)
+
+    def __post_init__(self):
+        # 生成後に書き換えられないよう、クラス名は読み取り専用の複製として保持
+        object.__setattr__(self, 'class_name', MappingProxyType(dict(self.class_name)))
+        object.__setattr__(self, 'class_name_with_template', MappingProxyType(dict(self.class_name_with_template)))
+
+        serialized = json.dumps(self.to_dict(), ensure_ascii=False, sort_keys=True)
+        object.__setattr__(self, 'fingerprint', hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16])
+
+    @classmethod
+    def from_dict(cls, setting_dict: dict) -> 'SettingsProfile':
+        """
+        settings.settingと同じ形式の辞書から設定値を生成 辞書は複製するので、生成後に辞書を書き換えても影響しない
+
+        :param setting_dict: 設定値を格納した辞書
+        :return: 設定値
+        """
+        return cls(newline_code=setting_dict['newline_code'], indent=setting_dict['indent'],
+                   class_name=setting_dict['class_name'],
+                   class_name_with_template=setting_dict['class_name_with_template'])
+
+    def replace(self, **changes) -> 'SettingsProfile':
+        """
+        一部の設定値を置き換えた、新たな設定値を生成
+
+        :param changes: 置き換える項目名をキー・値を値とする辞書 クラス名は指定したものだけを上書き
+        :return: 設定値
+        """
+
+        setting_dict = self.to_dict()
+        for key, value in changes.items():
+            if isinstance(value, Mapping):
+                setting_dict[key] = {**setting_dict[key], **value}
+                continue
+            setting_dict[key] = value
+
+        return SettingsProfile.from_dict(setting_dict)
+
+    def to_dict(self) -> dict:
+        """
+        settings.settingと同じ形式の辞書へ変換
+
+        :return: 設定値を格納した辞書
+        """
+        return {
+            'newline_code': self.newline_code,
+            'indent': self.indent,
+            'class_name': dict(self.class_name),
+            'class_name_with_template': dict(self.class_name_with_template),
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SettingsProfile):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+
+def default_profile() -> SettingsProfile:
+    """
+    settings.settingの現在の値から設定値を生成
+
+    :return: 設定値
+    """
+    return SettingsProfile.from_dict(setting)
@@ -0,0 +1,134 @@
+from multiprocessing import shared_memory
+
+# 共有メモリ上の領域を指す記述子 (共有メモリの名前, 先頭からの位置, バイト長)
+# プロセス間では記述子のみを受け渡し、バイト列そのものは受け渡さない
+Segment = tuple[str, int, int]
+
+
+class SharedArena:
+    """
+    共有メモリを確保し、先頭から順にバイト列を配置することを責務に持つ\n
+    大きなバイト列をpickleでプロセス間のパイプへ書き込むと、送信側・受信側それぞれで複製が生じるが、
+    共有メモリへ配置して記述子のみを受け渡せば、受信側は共有メモリから直接読み出せる
+
+    確保したプロセスがcloseで解放する 他のプロセスが参照している間に解放しても、参照を終えるまで内容は失われない
+    """
+
+    def __init__(self, size: int):
+        # 大きさ0の共有メモリは確保できないので、少なくとも1バイト確保する
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        # 次に配置する位置
+        self._offset = 0
+
+    @property
+    def name(self) -> str:
+        """ 他のプロセスから参照するときの共有メモリの名前 """
+        return self._memory.name
+
+    def allocate(self, length: int) -> Segment:
+        """
+        未使用の領域を確保
+
+        :param length: 確保するバイト数
+        :return: 確保した領域を指す記述子
+        """
+
+        if self._offset + length > self._memory.size:
+            raise ValueError(f'共有メモリの容量が不足しています。容量: {self._memory.size}バイト')
+
+        segment = (self._memory.name, self._offset, length)
+        self._offset += length
+        return segment
+
+    def write(self, data: bytes) -> Segment:
+        """
+        バイト列を未使用の領域へ配置
+
+        :param data: 配置するバイト列
+        :return: 配置した領域を指す記述子
+        """
+
+        segment = self.allocate(len(data))
+        _, offset, length = segment
+        self._memory.buf[offset:offset + length] = data
+        return segment
+
+    def read(self, segment: Segment) -> bytes:
+        """
+        自身の領域からバイト列を読み出す
+
+        :param segment: 読み出す領域を指す記述子
+        :return: 読み出したバイト列
+        """
+
+        _, offset, length = segment
+        return bytes(self._memory.buf[offset:offset + length])
+
+    def close(self):
+        """
+        共有メモリを解放
+        """
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self) -> 'SharedArena':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_segment(segment: Segment) -> bytes:
+    """
+    他のプロセスが確保した共有メモリから、記述子の指す領域のバイト列を読み出す
+
+    :param segment: 読み出す領域を指す記述子
+    :return: 読み出したバイト列
+    """
+
+    name, offset, length = segment
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(memory.buf[offset:offset + length])
+    finally:
+        memory.close()
+
+
+class SegmentWriter:
+    """
+    他のプロセスが確保した共有メモリの領域へ、先頭から順にバイト列を書き込むことを責務に持つ\n
+    領域に収まらないバイト列は書き込まず、呼び出し元がpickleで受け渡す
+    """
+
+    def __init__(self, segment: Segment):
+        name, self._offset, length = segment
+        self._end = self._offset + length
+        self._memory = shared_memory.SharedMemory(name=name)
+
+    def write(self, data: bytes) -> Segment:
+        """
+        バイト列を領域の未使用の部分へ書き込む
+
+        :param data: 書き込むバイト列
+        :return: 書き込んだ領域を指す記述子 領域に収まらない場合はNone
+        """
+
+        if self._offset + len(data) > self._end:
+            return None
+
+        segment = (self._memory.name, self._offset, len(data))
+        self._memory.buf[self._offset:self._offset + len(data)] = data
+        self._offset += len(data)
+        return segment
+
+    def close(self):
+        """
+        共有メモリへの参照を閉じる 解放は確保したプロセスが行う
+        """
+        self._memory.close()
+
+    def __enter__(self) -> 'SegmentWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,160 @@
+import contextlib
+import dataclasses
+import time
+from typing import Generator
+
+from a_pompom_markdown_parser.cancellation import STAGE_PARSE, STAGE_CONVERT, STAGE_BUILD
+from a_pompom_markdown_parser.element.block import Block
+
+# 計測する段階 変換処理の順に並べる
+STAGES = [STAGE_PARSE, STAGE_CONVERT, STAGE_BUILD]
+
+
+@dataclasses.dataclass
+class StageTime:
+    """ 1つの段階に費やした時間を表現することを責務に持つ """
+
+    # 経過時間[s]
+    wall_time: float = 0.0
+    # 呼び出したスレッドがCPUを使用した時間[s] 他のスレッドの処理・I/Oの待ち時間は含まない
+    cpu_time: float = 0.0
+
+
+@dataclasses.dataclass
+class RenderStats:
+    """
+    変換処理の段階ごとの時間と、入出力の大きさを記録することを責務に持つ\n
+    変換処理へ渡した場合のみ記録するので、渡さなければ計測のための処理は生じない\n
+    同じオブジェクトを複数の変換へ渡した場合は、それらの合計を記録する ただし、複数のスレッドから同時に渡してはならない
+    """
+
+    # 段階の名前をキーに、費やした時間を保持
+    stages: dict[str, StageTime] = dataclasses.field(default_factory=lambda: {stage: StageTime() for stage in STAGES})
+    # 変換した文書の数
+    document_count: int = 0
+    # 入力の行数
+    line_count: int = 0
+    # パース結果のBlock要素の数
+    block_count: int = 0
+    # パース結果のInline要素の数
+    inline_count: int = 0
+    # 入力・出力をUTF-8で表したときのバイト数
+    input_bytes: int = 0
+    output_bytes: int = 0
+
+    @property
+    def wall_time(self) -> float:
+        """ すべての段階の経過時間の合計[s] """
+        return sum(stage_time.wall_time for stage_time in self.stages.values())
+
+    @property
+    def cpu_time(self) -> float:
+        """ すべての段階のCPU時間の合計[s] """
+        return sum(stage_time.cpu_time for stage_time in self.stages.values())
+
+    @property
+    def throughput(self) -> float:
+        """ 入力のバイト数を、すべての段階の経過時間の合計で割った処理速度[MB/s] """
+        if self.wall_time == 0:
+            return 0.0
+        return self.input_bytes / self.wall_time / 1000 / 1000
+
+    @contextlib.contextmanager
+    def measure(self, stage: str) -> Generator[None, None, None]:
+        """
+        withブロックの処理に費やした時間を、段階の時間へ加算
+
+        :param stage: 段階の名前
+        """
+
+        stage_time = self.stages.setdefault(stage, StageTime())
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            stage_time.wall_time += time.perf_counter() - wall_start
+            stage_time.cpu_time += time.thread_time() - cpu_start
+
+    def record_input(self, markdown_content: str, line_count: int, blocks: list[Block]):
+        """
+        1つの文書の入力・パース結果の大きさを加算\n
+        コンバータはBlock要素を統合するので、パースを終えた時点で呼び出す
+
+        :param markdown_content: 入力のマークダウン文字列
+        :param line_count: 入力の行数
+        :param blocks: パース結果のBlock要素
+        """
+
+        self.document_count += 1
+        self.line_count += line_count
+        self.block_count += len(blocks)
+        self.inline_count += sum(count_inlines(block) for block in blocks)
+        self.input_bytes += len(markdown_content.encode('utf-8'))
+
+    def record_output(self, html_text: str):
+        """
+        1つの文書の出力の大きさを加算
+
+        :param html_text: 出力のHTML文字列
+        """
+        self.output_bytes += len(html_text.encode('utf-8'))
+
+    def to_dict(self) -> dict:
+        """
+        記録した値を辞書へ変換 JSONなどへ出力するときに利用
+
+        :return: 記録した値を格納した辞書
+        """
+        return {
+            'stages': {stage: dataclasses.asdict(stage_time) for stage, stage_time in self.stages.items()},
+            'document_count': self.document_count,
+            'line_count': self.line_count,
+            'block_count': self.block_count,
+            'inline_count': self.inline_count,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'throughput': self.throughput,
+        }
+
+    def format(self) -> str:
+        """
+        記録した値を人が読める形の文字列へ変換
+
+        :return: 記録した値を表現する文字列
+        """
+
+        wall_time = self.wall_time
+        lines = [
+            f'documents: {self.document_count}, lines: {self.line_count}, blocks: {self.block_count}, '
+            f'inlines: {self.inline_count}',
+            f'input: {self.input_bytes} bytes, output: {self.output_bytes} bytes',
+        ]
+        for stage, stage_time in self.stages.items():
+            ratio = stage_time.wall_time / wall_time * 100 if wall_time else 0.0
+            lines.append(f'{stage + ":":<9}wall {stage_time.wall_time * 1000:.3f}ms, '
+                         f'cpu {stage_time.cpu_time * 1000:.3f}ms ({ratio:.1f}%)')
+        lines.append(f'{"total:":<9}wall {wall_time * 1000:.3f}ms, cpu {self.cpu_time * 1000:.3f}ms, '
+                     f'throughput {self.throughput:.2f}MB/s')
+
+        return '\n'.join(lines)
+
+
+def count_inlines(block: Block) -> int:
+    """
+    Block要素が子孫に持つInline要素の数を取得
+
+    :param block: 対象Block要素
+    :return: Inline要素の数
+    """
+
+    count = 0
+    for child in block.children:
+        if isinstance(child, Block):
+            count += count_inlines(child)
+            continue
+        count += 1
+
+    return count
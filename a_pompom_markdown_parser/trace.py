@@ -0,0 +1,195 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Generator
+
+from a_pompom_markdown_parser.cancellation import CancellationToken
+from a_pompom_markdown_parser.element.inline import Inline
+from a_pompom_markdown_parser.markdown.inline_parser import InlineParser
+
+# 区間の名前 変換処理の段階はcancellationの段階名と揃える
+SPAN_RENDER = 'render'
+SPAN_CLASSIFY = 'classify'
+SPAN_INLINE = 'inline'
+SPAN_TOC = 'toc'
+SPAN_READ = 'read'
+SPAN_WRITE = 'write'
+# イベントの分類 Perfettoではこの値で絞り込める
+TRACE_CATEGORY = 'markdown'
+
+# Chrome Trace Event形式のイベントの種別
+# 開始時刻と長さを持つ区間
+PHASE_COMPLETE = 'X'
+# プロセス・スレッドの名前などの付加情報
+PHASE_METADATA = 'M'
+
+
+class TraceRecorder:
+    """
+    変換処理の区間を、Chrome Trace Event形式のイベントとして記録することを責務に持つ\n
+    出力したJSONは、Perfetto(https://ui.perfetto.dev)・chrome://tracingで読み込める
+
+    各イベントはプロセスID・スレッドIDを持つので、ワーカーごと・スレッドごとの処理が別々の行として表示される\n
+    時刻はシステム全体で共通の単調増加時計から取るので、ワーカープロセスで記録したイベントを統合しても時刻が揃う\n
+    複数のスレッドから同時に記録してよい
+    """
+
+    def __init__(self, document: str = None, events: list[dict] = None, lock: threading.Lock = None):
+        # 区間の引数へ添える文書名 for_documentで生成した場合のみ指定される
+        self.document = document
+        # 同じ文書名を持つ記録先同士・元の記録先とは、イベントのリストとロックを共有する
+        self._events = events if events is not None else []
+        self._lock = lock or threading.Lock()
+
+    @property
+    def events(self) -> list[dict]:
+        """ 記録したイベントの複製 """
+        with self._lock:
+            return list(self._events)
+
+    def for_document(self, document: str) -> 'TraceRecorder':
+        """
+        以降の区間へ文書名を添える記録先を生成 記録したイベントは元の記録先へ追加される
+
+        :param document: 文書名 入力ファイルパスなど
+        :return: 文書名を添える記録先
+        """
+        return TraceRecorder(document, self._events, self._lock)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args) -> Generator[None, None, None]:
+        """
+        withブロックの処理を1つの区間として記録
+
+        :param name: 区間の名前
+        :param args: 区間へ添える引数 Perfettoで区間を選択したときに表示される
+        """
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            if self.document is not None:
+                args['document'] = self.document
+            self._append({
+                'name': name,
+                'cat': TRACE_CATEGORY,
+                'ph': PHASE_COMPLETE,
+                # Chrome Trace Event形式の時刻はマイクロ秒で表す
+                'ts': start / 1000,
+                'dur': (end - start) / 1000,
+                'pid': os.getpid(),
+                'tid': threading.get_native_id(),
+                'args': args,
+            })
+
+    def name_process(self, name: str):
+        """
+        呼び出したプロセスへ、表示する名前を付ける
+
+        :param name: プロセスの名前
+        """
+        self._append(self._metadata('process_name', name))
+
+    def name_thread(self, name: str):
+        """
+        呼び出したスレッドへ、表示する名前を付ける
+
+        :param name: スレッドの名前
+        """
+        self._append(self._metadata('thread_name', name))
+
+    def extend(self, events: list[dict]):
+        """
+        別の記録先・ワーカープロセスで記録したイベントを追加
+
+        :param events: イベントのリスト
+        """
+        with self._lock:
+            self._events += events
+
+    def instrument(self, markdown_parser: 'MarkdownParser'):
+        """
+        パーサを、Inline要素のパース処理を1行ごとに区間として記録するよう組み立て直す\n
+        変換処理で共有するパーサには利用しない
+
+        :param markdown_parser: 記録用に生成したパーサ
+        """
+        markdown_parser.inline_parser = TracingInlineParser(self)
+
+    def to_dict(self) -> dict:
+        """
+        記録したイベントをChrome Trace Event形式の辞書へ変換\n
+        同じプロセス・スレッドへ複数回付けた名前は、最後のもののみ残す
+
+        :return: traceEventsへイベントを格納した辞書
+        """
+
+        metadata = {}
+        spans = []
+        for event in self.events:
+            if event['ph'] == PHASE_METADATA:
+                metadata[(event['name'], event['pid'], event['tid'])] = event
+                continue
+            spans.append(event)
+
+        return {
+            'traceEvents': list(metadata.values()) + sorted(spans, key=lambda event: event['ts']),
+            'displayTimeUnit': 'ms',
+        }
+
+    def write(self, file_path: str):
+        """
+        記録したイベントをJSONファイルへ書き出す
+
+        :param file_path: 出力ファイルパス
+        """
+
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    def _metadata(self, name: str, value: str) -> dict:
+        """
+        呼び出したプロセス・スレッドの付加情報を表すイベントを生成
+
+        :param name: 付加情報の種類 process_name・thread_nameのいずれか
+        :param value: 付加情報の値
+        :return: イベント
+        """
+        return {'name': name, 'ph': PHASE_METADATA, 'pid': os.getpid(), 'tid': threading.get_native_id(),
+                'args': {'name': value}}
+
+    def _append(self, event: dict):
+        """
+        イベントを追加
+
+        :param event: イベント
+        """
+        with self._lock:
+            self._events.append(event)
+
+
+class TracingInlineParser(InlineParser):
+    """ 1行のInline要素のパース処理を、1つの区間として記録することを責務に持つ """
+
+    def __init__(self, trace: TraceRecorder):
+        super().__init__()
+        self._trace = trace
+
+    def parse_limited(self, text: str, max_elements: int = None, token: CancellationToken = None,
+                      line_number: int = None) -> list[Inline]:
+        """
+        マークダウンの文字列をInline要素へ分割 前後の文字列を分割するための呼び出しは区間に含める
+
+        :param text: 対象文字列
+        :param max_elements: Inline要素の数の上限 省略した場合は上限を設けない
+        :param token: 変換の取り消し・制限時間 省略した場合は打ち切らない
+        :param line_number: 対象文字列の行番号(1始まり)
+        :return: Block要素が持つ子要素
+        """
+
+        with self._trace.span(SPAN_INLINE, chars=len(text)):
+            return super().parse_limited(text, max_elements, token, line_number)
@@ -0,0 +1,233 @@
+import dataclasses
+import os
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable
+
+# ワーカーを入れ替えた理由
+# 処理した変換の数が上限に達した
+RECYCLE_BY_TASKS = 'tasks'
+# 常駐メモリが上限を超えた
+RECYCLE_BY_MEMORY = 'memory'
+
+# ワーカープロセスが処理した変換の数
+_worker_task_count = 0
+
+
+def read_rss() -> int:
+    """
+    /proc/self/statmから、自身のプロセスの常駐メモリのバイト数を取得
+
+    :return: 常駐メモリのバイト数 /proc/self/statmを読み出せない環境ではNone
+    """
+
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            # 2番目の値が常駐しているページ数
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+@dataclasses.dataclass(frozen=True)
+class RecyclePolicy:
+    """ ワーカープロセスを入れ替える条件を表現することを責務に持つ """
+
+    # ワーカープロセスが処理する変換の数の上限 省略した場合は変換の数では入れ替えない
+    max_tasks_per_child: int = None
+    # ワーカープロセスの常駐メモリのバイト数の上限 省略した場合は常駐メモリでは入れ替えない
+    max_rss: int = None
+    # ワーカープロセスを入れ替えるたびに呼び出される関数
+    on_recycle: Callable[['RecycleEvent'], None] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class WorkerStatus:
+    """ 変換を終えた時点のワーカープロセスの状態を表現することを責務に持つ """
+
+    pid: int
+    # 起動してから処理した変換の数
+    tasks: int
+    # 常駐メモリのバイト数 計測しない・計測できない場合はNone
+    rss: int
+
+
+@dataclasses.dataclass(frozen=True)
+class RecycleEvent:
+    """ ワーカープロセスを入れ替えたことを表現することを責務に持つ """
+
+    pid: int
+    # RECYCLE_BY_TASKS・RECYCLE_BY_MEMORYのいずれか
+    reason: str
+    tasks: int
+    rss: int
+
+
+def run_in_worker(fn: Callable, measure_rss: bool, *args):
+    """
+    ワーカープロセスで関数を呼び出し、呼び出し後のワーカープロセスの状態を添えて返却
+
+    :param fn: 呼び出す関数
+    :param measure_rss: 常駐メモリを計測するか
+    :param args: 関数へ渡す引数
+    :return: 関数の戻り値と、ワーカープロセスの状態の組
+    """
+
+    global _worker_task_count
+
+    result = fn(*args)
+    _worker_task_count += 1
+    return result, WorkerStatus(pid=os.getpid(), tasks=_worker_task_count, rss=read_rss() if measure_rss else None)
+
+
+class RecyclingWorkerPool(Executor):
+    """
+    ワーカープロセスを、処理した変換の数・常駐メモリの大きさに応じて入れ替えることを責務に持つ\n
+    CPythonは断片化したメモリをOSへほとんど返却しないので、大きな文書を変換し続けるとワーカーの常駐メモリが増え続ける
+    入れ替えたワーカーは起動し直すので、確保したメモリはOSへ返却される
+
+    - 変換の数: 生成したExecutorが、上限に達したワーカーを1つずつ入れ替える
+    - 常駐メモリ: いずれかのワーカーが上限を超えた時点で、以降の変換は新たに生成したExecutorへ委譲する
+      元のExecutorは、委譲済みの変換をすべて終えてから終了するので、処理中の変換は失われない
+    """
+
+    def __init__(self, create_executor: Callable[[], Executor], policy: RecyclePolicy):
+        # ワーカープロセスを保持するExecutorを生成する関数
+        # 変換の数による入れ替えは、生成されたExecutorがpolicy.max_tasks_per_childに従って行う
+        self._create_executor = create_executor
+        self._policy = policy
+
+        self._executor = create_executor()
+        # 常駐メモリが上限を超えたワーカーを持つExecutor 次に変換を委譲するときに入れ替える
+        self._exceeded_executor: Executor = None
+        # 入れ替えて、委譲済みの変換を終えるのを待つExecutor
+        self._retired_executors: list[Executor] = []
+        self._events: list[RecycleEvent] = []
+        # 入れ替え先のExecutorを生成中か 生成はワーカーの起動を待つので、ロックの外で1つのスレッドのみが行う
+        self._replacing = False
+        self._is_shutdown = False
+        self._lock = threading.Lock()
+
+    @property
+    def events(self) -> list[RecycleEvent]:
+        """ ワーカープロセスを入れ替えた履歴 """
+        with self._lock:
+            return list(self._events)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """
+        ワーカープロセスへ関数の呼び出しを委譲
+
+        :param fn: 呼び出す関数 キーワード引数は受け付けない
+        :param args: 関数へ渡す引数
+        :return: 関数の戻り値を表すFuture
+        """
+
+        if kwargs:
+            raise TypeError('キーワード引数は受け付けません。')
+
+        with self._lock:
+            replace = self._exceeded_executor is self._executor and not self._replacing
+            if replace:
+                self._replacing = True
+            executor = self._executor
+
+        if replace:
+            executor = self._replace_executor()
+
+        inner = executor.submit(run_in_worker, fn, self._policy.max_rss is not None, *args)
+        outer = Future()
+
+        def _propagate_cancel(future: Future):
+            if future.cancelled():
+                inner.cancel()
+
+        def _on_done(future: Future):
+            if future.cancelled():
+                outer.cancel()
+            elif future.exception() is not None:
+                if outer.set_running_or_notify_cancel():
+                    outer.set_exception(future.exception())
+            else:
+                result, status = future.result()
+                self._record(executor, status)
+                if outer.set_running_or_notify_cancel():
+                    outer.set_result(result)
+
+        outer.add_done_callback(_propagate_cancel)
+        inner.add_done_callback(_on_done)
+        return outer
+
+    def _replace_executor(self) -> Executor:
+        """
+        常駐メモリが上限を超えたワーカーを持つExecutorを、新たに生成したExecutorと入れ替える\n
+        生成中も、他のスレッドは元のExecutorへ変換を委譲し、変換を終えたワーカーの状態を記録できる
+
+        :return: 以降の変換を委譲するExecutor
+        """
+
+        try:
+            replacement = self._create_executor()
+        except BaseException:
+            with self._lock:
+                self._replacing = False
+            raise
+
+        with self._lock:
+            self._replacing = False
+            # 生成中に終了した場合は、生成したExecutorを利用せずに終了させる
+            if self._is_shutdown:
+                retired = replacement
+            else:
+                retired = self._executor
+                self._retired_executors.append(retired)
+                self._executor = replacement
+            executor = self._executor
+
+        # 委譲済みの変換を終えてからワーカーを終了させる
+        retired.shutdown(wait=False)
+        return executor
+
+    def _record(self, executor: Executor, status: WorkerStatus):
+        """
+        ワーカープロセスの状態から、入れ替えたか・入れ替えるべきかを判定して記録
+
+        :param executor: ワーカープロセスを保持するExecutor
+        :param status: 変換を終えた時点のワーカープロセスの状態
+        """
+
+        policy = self._policy
+        events = []
+        with self._lock:
+            if policy.max_tasks_per_child is not None and status.tasks >= policy.max_tasks_per_child:
+                events.append(RecycleEvent(pid=status.pid, reason=RECYCLE_BY_TASKS, tasks=status.tasks,
+                                           rss=status.rss))
+            # 同じExecutorの複数のワーカーが上限を超えても、入れ替えは1度で済む
+            elif (policy.max_rss is not None and status.rss is not None and status.rss > policy.max_rss
+                  and executor is self._executor and self._exceeded_executor is not executor):
+                self._exceeded_executor = executor
+                events.append(RecycleEvent(pid=status.pid, reason=RECYCLE_BY_MEMORY, tasks=status.tasks,
+                                           rss=status.rss))
+            self._events += events
+
+        if policy.on_recycle is not None:
+            for event in events:
+                policy.on_recycle(event)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """
+        すべてのワーカープロセスを終了
+
+        :param wait: Trueの場合は、委譲済みの変換を終えてワーカープロセスが終了するまで待機
+        :param cancel_futures: Trueの場合は、未着手の変換を取り消す
+        """
+
+        with self._lock:
+            self._is_shutdown = True
+            executors = self._retired_executors + [self._executor]
+            self._retired_executors = []
+
+        for executor in executors:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -0,0 +1,41 @@
+"""
+ワーカーの実行方式(スレッド・プロセス・サブインタプリタ)ごとに、render_manyのスループットを計測
+入力はrender_many_benchmarkと同じく、大きさの異なる文書を混在させたもの
+
+usage: python benchmark/backend_benchmark.py [小さな文書数] [大きな文書数]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.batch import BatchRenderer, UnsupportedBackendException, BACKENDS
+from render_many_benchmark import load_documents, report, DEFAULT_SMALL_COUNT, DEFAULT_LARGE_COUNT
+
+
+def main():
+    small_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SMALL_COUNT
+    large_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LARGE_COUNT
+    documents = load_documents(small_count, large_count)
+    # CPUが1つの環境でも受け渡しのコストを比較できるよう、ワーカーは2つ以上とする
+    jobs = max(2, os.cpu_count() or 1)
+
+    print(f'small: {small_count}, large: {large_count}, cpu: {os.cpu_count()}, jobs: {jobs}')
+    print(f'{"":>28} {"time[s]":>8} {"docs/s":>10} {"MiB/s":>8}')
+
+    for backend in BACKENDS:
+        try:
+            with BatchRenderer(jobs, backend=backend) as batch_renderer:
+                # ワーカーの起動時間を除くため、1度変換してから計測
+                list(batch_renderer.render_many(documents[:jobs * 2], chunksize=1))
+                start = time.perf_counter()
+                for _ in batch_renderer.render_many(documents):
+                    pass
+                report(backend, time.perf_counter() - start, documents)
+        except UnsupportedBackendException as e:
+            print(f'{backend:>28} {e.message}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+パース結果のバイナリ形式について、pickle・再パースと比較した処理時間・サイズを計測
+
+usage: python benchmark/codec_benchmark.py
+"""
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.element import codec
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.converter.converter import Converter
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+REPEAT_SAMPLE = 100
+
+
+def measure(func) -> float:
+    """
+    1回あたりの処理時間を計測
+
+    :param func: 計測対象関数
+    :return: 処理時間(秒)
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    with open(SAMPLE_PATH, 'r') as f:
+        lines = f.read().splitlines() * REPEAT_SAMPLE
+
+    parsed = MarkdownParser().parse(lines)
+    converted = Converter().convert(MarkdownParser().parse(lines))
+
+    print(f'lines: {len(lines)}')
+    print(f'{"target":>10} {"format":>8} {"size[KB]":>10} {"dump[ms]":>10} {"load[ms]":>10}')
+    for name, result in [('parsed', parsed), ('converted', converted)]:
+        for format_name, dumps, loads in [('pickle', pickle.dumps, pickle.loads), ('codec', codec.dumps, codec.loads)]:
+            data = dumps(result)
+            dump_time = measure(lambda: dumps(result))
+            load_time = measure(lambda: loads(data))
+            print(f'{name:>10} {format_name:>8} {len(data) / 1024:>10.1f} '
+                  f'{dump_time * 1000:>10.2f} {load_time * 1000:>10.2f}')
+
+    reparse_time = measure(lambda: MarkdownParser().parse(lines))
+    print(f'reparse[ms]: {reparse_time * 1000:.2f}')
+
+
+if __name__ == '__main__':
+    main()
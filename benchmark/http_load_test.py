@@ -0,0 +1,118 @@
+"""
+HTTPサーバへ複数のクライアントから同時に変換を要求し、スループット・応答時間を計測
+初回の変換・保持しておいた変換結果の応答・If-None-Matchによる304応答それぞれの場合を計測する
+
+usage: python benchmark/http_load_test.py [クライアント数] [クライアントあたりの要求数] [URL]
+URLを省略した場合は、同じプロセスでHTTPサーバを起動して計測
+"""
+import http.client
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.http_server import RenderHTTPServer, RENDER_PATH
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+DEFAULT_CLIENT_COUNT = 8
+DEFAULT_REQUEST_COUNT = 200
+
+
+def run_client(host: str, port: int, bodies: list[bytes], conditional: bool) -> list[float]:
+    """
+    1つの接続で要求を繰り返し、要求ごとの応答時間を計測
+
+    :param host: 接続先ホスト
+    :param port: 接続先ポート
+    :param bodies: 要求ごとに送信するマークダウン
+    :param conditional: Trueの場合、前回の応答のETagをIf-None-Matchへ指定
+    :return: 要求ごとの応答時間[s]
+    """
+
+    connection = http.client.HTTPConnection(host, port)
+    latencies = []
+    etag = None
+
+    for body in bodies:
+        headers = {'If-None-Match': etag} if conditional and etag else {}
+        start = time.perf_counter()
+        connection.request('POST', RENDER_PATH, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        etag = response.getheader('ETag')
+
+    connection.close()
+    return latencies
+
+
+def measure(host: str, port: int, client_count: int, bodies_per_client: list[list[bytes]],
+            conditional: bool = False) -> tuple[float, list[float]]:
+    """
+    複数のクライアントから同時に要求を送信
+
+    :return: 経過時間[s]と、すべての要求の応答時間[s]
+    """
+
+    with ThreadPoolExecutor(max_workers=client_count) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(lambda bodies: run_client(host, port, bodies, conditional), bodies_per_client))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, [latency for latencies in results for latency in latencies]
+
+
+def report(label: str, elapsed: float, latencies: list[float]):
+    """
+    スループット・応答時間の分布を出力
+    """
+
+    latencies = sorted(latencies)
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f'{label:>12} {len(latencies) / elapsed:>10.0f} {statistics.mean(latencies) * 1000:>9.2f} '
+          f'{percentile(0.5):>9.2f} {percentile(0.99):>9.2f}')
+
+
+def main():
+    client_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CLIENT_COUNT
+    request_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_REQUEST_COUNT
+
+    server = None
+    if len(sys.argv) > 3:
+        url = urlsplit(sys.argv[3])
+        host, port = url.hostname, url.port
+    else:
+        server = RenderHTTPServer(('127.0.0.1', 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+    with open(SAMPLE_PATH, 'rb') as f:
+        sample = f.read()
+
+    print(f'clients: {client_count}, requests/client: {request_count}, document: {len(sample)} bytes')
+    print(f'{"":>12} {"req/s":>10} {"mean[ms]":>9} {"p50[ms]":>9} {"p99[ms]":>9}')
+
+    # 要求ごとに異なる文書とし、毎回変換させる
+    unique_bodies = [[sample + f'\n{client}-{index}'.encode('utf-8') for index in range(request_count)]
+                     for client in range(client_count)]
+    report('render', *measure(host, port, client_count, unique_bodies))
+
+    # 同じ文書を要求し、保持しておいた変換結果を応答させる
+    same_bodies = [[sample] * request_count for _ in range(client_count)]
+    report('cached', *measure(host, port, client_count, same_bodies))
+
+    # ETagを送信し、304を応答させる
+    report('304', *measure(host, port, client_count, same_bodies, conditional=True))
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
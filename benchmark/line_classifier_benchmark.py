@@ -0,0 +1,67 @@
+"""
+行の種別判定について、純Python・NumPyそれぞれの処理時間を計測し、NumPyの方が速くなる行数を求める
+
+usage: python benchmark/line_classifier_benchmark.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.markdown import line_classifier
+from a_pompom_markdown_parser.markdown.line_classifier import classify_lines_python, classify_lines_numpy
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+LINE_COUNTS = [10, 100, 500, 1000, 2000, 5000, 10000, 100000]
+
+
+def load_lines(line_count: int) -> list[str]:
+    """
+    サンプル記事を繰り返し、指定行数の文書を生成
+
+    :param line_count: 行数
+    :return: 行リスト
+    """
+    with open(SAMPLE_PATH, 'r') as f:
+        sample = f.read().splitlines()
+
+    return (sample * (line_count // len(sample) + 1))[:line_count]
+
+
+def measure(func, lines: list[str]) -> float:
+    """
+    1回あたりの処理時間を計測
+
+    :param func: 計測対象関数
+    :param lines: 入力行リスト
+    :return: 処理時間(秒)
+    """
+    timer = timeit.Timer(lambda: func(lines))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    if line_classifier.numpy is None:
+        print('NumPyがインストールされていないため、計測できません。')
+        sys.exit(1)
+
+    print(f'{"lines":>8} {"python[ms]":>12} {"numpy[ms]":>12} {"parse[ms]":>12} {"faster":>8}')
+    for line_count in LINE_COUNTS:
+        lines = load_lines(line_count)
+        python_time = measure(classify_lines_python, lines)
+        numpy_time = measure(classify_lines_numpy, lines)
+        # 判定が文書全体のパース処理に占める割合を把握するため、パース処理もあわせて計測
+        parse_time = measure(lambda target: MarkdownParser().parse(target), lines)
+        faster = 'numpy' if numpy_time < python_time else 'python'
+
+        print(f'{line_count:>8} {python_time * 1000:>12.3f} {numpy_time * 1000:>12.3f} '
+              f'{parse_time * 1000:>12.3f} {faster:>8}')
+
+    print(f'現在の閾値: NUMPY_THRESHOLD_LINES = {line_classifier.NUMPY_THRESHOLD_LINES}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+大きな文書について、1プロセスでのパースと、ワーカー数を変えた並列パースの処理時間を計測
+
+usage: python benchmark/parallel_parser_benchmark.py [行数]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.markdown.parallel_parser import ParallelMarkdownParser
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+DEFAULT_LINE_COUNT = 500000
+
+
+def load_lines(line_count: int) -> list[str]:
+    """
+    サンプル記事を繰り返し、指定行数の文書を生成
+
+    :param line_count: 行数
+    :return: 行リスト
+    """
+    with open(SAMPLE_PATH, 'r') as f:
+        sample = f.read().splitlines()
+
+    return (sample * (line_count // len(sample) + 1))[:line_count]
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINE_COUNT
+    lines = load_lines(line_count)
+
+    start = time.perf_counter()
+    MarkdownParser().parse(lines)
+    serial_time = time.perf_counter() - start
+    print(f'lines: {line_count}, cpu: {os.cpu_count()}')
+    print(f'{"workers":>8} {"time[s]":>10} {"speedup":>8}')
+    print(f'{"serial":>8} {serial_time:>10.2f} {1:>8.2f}')
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelMarkdownParser(workers=workers) as parser:
+            # ワーカープロセスの起動時間を除くため、1度パースしてから計測
+            parser.parse(lines[:ParallelMarkdownParser.MIN_CHUNK_LINES * 2])
+            start = time.perf_counter()
+            parser.parse(lines)
+            parallel_time = time.perf_counter() - start
+
+        print(f'{workers:>8} {parallel_time:>10.2f} {serial_time / parallel_time:>8.2f}')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+大きさの異なる文書が混在する入力について、1件ずつの変換と、render_manyによる変換のスループットを計測
+
+usage: python benchmark/render_many_benchmark.py [小さな文書数] [大きな文書数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.main import parse_md_to_html_by_string
+from a_pompom_markdown_parser.batch import BatchRenderer
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+DEFAULT_SMALL_COUNT = 20000
+DEFAULT_LARGE_COUNT = 20
+# 大きな文書はサンプル記事の本文をこの回数だけ繰り返したもの
+LARGE_REPEAT = 100
+
+
+def load_documents(small_count: int, large_count: int) -> list[str]:
+    """
+    1行程度の小さな文書と、サンプル記事を繰り返した大きな文書を混在させた入力を生成
+
+    :param small_count: 小さな文書数
+    :param large_count: 大きな文書数
+    :return: マークダウン文字列のリスト
+    """
+    with open(SAMPLE_PATH, 'r') as f:
+        sample = f.read()
+
+    documents = [f'# 文書{index}\n* [リンク](https://example.com/{index}) `code`' for index in range(small_count)]
+    # 目次は文書ごとに1つとし、目次の数に比例して変換時間が延びないようにする
+    large_document = sample + sample.replace('[toc]', '') * LARGE_REPEAT
+    documents += [large_document for _ in range(large_count)]
+    random.Random(0).shuffle(documents)
+    return documents
+
+
+def report(label: str, elapsed: float, documents: list[str]):
+    """
+    文書数・文字数あたりのスループットを出力
+    """
+    chars = sum(len(document) for document in documents)
+    print(f'{label:>28} {elapsed:>8.2f} {len(documents) / elapsed:>10.0f} {chars / elapsed / 1024 / 1024:>8.2f}')
+
+
+def main():
+    small_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SMALL_COUNT
+    large_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LARGE_COUNT
+    documents = load_documents(small_count, large_count)
+
+    print(f'small: {small_count}, large: {large_count}, cpu: {os.cpu_count()}')
+    print(f'{"":>28} {"time[s]":>8} {"docs/s":>10} {"MiB/s":>8}')
+
+    start = time.perf_counter()
+    for document in documents:
+        parse_md_to_html_by_string(document)
+    report('parse_md_to_html_by_string', time.perf_counter() - start, documents)
+
+    # CPUが1つの環境でもプロセス間の受け渡しのコストを比較できるよう、ワーカーは2つ以上とする
+    workers = max(2, os.cpu_count() or 1)
+    for jobs, chunksize, ordered in [(1, 1, True), (workers, 1, True), (workers, 64, True), (workers, 64, False)]:
+        with BatchRenderer(jobs) as batch_renderer:
+            # ワーカープロセスの起動時間を除くため、1度変換してから計測
+            list(batch_renderer.render_many(documents[:jobs * 2], chunksize=1))
+            start = time.perf_counter()
+            for _ in batch_renderer.render_many(documents, chunksize=chunksize, ordered=ordered):
+                pass
+            report(f'jobs={jobs} chunk={chunksize} {"ordered" if ordered else "unordered"}',
+                   time.perf_counter() - start, documents)
+
+
+if __name__ == '__main__':
+    main()
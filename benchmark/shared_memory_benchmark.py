@@ -0,0 +1,88 @@
+"""
+大きな文書をワーカープロセスへ受け渡すとき、pickleによる受け渡しと、共有メモリによる受け渡しの処理時間を計測
+受け渡しのみ(ワーカーは受け取った文書をそのまま返却)と、変換を含めた全体のそれぞれを計測する
+
+usage: python benchmark/shared_memory_benchmark.py [文書の大きさ[MiB]...]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.batch import BatchRenderer, create_worker_pool
+from a_pompom_markdown_parser.shared_buffer import Segment, SharedArena, SegmentWriter, read_segment
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+DEFAULT_SIZES = [1, 4, 16]
+# 受け渡しのみの計測で繰り返す回数
+ROUND_TRIPS = 20
+# 変換結果は入力より大きいので、受け渡しのみの計測でも返却する文字列を大きくする
+RESPONSE_RATIO = 5
+
+
+def echo_pickle(markdown_content: str) -> str:
+    return markdown_content * RESPONSE_RATIO
+
+
+def echo_shared(input_segment: Segment, output_segment: Segment) -> Segment:
+    with SegmentWriter(output_segment) as writer:
+        return writer.write(read_segment(input_segment).decode('utf-8').encode('utf-8') * RESPONSE_RATIO)
+
+
+def round_trip_shared(executor: ProcessPoolExecutor, markdown_content: str) -> str:
+    encoded = markdown_content.encode('utf-8')
+    with SharedArena(len(encoded) * (1 + RESPONSE_RATIO)) as arena:
+        input_segment = arena.write(encoded)
+        output_segment = arena.allocate(len(encoded) * RESPONSE_RATIO)
+        return arena.read(executor.submit(echo_shared, input_segment, output_segment).result()).decode('utf-8')
+
+
+def load_document(size_mib: int) -> str:
+    """
+    サンプル記事を繰り返し、指定した大きさの文書を生成 目次は先頭の1つのみとする
+    """
+    with open(SAMPLE_PATH, 'r') as f:
+        sample = f.read()
+
+    body = sample.replace('[toc]', '')
+    return sample + body * (size_mib * 1024 * 1024 // len(body.encode('utf-8')))
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or DEFAULT_SIZES
+    print(f'cpu: {os.cpu_count()}')
+    print(f'{"":>20} {"MiB":>5} {"pickle[ms]":>11} {"shared[ms]":>11} {"ratio":>6}')
+
+    executor = create_worker_pool(1)
+    for size in sizes:
+        document = load_document(size)
+        elapsed = {}
+        for label, round_trip in [('pickle', lambda: executor.submit(echo_pickle, document).result()),
+                                  ('shared', lambda: round_trip_shared(executor, document))]:
+            round_trip()
+            start = time.perf_counter()
+            for _ in range(ROUND_TRIPS):
+                round_trip()
+            elapsed[label] = (time.perf_counter() - start) / ROUND_TRIPS * 1000
+        print(f'{"round trip":>20} {size:>5} {elapsed["pickle"]:>11.1f} {elapsed["shared"]:>11.1f} '
+              f'{elapsed["pickle"] / elapsed["shared"]:>6.2f}')
+    executor.shutdown()
+
+    for size in sizes:
+        documents = [load_document(size)] * 2
+        elapsed = {}
+        # 閾値を0とすれば常にpickleで、1とすれば常に共有メモリで受け渡す
+        for label, shared_memory_min_chars in [('pickle', 0), ('shared', 1)]:
+            with BatchRenderer(jobs=2, shared_memory_min_chars=shared_memory_min_chars) as batch_renderer:
+                list(batch_renderer.render_many(['# warm up'] * 2, chunksize=1))
+                start = time.perf_counter()
+                list(batch_renderer.render_many(documents, chunksize=1))
+                elapsed[label] = (time.perf_counter() - start) / len(documents) * 1000
+        print(f'{"render_many":>20} {size:>5} {elapsed["pickle"]:>11.1f} {elapsed["shared"]:>11.1f} '
+              f'{elapsed["pickle"] / elapsed["shared"]:>6.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+ワーカープロセスの起動方式ごとに、プールを生成してから各ワーカーが最初の変換を返すまでの時間を計測
+起動方式の状態(forkserverの生成元プロセスなど)を持ち越さないよう、方式ごとに別のプロセスで計測する
+
+usage: python benchmark/worker_startup_benchmark.py [ワーカー数]
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from a_pompom_markdown_parser.batch import create_worker_pool, render_timed_chunk
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'template', 'markdown', 'sample_article.md')
+DEFAULT_JOBS = 4
+# 起動時の処理を済ませない素のプールと、create_worker_poolによるプール
+CONFIGS = [(prewarm, method) for prewarm in (False, True) for method in ('spawn', 'forkserver', 'fork')]
+
+
+def measure(jobs: int, prewarm: bool, start_method: str) -> list[float]:
+    """
+    プールを生成してから、ワーカー数だけ受け渡した最初の変換をそれぞれ受け取るまでの時間[s]を計測
+
+    :return: 変換を受け取った順の経過時間
+    """
+    with open(SAMPLE_PATH, 'r') as f:
+        sample = f.read()
+
+    start = time.perf_counter()
+    if prewarm:
+        executor = create_worker_pool(jobs, start_method)
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(start_method))
+    futures = [executor.submit(render_timed_chunk, [sample]) for _ in range(jobs)]
+    latencies = []
+    for future in as_completed(futures):
+        future.result()
+        latencies.append(time.perf_counter() - start)
+    executor.shutdown()
+
+    return latencies
+
+
+def main():
+    # 子プロセスとして呼び出された場合は、1つの方式のみ計測して出力
+    if len(sys.argv) > 2:
+        latencies = measure(int(sys.argv[1]), sys.argv[2] == 'prewarm', sys.argv[3])
+        print(' '.join(f'{latency:.4f}' for latency in latencies))
+        return
+
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_JOBS
+    print(f'jobs: {jobs}, cpu: {os.cpu_count()}')
+    print(f'{"":>24} {"first[ms]":>10} {"mean[ms]":>10} {"last[ms]":>10}')
+    for prewarm, start_method in CONFIGS:
+        if start_method not in multiprocessing.get_all_start_methods():
+            continue
+        output = subprocess.run([sys.executable, __file__, str(jobs), 'prewarm' if prewarm else 'plain', start_method],
+                                capture_output=True, text=True, check=True).stdout
+        latencies = [float(latency) * 1000 for latency in output.split()]
+        label = f'{"prewarm" if prewarm else "plain"} {start_method}'
+        print(f'{label:>24} {latencies[0]:>10.1f} {sum(latencies) / len(latencies):>10.1f} {latencies[-1]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
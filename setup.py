@@ -17,4 +17,8 @@ setuptools.setup(
         'console_scripts': ['a_pompom_markdown_parse = a_pompom_markdown_parser.main:execute']
     },
     python_requires='>=3.10',
+    # 大きな文書の行の種別判定をベクトル化するときのみ利用
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
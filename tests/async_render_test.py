@@ -0,0 +1,192 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from a_pompom_markdown_parser import async_render
+from a_pompom_markdown_parser.async_render import AsyncRenderer, render_async, render_file_async, \
+    render_stream_async
+from a_pompom_markdown_parser.main import parse_md_to_html_by_string
+
+from tests.util_equality import assert_that_text_file_content_is_same
+
+
+@pytest.fixture
+def blocking_render(monkeypatch):
+    """
+    Executorへ委譲される変換処理を、呼び出し元が解放するまで待機するものへ差し替えるfixture
+    """
+
+    release = threading.Event()
+    calls = []
+    state = {'running': 0, 'max_running': 0}
+    lock = threading.Lock()
+
+    def _render(markdown_content: str) -> str:
+        with lock:
+            calls.append(markdown_content)
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+        release.wait(timeout=5)
+        with lock:
+            state['running'] -= 1
+        return markdown_content
+
+    monkeypatch.setattr(async_render, 'parse_md_to_html_by_string', _render)
+    yield release, calls, state
+    release.set()
+
+
+class TestAsyncRenderer:
+    """ イベントループを止めずにマークダウン→HTMLへ変換できるか検証 """
+
+    # 同期処理と同じHTML文字列が得られるか
+    @pytest.mark.parametrize('inline_threshold', [0, 1000000], ids=['offload', 'inline'])
+    def test_render(self, inline_threshold: int):
+        # GIVEN
+        sut = AsyncRenderer(inline_threshold=inline_threshold)
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+        # WHEN
+        actual = asyncio.run(sut.render(markdown_content))
+        sut.close()
+        # THEN
+        assert actual == parse_md_to_html_by_string(markdown_content)
+
+    # 同時に委譲する処理の数が上限を超えないか
+    def test_max_concurrency(self, blocking_render):
+        # GIVEN
+        release, calls, state = blocking_render
+        sut = AsyncRenderer(executor=ThreadPoolExecutor(max_workers=4), max_concurrency=2, inline_threshold=0)
+
+        async def _render_all():
+            tasks = [asyncio.create_task(sut.render(f'document {i}')) for i in range(5)]
+            await asyncio.sleep(0.1)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        # WHEN
+        actual = asyncio.run(_render_all())
+        # THEN
+        assert actual == [f'document {i}' for i in range(5)]
+        assert state['max_running'] == 2
+
+    # キャンセルした場合、委譲先で未着手の処理は実行されないか
+    def test_cancel(self, blocking_render):
+        # GIVEN
+        release, calls, state = blocking_render
+        sut = AsyncRenderer(executor=ThreadPoolExecutor(max_workers=1), max_concurrency=2, inline_threshold=0)
+
+        async def _cancel_second():
+            first = asyncio.create_task(sut.render('first'))
+            second = asyncio.create_task(sut.render('second'))
+            await asyncio.sleep(0.1)
+            second.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await second
+            return await first
+
+        # WHEN
+        actual = asyncio.run(_cancel_second())
+        # THEN
+        assert actual == 'first'
+        assert calls == ['first']
+
+    # 文字数の閾値によらず、ファイルの読み書きを伴う変換は委譲するか
+    def test_render_file_offload(self, tmp_path):
+        # GIVEN
+        executor = ThreadPoolExecutor(max_workers=1)
+        sut = AsyncRenderer(executor=executor, inline_threshold=1000000)
+        in_file_path = tmp_path / 'in.md'
+        in_file_path.write_text('# 見出し')
+        submitted = []
+        original_submit = executor.submit
+
+        def _submit(func, *args):
+            submitted.append(func)
+            return original_submit(func, *args)
+
+        executor.submit = _submit
+        # WHEN
+        asyncio.run(sut.render_file(str(in_file_path), str(tmp_path / 'out.html')))
+        executor.shutdown()
+        # THEN
+        assert submitted == [async_render.parse_md_to_html]
+        assert (tmp_path / 'out.html').read_text() == parse_md_to_html_by_string('# 見出し')
+
+    # HTML文字列を断片ごとに受け取れるか
+    @pytest.mark.parametrize('inline_threshold', [0, 1000000], ids=['offload', 'inline'])
+    def test_render_stream(self, inline_threshold: int):
+        # GIVEN
+        sut = AsyncRenderer(inline_threshold=inline_threshold)
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+
+        async def _collect():
+            return [chunk async for chunk in sut.render_stream(markdown_content, flush_size=0)]
+
+        # WHEN
+        actual = asyncio.run(_collect())
+        sut.close()
+        # THEN
+        assert len(actual) > 1
+        assert ''.join(actual) == parse_md_to_html_by_string(markdown_content)
+
+    # 委譲先が別プロセスの場合も、HTML文字列を断片ごとに受け取れるか
+    def test_render_stream_process(self):
+        # GIVEN
+        executor = ProcessPoolExecutor(max_workers=1)
+        sut = AsyncRenderer(executor=executor, inline_threshold=0)
+        markdown_content = '\n'.join(['# 見出し', '段落', '* リスト'])
+
+        async def _collect():
+            return [chunk async for chunk in sut.render_stream(markdown_content, flush_size=0)]
+
+        # WHEN
+        try:
+            actual = asyncio.run(_collect())
+        finally:
+            executor.shutdown()
+        # THEN
+        assert len(actual) > 1
+        assert ''.join(actual) == parse_md_to_html_by_string(markdown_content)
+
+
+class TestRenderAsync:
+    """ モジュールの関数からファイル・文字列を変換できるか検証 """
+
+    def test_render_file_async(self, tmp_path):
+        # GIVEN
+        sut = render_file_async
+        out_file_path = str(tmp_path / 'sample_article.html')
+        # WHEN
+        asyncio.run(sut('./template/markdown/sample_article.md', out_file_path))
+        # THEN
+        assert_that_text_file_content_is_same('./template/html/sample_article.html', out_file_path)
+
+    # 異なるイベントループから繰り返し呼び出せるか
+    def test_render_async_from_multiple_loops(self):
+        # GIVEN
+        sut = render_async
+        markdown_content = '# heading\n' * 100
+        # WHEN
+        actual = [asyncio.run(sut(markdown_content)) for _ in range(2)]
+        # THEN
+        assert actual[0] == actual[1] == parse_md_to_html_by_string(markdown_content)
+
+    # HTML文字列の断片を、モジュールの関数から受け取れるか
+    def test_render_stream_async(self):
+        # GIVEN
+        sut = render_stream_async
+        markdown_content = '# heading\n' * 100
+
+        async def _collect():
+            return [chunk async for chunk in sut(markdown_content, flush_size=1000)]
+
+        # WHEN
+        actual = asyncio.run(_collect())
+        # THEN
+        assert ''.join(actual) == parse_md_to_html_by_string(markdown_content)
@@ -0,0 +1,375 @@
+import concurrent.futures
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from a_pompom_markdown_parser import batch
+from a_pompom_markdown_parser.batch import BatchRenderer, render_many, split_to_chunks, plan_batch_tasks, \
+    convert_files, create_worker_pool, render_timed_chunk, create_executor, UnsupportedBackendException, \
+    DuplicateOutputException, BACKEND_THREAD, BACKEND_PROCESS, BACKEND_INTERPRETER
+from a_pompom_markdown_parser.metrics import RenderMetrics
+from a_pompom_markdown_parser.profiling import SlowDocumentLog
+from a_pompom_markdown_parser.trace import TraceRecorder
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.worker_pool import RecyclePolicy
+
+
+@pytest.fixture
+def markdown_contents() -> list[str]:
+    """
+    大きさの異なる文書を混在させた入力
+    """
+
+    with open('./template/markdown/sample_article.md', 'r') as f:
+        sample = f.read()
+
+    return [f'# 文書{index}\n* `{index}`' if index % 10 else sample * 20 for index in range(50)]
+
+
+class TestSplitToChunks:
+    """ 入力の文書を、受け渡す単位へまとめられるか検証 """
+
+    # 文書数・文字数の上限を超えない単位へまとめられるか
+    def test_split_to_chunks(self):
+        # GIVEN
+        sut = split_to_chunks
+        markdown_contents = ['a', 'b', 'c', 'd' * 10, 'e', 'f' * 100]
+        # WHEN
+        actual = list(sut(markdown_contents, chunksize=2, max_chars=12))
+        # THEN
+        assert actual == [['a', 'b'], ['c', 'd' * 10], ['e'], ['f' * 100]]
+
+
+class SlowFirstExecutor(ThreadPoolExecutor):
+    """ 最初に委譲された処理のみ、releasedが設定されるまで着手を待たせるExecutor """
+
+    def __init__(self, max_workers: int):
+        super().__init__(max_workers=max_workers)
+        self.released = threading.Event()
+        self._is_first = True
+
+    def submit(self, fn, /, *args, **kwargs):
+        if self._is_first:
+            self._is_first = False
+            return super().submit(self._wait_and_call, fn, *args)
+        return super().submit(fn, *args, **kwargs)
+
+    def _wait_and_call(self, fn, *args):
+        self.released.wait(5)
+        return fn(*args)
+
+
+class TestBatchRenderer:
+    """ 多数の文書をまとめて変換できるか検証 """
+
+    # 入力と同じ順で変換結果を出力できるか
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_render_many(self, markdown_contents: list[str], jobs: int):
+        # GIVEN
+        sut = render_many
+        expected = [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+        # WHEN
+        actual = list(sut(iter(markdown_contents), jobs=jobs, chunksize=4))
+        # THEN
+        assert actual == expected
+
+    # 変換を終えた順で出力した場合も、すべての変換結果を出力できるか
+    def test_render_many_unordered(self, markdown_contents: list[str]):
+        # GIVEN
+        expected = [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+        # WHEN
+        with BatchRenderer(jobs=4, executor=ThreadPoolExecutor(max_workers=4)) as sut:
+            actual = list(sut.render_many(markdown_contents, chunksize=3, ordered=False))
+        # THEN
+        assert sorted(actual) == sorted(expected)
+
+    # 大きな単位を共有メモリを介して受け渡しても、同じ変換結果が得られるか
+    def test_render_many_shared_memory(self, markdown_contents: list[str]):
+        # GIVEN
+        expected = [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+        # WHEN
+        with BatchRenderer(jobs=2, shared_memory_min_chars=1000) as sut:
+            actual = list(sut.render_many(markdown_contents, chunksize=4))
+        # THEN
+        assert actual == expected
+
+    # 先頭の単位の変換が遅れている間、後続の単位を出力待ちとして保持し続けず、入力の読み込みを止めるか
+    def test_render_many_bounded(self):
+        # GIVEN
+        markdown_contents = [f'# 文書{index}' for index in range(100)]
+        consumed = []
+
+        def _read():
+            for markdown_content in markdown_contents:
+                consumed.append(markdown_content)
+                yield markdown_content
+
+        executor = SlowFirstExecutor(max_workers=2)
+        actual = []
+        # WHEN
+        with BatchRenderer(jobs=2, executor=executor) as sut:
+            thread = threading.Thread(target=lambda: actual.extend(sut.render_many(_read(), chunksize=1)))
+            thread.start()
+            time.sleep(0.3)
+            consumed_while_blocked = len(consumed)
+            executor.released.set()
+            thread.join()
+        executor.shutdown()
+        # THEN
+        # 処理中・出力待ちの単位の上限(ワーカー数 * 2)と、次の単位をまとめるために先読みした1件
+        assert consumed_while_blocked <= 2 * batch.IN_FLIGHT_PER_WORKER + 1
+        assert actual == [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+
+    def test_render_many_empty(self):
+        # GIVEN
+        sut = render_many
+        # WHEN
+        actual = list(sut([], jobs=2))
+        # THEN
+        assert actual == []
+
+
+class TestPlanBatchTasks:
+    """ ファイルの大きさをもとに変換単位を組み立てられるか検証 """
+
+    # 大きなファイルは単独で、小さなファイルはまとめて、大きいものから順に並べられるか
+    def test_plan_batch_tasks(self, tmp_path):
+        # GIVEN
+        sut = plan_batch_tasks
+        sizes = {'tiny1': 10, 'large': 300, 'tiny2': 20, 'huge': 500, 'small': 60, 'tiny3': 30}
+        for name, size in sizes.items():
+            (tmp_path / f'{name}.md').write_text('a' * size)
+        in_file_paths = [str(tmp_path / f'{name}.md') for name in sizes]
+        # WHEN
+        actual = sut(in_file_paths, 'out', chunk_bytes=80)
+        # THEN
+        assert [[os.path.basename(in_path) for in_path, _ in task.files] for task in actual] == [
+            ['huge.md'], ['large.md'], ['small.md', 'tiny3.md'], ['tiny2.md', 'tiny1.md']
+        ]
+        assert [task.size for task in actual] == [500, 300, 90, 30]
+        assert actual[0].files[0][1] == os.path.join('out', 'huge.html')
+
+    # 別のディレクトリにある同名のファイルの出力先が重複する場合、変換単位を組み立てずに例外を送出するか
+    def test_duplicate_output(self, tmp_path):
+        # GIVEN
+        sut = plan_batch_tasks
+        in_file_paths = []
+        for directory in ['a', 'b']:
+            (tmp_path / directory).mkdir()
+            (tmp_path / directory / 'index.md').write_text('# 見出し')
+            in_file_paths.append(str(tmp_path / directory / 'index.md'))
+        # WHEN
+        with pytest.raises(DuplicateOutputException) as e:
+            sut(in_file_paths, 'out')
+        # THEN
+        assert e.value.message == f'入力ファイル: "{in_file_paths[0]}", "{in_file_paths[1]}"の出力先: ' \
+                                  f'"{os.path.join("out", "index.html")}"が重複しています。'
+
+
+class TestConvertFiles:
+    """ 複数のファイルを一括変換できるか検証 """
+
+    def test_convert_files(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            sample = f.read()
+        contents = {'small1': '# 小', 'small2': '* リスト', 'large': sample * 5}
+        for name, content in contents.items():
+            (tmp_path / f'{name}.md').write_text(content)
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        # WHEN
+        actual = sut([str(tmp_path / f'{name}.md') for name in contents], str(out_dir), jobs=2, chunk_bytes=1024,
+                     executor=ThreadPoolExecutor(max_workers=2))
+        # THEN
+        for name, content in contents.items():
+            assert (out_dir / f'{name}.html').read_text() == Renderer().render(content)
+        assert actual.file_count == 3
+        assert actual.task_count == 2
+        assert actual.file_times[0][0] == str(tmp_path / 'large.md')
+        assert 0 <= actual.tail_time <= actual.wall_time
+        assert 'tail:' in actual.format()
+
+    # 変換時間が閾値を超えたファイルを保存するか
+    def test_convert_files_slow_log(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        in_file_path = tmp_path / 'slow.md'
+        in_file_path.write_text('# 見出し')
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        slow_log = SlowDocumentLog(str(tmp_path / 'slow'), threshold=0.0)
+        # WHEN
+        actual = sut([str(in_file_path)], str(out_dir), jobs=1, executor=ThreadPoolExecutor(max_workers=1),
+                     slow_log=slow_log)
+        # THEN
+        assert len(actual.slow_captures) == 1
+        with open(actual.slow_captures[0], 'r') as f:
+            assert f.read() == '# 見出し'
+        assert 'slow documents captured: 1' in actual.format()
+
+    # ワーカーごとに記録した変換の区間と、読み書きの区間を1つの記録先へ統合するか
+    def test_convert_files_trace(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        for index in range(4):
+            (tmp_path / f'{index}.md').write_text(f'# {index}')
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        trace = TraceRecorder()
+        # WHEN
+        sut([str(tmp_path / f'{index}.md') for index in range(4)], str(out_dir), jobs=2, chunk_bytes=1,
+            trace=trace)
+        # THEN
+        assert [(out_dir / f'{index}.html').read_text() for index in range(4)] == \
+               [Renderer().render(f'# {index}') for index in range(4)]
+        events = trace.to_dict()['traceEvents']
+        renders = [event for event in events if event['name'] == 'render']
+        assert sorted(event['args']['document'] for event in renders) == \
+               [str(tmp_path / f'{index}.md') for index in range(4)]
+        # 変換はワーカープロセス、読み書きは呼び出し元のプロセスで記録する
+        assert os.getpid() not in {event['pid'] for event in renders}
+        assert {event['pid'] for event in events if event['name'] in ['read', 'write']} == {os.getpid()}
+        assert {event['args']['name'] for event in events if event['name'] == 'process_name'} == \
+               {'batch'} | {f'worker {event["pid"]}' for event in renders}
+
+    # 書き出しに失敗した場合、待機し続けずに例外を送出するか
+    def test_convert_files_write_error(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        for index in range(10):
+            (tmp_path / f'{index}.md').write_text(f'# {index}')
+        # WHEN
+        with pytest.raises(FileNotFoundError):
+            sut([str(tmp_path / f'{index}.md') for index in range(10)], str(tmp_path / 'missing'), jobs=2,
+                chunk_bytes=1, executor=ThreadPoolExecutor(max_workers=2))
+        # THEN
+        assert not (tmp_path / 'missing').exists()
+
+    # ワーカープロセスを入れ替えた履歴を、処理時間の内訳へ含めるか
+    def test_convert_files_recycle(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        for index in range(3):
+            (tmp_path / f'{index}.md').write_text(f'# {index}')
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        # WHEN
+        actual = sut([str(tmp_path / f'{index}.md') for index in range(3)], str(out_dir), jobs=1, chunk_bytes=1,
+                     recycle_policy=RecyclePolicy(max_tasks_per_child=2))
+        # THEN
+        assert [(out_dir / f'{index}.html').read_text() for index in range(3)] == \
+               [Renderer().render(f'# {index}') for index in range(3)]
+        assert len(actual.recycle_events) == 2
+        assert 'recycled workers: 2 (tasks: 2, memory: 0)' in actual.format()
+
+    # ファイルごとの変換時間と、ワーカープロセスの入れ替えをメトリクスへ記録するか
+    def test_convert_files_metrics(self, tmp_path):
+        # GIVEN
+        sut = convert_files
+        for index in range(3):
+            (tmp_path / f'{index}.md').write_text(f'# {index}')
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        metrics = RenderMetrics()
+        # WHEN
+        actual = sut([str(tmp_path / f'{index}.md') for index in range(3)], str(out_dir), jobs=1, chunk_bytes=1,
+                     recycle_policy=RecyclePolicy(max_tasks_per_child=2), metrics=metrics)
+        # THEN
+        exposed = metrics.registry.expose()
+        assert 'markdown_render_duration_seconds_count{size_le="1024"} 3' in exposed
+        assert f'markdown_worker_recycles_total{{reason="{actual.recycle_events[0].reason}"}} 2' in exposed
+
+
+    # 実行方式を指定した場合は、ワーカーが1つでも指定した方式で変換するか
+    @pytest.mark.parametrize(('backend', 'expected'), [(None, BACKEND_THREAD), (BACKEND_PROCESS, BACKEND_PROCESS)])
+    def test_convert_files_backend(self, tmp_path, monkeypatch, backend: str, expected: str):
+        # GIVEN
+        sut = convert_files
+        (tmp_path / 'article.md').write_text('# a')
+        out_dir = tmp_path / 'out'
+        out_dir.mkdir()
+        backends = []
+
+        def record_backend(jobs: int, actual_backend: str, recycle_policy: RecyclePolicy):
+            backends.append(actual_backend)
+            return ThreadPoolExecutor(max_workers=jobs)
+
+        monkeypatch.setattr(batch, 'create_executor', record_backend)
+        # WHEN
+        sut([str(tmp_path / 'article.md')], str(out_dir), jobs=1, backend=backend)
+        # THEN
+        assert backends == [expected]
+        assert (out_dir / 'article.html').read_text() == Renderer().render('# a')
+
+
+def _is_prewarmed() -> bool:
+    """
+    ワーカープロセスで、変換を受け取る前にRendererを組み立て済みであるか
+    """
+    return batch._worker_renderer is not None
+
+
+class TestCreateWorkerPool:
+    """ 起動時の処理を済ませたワーカープロセスを生成できるか検証 """
+
+    @pytest.mark.parametrize('start_method', ['forkserver', 'spawn'])
+    def test_create_worker_pool(self, start_method: str):
+        # GIVEN
+        sut = create_worker_pool
+        markdown_contents = ['# 見出し', '* リスト']
+        # WHEN
+        executor = sut(2, start_method)
+        try:
+            is_prewarmed = executor.submit(_is_prewarmed).result()
+            actual = executor.submit(render_timed_chunk, markdown_contents).result()
+        finally:
+            executor.shutdown()
+        # THEN
+        assert is_prewarmed
+        assert [html_text for html_text, _ in actual] == [Renderer().render(markdown_content)
+                                                          for markdown_content in markdown_contents]
+
+
+
+class TestCreateExecutor:
+    """ 実行方式と対応するExecutorを生成できるか検証 """
+
+    @pytest.mark.parametrize('backend', [BACKEND_THREAD, BACKEND_PROCESS])
+    def test_create_executor(self, backend: str):
+        # GIVEN
+        sut = create_executor
+        markdown_content = '> 引用'
+        # WHEN
+        executor = sut(2, backend)
+        try:
+            actual = executor.submit(render_timed_chunk, [markdown_content]).result()
+        finally:
+            executor.shutdown()
+        # THEN
+        assert actual[0][0] == Renderer().render(markdown_content)
+
+    # サブインタプリタを利用できない環境では、理由を伝える例外を送出するか
+    @pytest.mark.skipif(hasattr(concurrent.futures, 'InterpreterPoolExecutor'),
+                        reason='InterpreterPoolExecutorを利用できる環境')
+    def test_interpreter_unavailable(self):
+        # GIVEN
+        sut = create_executor
+        # WHEN
+        with pytest.raises(UnsupportedBackendException) as e:
+            sut(2, BACKEND_INTERPRETER)
+        # THEN
+        assert 'Python 3.14' in e.value.message
+
+    def test_recycle_with_thread(self):
+        # GIVEN
+        sut = create_executor
+        # WHEN
+        with pytest.raises(UnsupportedBackendException) as e:
+            sut(2, BACKEND_THREAD, RecyclePolicy(max_tasks_per_child=1))
+        # THEN
+        assert e.value.message == 'ワーカーの入れ替えは、実行方式: "process"でのみ利用できます。'
@@ -0,0 +1,43 @@
+import pytest
+
+from a_pompom_markdown_parser.cancellation import CancellationToken, RenderCancelledException, STAGE_PARSE, \
+    STAGE_BUILD
+
+
+class TestCancellationToken:
+    """ 取り消し・制限時間に応じて変換を打ち切れるか検証 """
+
+    # 取り消されていない・制限時間内の場合は打ち切らないか
+    def test_check_not_cancelled(self):
+        # GIVEN
+        sut = CancellationToken(timeout=60)
+        # WHEN
+        sut.check(STAGE_PARSE, 1)
+        # THEN
+        assert sut.error is None
+
+    # 取り消した場合、打ち切った段階・行番号を添えて例外を送出するか
+    def test_check_cancelled(self):
+        # GIVEN
+        sut = CancellationToken()
+        sut.cancel()
+        # WHEN
+        with pytest.raises(RenderCancelledException) as e:
+            sut.check(STAGE_PARSE, 3)
+        # THEN
+        assert e.value.message == '変換が取り消されました。 3行目'
+        assert e.value.stage == STAGE_PARSE
+        assert e.value.line_number == 3
+        assert sut.error is e.value
+
+    # 制限時間を超えた場合、例外を送出するか
+    def test_check_timeout(self):
+        # GIVEN
+        sut = CancellationToken(timeout=0)
+        # WHEN
+        with pytest.raises(RenderCancelledException) as e:
+            sut.check(STAGE_BUILD)
+        # THEN
+        assert e.value.message == '変換が制限時間を超えました。'
+        assert e.value.stage == STAGE_BUILD
+        assert e.value.line_number is None
@@ -253,3 +253,27 @@ class TestConverter:
         actual = sut.convert(parse_result)
         # THEN
         assert actual == expected
+
+    # 目次の位置へ出力したBlock要素に、変換を終えた時点で目次の実体が格納されるか
+    def test_convert_iter_toc_placeholder(self):
+        # GIVEN
+        sut = Converter()
+        blocks = [
+            TableOfContentsBlock(children=[]),
+            HeadingBlock(size=2, children=[PlainInline(text='概要')]),
+        ]
+        expected_toc = [
+            ListBlock(indent_depth=0, children=[
+                ListItemBlock(indent_depth=1, children=[LinkInline(text='概要', href='#概要')])
+            ])
+        ]
+        # WHEN
+        iterator = sut.convert_iter(iter(blocks))
+        placeholder = next(iterator)
+        is_empty_before_end = len(placeholder.children) == 0
+        rest = list(iterator)
+        # THEN
+        assert isinstance(placeholder, TableOfContentsBlock)
+        assert is_empty_before_end
+        assert repr(placeholder.children) == repr(expected_toc)
+        assert repr(rest) == repr(blocks[1:])
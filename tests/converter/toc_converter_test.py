@@ -388,3 +388,18 @@ class TestTocConverter:
         # THEN
         for actual, expected in zip(actual_list, expected_list):
             assert actual == expected
+
+    # 上限より深いヘッダを目次に含めないか
+    def test_generate_max_depth(self):
+        # GIVEN
+        sut = TocConverter(max_depth=2)
+        header_list = [
+            HeadingBlock(size=1, children=[PlainInline(text='概要')]),
+            HeadingBlock(size=3, children=[PlainInline(text='補足')]),
+            HeadingBlock(size=2, children=[PlainInline(text='詳細')]),
+        ]
+        expected = TocConverter().generate([header_list[0], header_list[2]])
+        # WHEN
+        actual = sut.generate(header_list)
+        # THEN
+        assert repr(actual) == repr(expected)
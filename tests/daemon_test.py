@@ -0,0 +1,240 @@
+import os
+import socket
+import stat
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from a_pompom_markdown_parser.daemon import RenderDaemon, RenderClient, DaemonException, render_by_daemon, \
+    remove_stale_socket, MAX_REQUEST_SIZE
+from a_pompom_markdown_parser.limits import Limits
+from a_pompom_markdown_parser.profiling import SlowDocumentLog, SLOW_LOG_INDEX
+from a_pompom_markdown_parser.renderer import Renderer
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """
+    常駐プロセスを別スレッドで起動するfixture
+
+    :return: ソケットファイルパス
+    """
+
+    socket_path = str(tmp_path / 'md.sock')
+    render_daemon = RenderDaemon(socket_path, max_request_size=1024)
+    thread = threading.Thread(target=render_daemon.serve_forever)
+    thread.start()
+
+    yield socket_path
+
+    render_daemon.shutdown()
+    thread.join()
+    render_daemon.server_close()
+
+
+class TestRenderDaemon:
+    """ 常駐プロセスへ変換を要求できるか検証 """
+
+    def test_render_by_daemon(self, daemon: str):
+        # GIVEN
+        sut = render_by_daemon
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+        # WHEN
+        actual = sut(daemon, markdown_content[:1000])
+        # THEN
+        assert actual == Renderer().render(markdown_content[:1000])
+
+    # 1つの接続で、繰り返し変換を要求できるか
+    def test_render_repeatedly(self, daemon: str):
+        # GIVEN
+        markdown_contents = ['# 概要', '', '* リスト\n* `コード`']
+        # WHEN
+        with RenderClient(daemon) as sut:
+            actual = [sut.render(markdown_content) for markdown_content in markdown_contents]
+        # THEN
+        assert actual == [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+
+    # 複数のクライアントから同時に変換を要求できるか
+    def test_render_concurrently(self, daemon: str):
+        # GIVEN
+        sut = render_by_daemon
+        markdown_contents = [f'# ヘッダ{index}\n> 引用{index}' for index in range(32)]
+        # WHEN
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            actual = list(executor.map(lambda markdown_content: sut(daemon, markdown_content), markdown_contents))
+        # THEN
+        assert actual == [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+
+    # 上限を超える大きさの要求は、エラーとして応答されるか
+    def test_request_too_large(self, daemon: str):
+        # GIVEN
+        sut = render_by_daemon
+        # WHEN
+        with pytest.raises(DaemonException) as e:
+            sut(daemon, 'a' * 2048)
+        # THEN
+        assert '上限' in e.value.message
+
+    # 要求の大きさの上限を省略した場合、Rendererの入力のバイト数の上限に揃えるか
+    @pytest.mark.parametrize(('limits', 'expected'), [
+        (Limits(max_bytes=100), 100),
+        (None, MAX_REQUEST_SIZE),
+    ], ids=['limits', 'no limits'])
+    def test_max_request_size(self, tmp_path, limits: Limits, expected: int):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        # WHEN
+        sut = RenderDaemon(socket_path, Renderer(limits=limits))
+        sut.server_close()
+        # THEN
+        assert sut.max_request_size == expected
+
+    # 応答の本文を受け取る前に接続が閉じられた場合、空の変換結果ではなくエラーとするか
+    def test_closed_before_payload(self, tmp_path):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(socket_path)
+        server_socket.listen(1)
+
+        def _respond_header_only():
+            connection, _ = server_socket.accept()
+            with connection:
+                connection.recv(1024)
+                connection.sendall(struct.pack('>BI', 0, 10))
+
+        thread = threading.Thread(target=_respond_header_only)
+        thread.start()
+        # WHEN
+        try:
+            with RenderClient(socket_path) as client:
+                with pytest.raises(DaemonException) as e:
+                    client.render('# 見出し')
+        finally:
+            thread.join()
+            server_socket.close()
+        # THEN
+        assert e.value.message == '応答を受け取る前に接続が閉じられました。'
+
+
+class FailingRenderer(Renderer):
+    """ 「fail」を含む文書の変換で、想定外の例外を送出するRenderer """
+
+    def render(self, markdown_content: str, *args, **kwargs) -> str:
+        if 'fail' in markdown_content:
+            raise RecursionError()
+        return super().render(markdown_content, *args, **kwargs)
+
+
+class TestRenderFailure:
+    """ 変換に失敗した場合も、常駐プロセスが要求を受け付け続けるか検証 """
+
+    # 想定外の例外はエラーとして応答し、同じ接続で以降の要求を変換できるか
+    def test_unexpected_error(self, tmp_path):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        render_daemon = RenderDaemon(socket_path, renderer=FailingRenderer())
+        thread = threading.Thread(target=render_daemon.serve_forever)
+        thread.start()
+        # WHEN
+        try:
+            with RenderClient(socket_path) as client:
+                with pytest.raises(DaemonException) as e:
+                    client.render('fail')
+                actual = client.render('# 見出し')
+        finally:
+            render_daemon.shutdown()
+            thread.join()
+            render_daemon.server_close()
+        # THEN
+        assert e.value.message == '変換に失敗しました。'
+        assert actual == Renderer().render('# 見出し')
+        assert 'markdown_render_errors_total{reason="internal"} 1' in render_daemon.metrics.registry.expose()
+
+    # ソケットファイルは、生成した時点から同じユーザのみ読み書きできるか
+    def test_socket_permission(self, tmp_path):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        previous_umask = os.umask(0)
+        # WHEN
+        try:
+            render_daemon = RenderDaemon(socket_path)
+        finally:
+            os.umask(previous_umask)
+        # THEN
+        try:
+            assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+            assert os.umask(previous_umask) == previous_umask
+        finally:
+            render_daemon.server_close()
+
+
+class TestSlowDocumentLog:
+    """ 変換時間が閾値を超えた文書を、常駐プロセスが保存するか検証 """
+
+    def test_capture_slow_document(self, tmp_path):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        slow_log_dir = tmp_path / 'slow'
+        render_daemon = RenderDaemon(socket_path, slow_log=SlowDocumentLog(str(slow_log_dir), threshold=0.0))
+        thread = threading.Thread(target=render_daemon.serve_forever)
+        thread.start()
+        # WHEN
+        try:
+            with RenderClient(socket_path) as client:
+                actual = client.render('# 見出し')
+                # 保存は応答の後に行われるので、次の応答を受け取った時点で最初の文書の保存は終えている
+                client.render('段落')
+        finally:
+            render_daemon.shutdown()
+            thread.join()
+            render_daemon.server_close()
+        # THEN
+        assert actual == Renderer().render('# 見出し')
+        with open(slow_log_dir / SLOW_LOG_INDEX, 'r') as f:
+            assert len(f.readlines()) >= 1
+
+
+class TestMetrics:
+    """ 常駐プロセスが変換時間・失敗の件数を記録するか検証 """
+
+    def test_metrics(self, tmp_path):
+        # GIVEN
+        socket_path = str(tmp_path / 'md.sock')
+        render_daemon = RenderDaemon(socket_path, max_request_size=1024)
+        thread = threading.Thread(target=render_daemon.serve_forever)
+        thread.start()
+        # WHEN
+        try:
+            with RenderClient(socket_path) as client:
+                client.render('# 見出し')
+                with pytest.raises(DaemonException):
+                    client.render('a' * 2048)
+        finally:
+            render_daemon.shutdown()
+            thread.join()
+            render_daemon.server_close()
+        # THEN
+        actual = render_daemon.metrics.registry.expose()
+        assert 'markdown_render_duration_seconds_count{size_le="1024"} 1' in actual
+        assert 'markdown_render_errors_total{reason="request_too_large"} 1' in actual
+        assert 'markdown_render_queue_depth 0' in actual
+
+
+class TestRemoveStaleSocket:
+    """ 前回の起動で残ったソケットファイルを扱えるか検証 """
+
+    # ソケット以外のファイルは削除せず、エラーとするか
+    def test_not_socket(self, tmp_path):
+        # GIVEN
+        sut = remove_stale_socket
+        file_path = tmp_path / 'md.sock'
+        file_path.write_text('not socket')
+        # WHEN
+        with pytest.raises(DaemonException):
+            sut(str(file_path))
+        # THEN
+        assert os.path.exists(file_path)
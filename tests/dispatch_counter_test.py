@@ -0,0 +1,46 @@
+from a_pompom_markdown_parser.dispatch_counter import DispatchCounters, GROUP_BLOCK_PARSER, GROUP_INLINE_PARSER, \
+    GROUP_BLOCK_BUILDER
+from a_pompom_markdown_parser.markdown.block_parser import HeadingParser, QuoteParser
+from a_pompom_markdown_parser.renderer import Renderer
+
+
+class TestDispatchCounters:
+    """ パーサ・ビルダごとの呼び出し回数・処理時間を記録できるか検証 """
+
+    # 包んだパーサは元のパーサと同じように振る舞うか
+    def test_wrap(self):
+        # GIVEN
+        sut = DispatchCounters()
+        # WHEN
+        heading_parser, quote_parser = sut.wrap(GROUP_BLOCK_PARSER, [HeadingParser(), QuoteParser()])
+        is_heading = [heading_parser.is_target(line) for line in ['# 見出し', '段落', '> 引用']]
+        # THEN
+        assert is_heading == [True, False, False]
+        assert heading_parser.extract_text('# 見出し') == '見出し'
+        assert heading_parser.PATTERN == HeadingParser.PATTERN
+        heading, quote = sut.snapshot()
+        assert (heading.name, heading.attempts, heading.matches) == ('HeadingParser', 3, 1)
+        assert heading.work_time > 0
+        assert (quote.name, quote.attempts, quote.matches) == ('QuoteParser', 0, 0)
+
+    # 変換結果を変えずに、先頭から順に試されたパーサ・ビルダを記録できるか
+    def test_render_with_counters(self):
+        # GIVEN
+        sut = DispatchCounters()
+        renderer = Renderer(counters=sut)
+        markdown_content = '\n'.join(['# 見出し', '`code`と[link](url)', '> 引用'])
+        # WHEN
+        actual = renderer.render(markdown_content)
+        # THEN
+        assert actual == Renderer().render(markdown_content)
+        counts = {(count.group, count.name): count for count in sut.snapshot()}
+        # 先頭のLinkParserは、「`code`と」「[link](url)」「`code`」の順に試される
+        link_parser = counts[(GROUP_INLINE_PARSER, 'LinkParser')]
+        assert (link_parser.attempts, link_parser.matches) == (3, 1)
+        # 見出し・引用ともに、記法の除外・Block要素の生成でそれぞれ試される
+        heading_parser = counts[(GROUP_BLOCK_PARSER, 'HeadingParser')]
+        assert (heading_parser.attempts, heading_parser.matches) == (4, 2)
+        # 段落と、引用の内側の段落
+        assert counts[(GROUP_BLOCK_BUILDER, 'ParagraphBuilder')].matches == 2
+        assert sut.format().splitlines()[0].split() == ['group', 'name', 'attempts', 'matches', 'rate',
+                                                        'target[ms]', 'work[ms]']
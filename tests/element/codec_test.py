@@ -0,0 +1,130 @@
+import io
+
+import pytest
+
+from a_pompom_markdown_parser.element.codec import dumps, loads, dump, iter_load, CodecException
+from a_pompom_markdown_parser.element.block import ParseResult, HeadingBlock, ParagraphBlock, QuoteBlock, ListBlock, \
+    ListItemBlock, CodeBlock, PlainBlock, HorizontalRuleBlock
+from a_pompom_markdown_parser.element.inline import PlainInline, LinkInline, CodeInline, ImageInline
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.converter.converter import Converter
+
+PARSE_RESULT = ParseResult(content=[
+    HeadingBlock(size=2, children=[
+        LinkInline(href='https://docs.python.org/3/', text='Python'),
+        PlainInline(text='とは')
+    ]),
+    ParagraphBlock(indent_depth=0, children=[
+        PlainInline(text='記号'),
+        CodeInline(text='!'),
+        ImageInline(src='image.png', alt='画像', text='')
+    ]),
+    QuoteBlock(children=[
+        ParagraphBlock(indent_depth=1, children=[PlainInline(text='引用')])
+    ]),
+    ListBlock(indent_depth=0, children=[
+        ListItemBlock(indent_depth=1, children=[PlainInline(text='item')])
+    ]),
+    CodeBlock(language='Python', children=[
+        PlainBlock(indent_depth=0, children=[PlainInline(text="print('hello')")])
+    ]),
+    HorizontalRuleBlock(children=[PlainInline(text='')]),
+])
+
+
+class TestCodec:
+    """ パース結果をバイナリ形式へ変換し、元の構造へ復元できるか検証 """
+
+    # 往復変換
+    def test_round_trip(self):
+        # GIVEN
+        sut = loads
+        # WHEN
+        actual = sut(dumps(PARSE_RESULT))
+        # THEN
+        assert actual == PARSE_RESULT
+        assert repr(actual) == repr(PARSE_RESULT)
+
+    # マークダウンのパース結果・コンバータの変換結果いずれも往復変換できるか
+    def test_round_trip_parsed_and_converted(self):
+        # GIVEN
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            lines = f.read().splitlines()
+        parsed = MarkdownParser().parse(lines)
+        converted = Converter().convert(MarkdownParser().parse(lines))
+        # WHEN
+        actual_parsed = loads(dumps(parsed))
+        actual_converted = loads(dumps(converted))
+        # THEN
+        assert repr(actual_parsed) == repr(parsed)
+        assert repr(actual_converted) == repr(converted)
+
+    # 複数のレコードにまたがるパース結果を復元できるか
+    def test_round_trip_multiple_records(self):
+        # GIVEN
+        sut = loads
+        parse_result = ParseResult(content=[
+            ParagraphBlock(indent_depth=0, children=[PlainInline(text=f'paragraph {i}')]) for i in range(600)
+        ])
+        # WHEN
+        actual = sut(dumps(parse_result))
+        # THEN
+        assert repr(actual) == repr(parse_result)
+
+    # ストリームから最上位のBlock要素を1つずつ復元できるか
+    def test_iter_load(self):
+        # GIVEN
+        sut = iter_load
+        stream = io.BytesIO()
+        dump(iter(PARSE_RESULT.content), stream)
+        stream.seek(0)
+        # WHEN
+        actual = list(sut(stream))
+        # THEN
+        assert repr(ParseResult(content=actual)) == repr(PARSE_RESULT)
+
+
+class TestCodecInvalid:
+    """ 復元できないバイト列を受け取ると例外を送出するか検証 """
+
+    @pytest.mark.parametrize(
+        ('data', 'expected_message'),
+        [
+            (b'PKL\x00\x01', 'パース結果のバイナリ形式ではありません。'),
+            (b'APMD\x63', 'バージョン: 99の形式には対応していません。'),
+            (b'APM', 'ヘッダが不完全です。'),
+        ],
+        ids=['magic', 'version', 'short header'])
+    def test_invalid_header(self, data: bytes, expected_message: str):
+        # GIVEN
+        sut = loads
+        # WHEN
+        with pytest.raises(CodecException) as e:
+            sut(data)
+        # THEN
+        assert e.value.message == expected_message
+
+    # 途中で途切れたバイト列は、いずれの位置で途切れても例外を送出するか
+    def test_truncated(self):
+        # GIVEN
+        sut = loads
+        data = dumps(PARSE_RESULT)
+        # WHEN
+        messages = set()
+        for end in range(len(b'APMD\x01') + 1, len(data)):
+            with pytest.raises(CodecException) as e:
+                sut(data[:end])
+            messages.add(e.value.message)
+        # THEN
+        assert messages == {'レコードのバイト長が不完全です。', 'レコードが不完全です。'}
+
+    # UTF-8として解釈できない文字列を含むレコードは、例外を送出するか
+    def test_invalid_string(self):
+        # GIVEN
+        sut = loads
+        data = dumps(PARSE_RESULT)
+        # WHEN
+        with pytest.raises(CodecException) as e:
+            sut(data[:-1] + b'\xff')
+        # THEN
+        assert e.value.message == 'レコードの文字列が不正です。'
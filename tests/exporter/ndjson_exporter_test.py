@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+from a_pompom_markdown_parser.exporter.ndjson_exporter import NdjsonExporter, to_record
+from a_pompom_markdown_parser.element.block import HeadingBlock, ParagraphBlock, ListBlock, ListItemBlock
+from a_pompom_markdown_parser.element.inline import PlainInline, LinkInline, ImageInline
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.converter.converter import Converter
+
+
+class TestToRecord:
+    """ Block/Inline要素を種別・属性・子要素からなる辞書へ変換できるか検証 """
+
+    @pytest.mark.parametrize(
+        ('element', 'expected'),
+        [
+            (
+                HeadingBlock(size=2, children=[PlainInline(text='概要')]),
+                {'kind': 'heading', 'size': 2, 'children': [{'kind': 'text', 'text': '概要'}]}
+            ),
+            (
+                ParagraphBlock(indent_depth=0, children=[
+                    LinkInline(text='公式', href='https://docs.python.org/3/'),
+                    ImageInline(text='', src='image.png', alt='画像'),
+                ]),
+                {'kind': 'paragraph', 'indent_depth': 0, 'children': [
+                    {'kind': 'link', 'text': '公式', 'href': 'https://docs.python.org/3/'},
+                    {'kind': 'image', 'text': '', 'src': 'image.png', 'alt': '画像'},
+                ]}
+            ),
+            (
+                ListBlock(indent_depth=0, children=[
+                    ListItemBlock(indent_depth=1, children=[PlainInline(text='item')])
+                ]),
+                {'kind': 'list', 'indent_depth': 0, 'children': [
+                    {'kind': 'list_item', 'indent_depth': 1, 'children': [{'kind': 'text', 'text': 'item'}]}
+                ]}
+            ),
+        ],
+        ids=['heading', 'inline attributes', 'nested block'])
+    def test_to_record(self, element, expected: dict):
+        # GIVEN
+        sut = to_record
+        # WHEN
+        actual = sut(element)
+        # THEN
+        assert actual == expected
+
+
+class TestNdjsonExporter:
+    """ 変換結果を最上位のBlock要素ごとに1行のJSONとして書き出せるか検証 """
+
+    # 1行ごとにBlock要素が書き出されるか
+    def test_export(self):
+        # GIVEN
+        sut = NdjsonExporter()
+        lines = ['# 概要', '* first', '* second', 'plain text']
+        stream = io.StringIO()
+        # WHEN
+        sut.export(Converter().convert_iter(MarkdownParser().parse_iter(lines)), stream)
+        actual = [json.loads(line) for line in stream.getvalue().splitlines()]
+        # THEN
+        assert [(record['index'], record['kind']) for record in actual] == [
+            (0, 'heading'), (1, 'list'), (2, 'paragraph')
+        ]
+        assert len(actual[1]['children']) == 2
+
+    # 目次は子を持たない行として出力した後、末尾で実体を出力し直すか
+    def test_export_toc(self):
+        # GIVEN
+        sut = NdjsonExporter()
+        lines = ['[toc]', '## 概要']
+        stream = io.StringIO()
+        # WHEN
+        sut.export(Converter().convert_iter(MarkdownParser().parse_iter(lines)), stream)
+        actual = [json.loads(line) for line in stream.getvalue().splitlines()]
+        # THEN
+        assert actual[0] == {'index': 0, 'kind': 'table_of_contents', 'children': []}
+        assert actual[1]['kind'] == 'heading'
+        assert actual[2]['index'] == 0
+        assert actual[2]['children'][0]['kind'] == 'list'
@@ -0,0 +1,250 @@
+import http.client
+import os
+import threading
+
+import pytest
+
+from a_pompom_markdown_parser.http_server import RenderHTTPServer, RenderHTTPRequestHandler, RenderCache, compute_etag, \
+    match_etag
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.settings import default_profile
+
+
+class SpyRenderer(Renderer):
+    """ 変換した回数を記録するRenderer 「fail」のみの文書は、想定外の例外を送出する """
+
+    def __init__(self):
+        super().__init__()
+        self.render_count = 0
+
+    def render(self, markdown_content: str, profile=None) -> str:
+        self.render_count += 1
+        if markdown_content == 'fail':
+            raise RecursionError()
+        return super().render(markdown_content, profile)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    HTTPサーバを別スレッドで起動するfixture
+
+    :return: 起動したサーバ
+    """
+
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'article.md').write_text('# 概要\n* リスト')
+    (tmp_path / 'secret.md').write_text('# 秘密')
+
+    render_server = RenderHTTPServer(('127.0.0.1', 0), document_root=str(tmp_path / 'docs'),
+                                     renderer=SpyRenderer(), max_request_size=1024)
+    thread = threading.Thread(target=render_server.serve_forever)
+    thread.start()
+
+    yield render_server
+
+    render_server.shutdown()
+    thread.join()
+    render_server.server_close()
+
+
+def request(server: RenderHTTPServer, method: str, path: str, body: str = None,
+            headers: dict = None) -> http.client.HTTPResponse:
+    """
+    HTTPサーバへ要求を送信し、応答を受け取る
+    """
+
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.request(method, path, body=body.encode('utf-8') if body is not None else None, headers=headers or {})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response
+
+
+class TestRenderHTTPServer:
+    """ HTTPでマークダウン→HTMLへ変換できるか検証 """
+
+    def test_post(self, server: RenderHTTPServer):
+        # GIVEN
+        markdown_content = '# 概要\n> 引用'
+        # WHEN
+        connection = http.client.HTTPConnection(*server.server_address)
+        connection.request('POST', '/render', body=markdown_content.encode('utf-8'))
+        response = connection.getresponse()
+        actual = response.read().decode('utf-8')
+        connection.close()
+        # THEN
+        assert response.status == 200
+        assert actual == Renderer().render(markdown_content)
+        assert response.getheader('ETag') == compute_etag(markdown_content.encode('utf-8'), default_profile())
+
+    # 同じETagを送信した場合、変換せずに304を応答するか
+    def test_not_modified(self, server: RenderHTTPServer):
+        # GIVEN
+        etag = request(server, 'POST', '/render', '# 概要').getheader('ETag')
+        # WHEN
+        actual = request(server, 'POST', '/render', '# 概要', {'If-None-Match': f'W/"other", {etag}'})
+        # THEN
+        assert actual.status == 304
+        assert actual.getheader('ETag') == etag
+        assert server.renderer.render_count == 1
+
+    # 同じマークダウンは、保持しておいた変換結果を応答するか
+    def test_cache(self, server: RenderHTTPServer):
+        # GIVEN
+        request(server, 'POST', '/render', '# 概要')
+        # WHEN
+        actual = request(server, 'POST', '/render', '# 概要')
+        # THEN
+        assert actual.status == 200
+        assert server.renderer.render_count == 1
+
+    # パスで指定した、文書ルート配下のファイルを変換できるか
+    def test_get(self, server: RenderHTTPServer):
+        # GIVEN
+        sut = request
+        # WHEN
+        actual = sut(server, 'GET', '/article.md')
+        # THEN
+        assert actual.status == 200
+        assert actual.getheader('ETag') == compute_etag('# 概要\n* リスト'.encode('utf-8'), default_profile())
+
+    # 文書ルートの外側のファイルは読み出せないか
+    @pytest.mark.parametrize('path', ['/../secret.md', '/%2E%2E/secret.md', '/missing.md'])
+    def test_get_not_found(self, server: RenderHTTPServer, path: str):
+        # GIVEN
+        sut = request
+        # WHEN
+        actual = sut(server, 'GET', path)
+        # THEN
+        assert actual.status == 404
+
+    # 探索した後に読み込めなくなったファイルは、応答を返さずに接続を閉じるのではなく、エラーとして応答するか
+    @pytest.mark.parametrize(('file_name', 'expected'), [('removed.md', 404), ('', 500)], ids=['removed', 'unreadable'])
+    def test_get_unreadable(self, server: RenderHTTPServer, monkeypatch, file_name: str, expected: int):
+        # GIVEN
+        sut = request
+        # 空のファイル名は文書ルートそのもの(ディレクトリ)を指すので、読み込めない
+        monkeypatch.setattr(RenderHTTPRequestHandler, '_resolve_file_path',
+                            lambda handler: os.path.join(server.document_root, file_name))
+        # WHEN
+        actual = sut(server, 'GET', '/article.md')
+        # THEN
+        assert actual.status == expected
+        # 以降の要求も受け付け続ける
+        assert sut(server, 'GET', '/article.md').status == expected
+
+    def test_request_too_large(self, server: RenderHTTPServer):
+        # GIVEN
+        sut = request
+        # WHEN
+        actual = sut(server, 'POST', '/render', 'a' * 2048)
+        # THEN
+        assert actual.status == 413
+
+    # 負のContent-Lengthは、本文を読み込まずにエラーとして応答するか
+    def test_negative_content_length(self, server: RenderHTTPServer):
+        # GIVEN
+        sut = request
+        # WHEN
+        actual = sut(server, 'POST', '/render', headers={'Content-Length': '-1'})
+        # THEN
+        assert actual.status == 400
+
+    # 変換処理が想定外の例外を送出した場合、500を応答し、以降の要求も受け付けるか
+    def test_unexpected_error(self, server: RenderHTTPServer):
+        # GIVEN
+        sut = request
+        # WHEN
+        actual = sut(server, 'POST', '/render', 'fail')
+        # THEN
+        assert actual.status == 500
+        assert sut(server, 'POST', '/render', '# 概要').status == 200
+        assert 'markdown_render_errors_total{reason="internal"} 1' in server.metrics.registry.expose()
+
+    # 変換時間・キャッシュの参照結果・失敗の件数を、/metricsで公開するか
+    def test_metrics(self, server: RenderHTTPServer):
+        # GIVEN
+        request(server, 'POST', '/render', '# 概要')
+        request(server, 'POST', '/render', '# 概要')
+        request(server, 'GET', '/missing.md')
+        # WHEN
+        connection = http.client.HTTPConnection(*server.server_address)
+        connection.request('GET', '/metrics')
+        response = connection.getresponse()
+        actual = response.read().decode('utf-8')
+        connection.close()
+        # THEN
+        assert response.status == 200
+        assert response.getheader('Content-Type') == 'text/plain; version=0.0.4; charset=utf-8'
+        assert 'markdown_render_duration_seconds_count{size_le="1024"} 1' in actual
+        assert 'markdown_render_cache_requests_total{result="hit"} 1' in actual
+        assert 'markdown_render_cache_requests_total{result="miss"} 1' in actual
+        assert 'markdown_render_errors_total{reason="not_found"} 1' in actual
+        assert f'markdown_render_cache_bytes {server.cache.size}' in actual
+        # 応答を送り終えた要求・メトリクスの収集は、待ち行列へ数えない
+        assert 'markdown_render_queue_depth 0' in actual
+
+
+class TestEtag:
+    """ 変換結果を識別するETagを扱えるか検証 """
+
+    # 設定値が異なれば、異なるETagとなるか
+    def test_compute_etag(self):
+        # GIVEN
+        sut = compute_etag
+        profile = default_profile()
+        # WHEN
+        actual = [sut(b'# a', profile), sut(b'# a', profile.replace(indent='\t')), sut(b'# b', profile)]
+        # THEN
+        assert actual[0].startswith('"') and actual[0].endswith('"')
+        assert len(set(actual)) == 3
+
+    @pytest.mark.parametrize(
+        ('if_none_match', 'expected'),
+        [
+            ('"abc"', True),
+            ('W/"abc"', True),
+            ('"x", "abc"', True),
+            ('*', True),
+            ('"abcd"', False),
+            ('', False),
+        ]
+    )
+    def test_match_etag(self, if_none_match: str, expected: bool):
+        # GIVEN
+        sut = match_etag
+        # WHEN
+        actual = sut(if_none_match, '"abc"')
+        # THEN
+        assert actual == expected
+
+
+class TestRenderCache:
+    """ 保持するバイト数の上限を超えないよう、変換結果を保持できるか検証 """
+
+    # 上限を超えた場合、最も長く参照されていないものから破棄するか
+    def test_evict(self):
+        # GIVEN
+        sut = RenderCache(max_bytes=10)
+        sut.put('a', b'aaaa')
+        sut.put('b', b'bbbb')
+        sut.get('a')
+        # WHEN
+        sut.put('c', b'cccc')
+        # THEN
+        assert sut.get('a') == b'aaaa'
+        assert sut.get('b') is None
+        assert sut.get('c') == b'cccc'
+        assert sut.size == 8
+
+    # 上限より大きいものは保持しないか
+    def test_too_large(self):
+        # GIVEN
+        sut = RenderCache(max_bytes=10)
+        # WHEN
+        sut.put('a', b'a' * 11)
+        # THEN
+        assert sut.get('a') is None
+        assert sut.size == 0
@@ -0,0 +1,53 @@
+import pytest
+
+from a_pompom_markdown_parser.limits import Limits, LimitExceededException, LIMIT_BYTES, LIMIT_LINES
+
+
+class TestLimits:
+    """ 入力の大きさが上限を超えたか判定できるか検証 """
+
+    # バイト数はUTF-8で表したときの大きさで判定するか
+    @pytest.mark.parametrize(
+        ('markdown_content', 'is_exceeded'),
+        [
+            ('a' * 8, False),
+            ('a' * 9, True),
+            ('あ' * 2, False),
+            ('あ' * 3, True),
+        ],
+        ids=['ascii within', 'ascii exceeded', 'multibyte within', 'multibyte exceeded']
+    )
+    def test_check_bytes(self, markdown_content: str, is_exceeded: bool):
+        # GIVEN
+        sut = Limits(max_bytes=8)
+        # WHEN
+        if not is_exceeded:
+            sut.check_bytes(markdown_content)
+            return
+        with pytest.raises(LimitExceededException) as e:
+            sut.check_bytes(markdown_content)
+        # THEN
+        assert e.value.limit == LIMIT_BYTES
+        assert e.value.message == '入力が大きすぎます。上限: 8バイト'
+
+    def test_check_lines(self):
+        # GIVEN
+        sut = Limits(max_lines=2)
+        sut.check_lines(2)
+        # WHEN
+        with pytest.raises(LimitExceededException) as e:
+            sut.check_lines(3)
+        # THEN
+        assert e.value.limit == LIMIT_LINES
+        assert e.value.message == '入力の行数が多すぎます。上限: 2行'
+
+    # 上限を省略した場合は判定しないか
+    def test_no_limits(self):
+        # GIVEN
+        sut = Limits()
+        # WHEN
+        sut.check_bytes('a' * 1024)
+        sut.check_lines(1024)
+        actual = sut.exceeds_line_length('a' * 1024)
+        # THEN
+        assert actual is False
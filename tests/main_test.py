@@ -1,8 +1,11 @@
 import sys
 import pytest
 from a_pompom_markdown_parser.main import parse_md_to_html, parse_md_to_html_by_string, validate_args, \
-    InvalidArgumentException
+    InvalidArgumentException, extract_options, validate_options, parse_md_to_html_chunks, validate_batch_args, \
+    build_limits, execute
+from a_pompom_markdown_parser.limits import SERVICE_LIMITS
 from a_pompom_markdown_parser.settings import setting
+from a_pompom_markdown_parser import main
 
 from tests.util_equality import assert_that_text_file_content_is_same
 
@@ -80,6 +83,151 @@ class TestValidateInvalid:
         assert e.value.args[0] == expected_message
 
 
+class TestOptions:
+    """ コマンドライン引数からオプションを取り出し、検証できるか """
+
+    # オプションと、それ以外の引数を分けられるか
+    def test_extract_options(self):
+        # GIVEN
+        sut = extract_options
+        args = ['main.py', '--format', 'ndjson', 'in.md', 'out.ndjson']
+        # WHEN
+        actual_args, actual_options = sut(args)
+        # THEN
+        assert actual_args == ['main.py', 'in.md', 'out.ndjson']
+        assert actual_options == {'--format': 'ndjson'}
+
+    # 値の無いオプション
+    def test_extract_options_without_value(self):
+        # GIVEN
+        sut = extract_options
+        args = ['main.py', 'in.md', 'out.html', '--format']
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut(args)
+        # THEN
+        assert e.value.args[0] == 'オプション: "--format"の値を指定してください。'
+
+    # 値を取らないオプション
+    def test_extract_flag_options(self):
+        # GIVEN
+        sut = extract_options
+        args = ['main.py', 'in.md', '--stats', 'out.html']
+        # WHEN
+        actual_args, actual_options = sut(args)
+        # THEN
+        assert actual_args == ['main.py', 'in.md', 'out.html']
+        assert actual_options == {'--stats': ''}
+
+    # 計測結果はHTML形式でのみ出力できるか
+    def test_stats_with_ndjson(self):
+        # GIVEN
+        sut = validate_options
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut({'--format': 'ndjson', '--stats': ''})
+        # THEN
+        assert e.value.args[0] == '--statsは出力形式: "html"でのみ指定できます。'
+
+    # 計測結果と区間は同時に記録できないか
+    def test_stats_with_trace(self):
+        # GIVEN
+        sut = validate_options
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut({'--stats': '', '--trace': 'trace.json'})
+        # THEN
+        assert e.value.args[0] == '--statsと--traceは同時に指定できません。'
+
+    # 未対応の出力形式
+    def test_invalid_format(self):
+        # GIVEN
+        sut = validate_options
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut({'--format': 'xml'})
+        # THEN
+        assert e.value.args[0] == '出力形式: "xml"は無効です。html, ndjsonのいずれかを指定してください。'
+
+    # 常駐プロセス・HTTPサーバの入力の上限を、指定した項目のみ既定の上限から変更できるか
+    def test_build_limits(self):
+        # GIVEN
+        sut = build_limits
+        # WHEN
+        actual = sut({'--max-lines': '10', '--max-inline-elements': '0', '--max-toc-depth': '2'})
+        # THEN
+        assert actual.max_bytes == SERVICE_LIMITS.max_bytes
+        assert actual.max_line_length == SERVICE_LIMITS.max_line_length
+        assert actual.max_lines == 10
+        assert actual.max_inline_elements is None
+        assert actual.max_toc_depth == 2
+        assert sut({}) == SERVICE_LIMITS
+
+    # 入力の上限が数値でない場合
+    def test_invalid_limit(self):
+        # GIVEN
+        sut = build_limits
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut({'--max-bytes': '-1'})
+        # THEN
+        assert e.value.args[0] == '--max-bytes: "-1"は無効です。'
+
+
+class TestValidateBatchArgs:
+    """ 一括変換のコマンドライン引数を検証できるか """
+
+    # 同名の入力ファイルは、出力ファイルが重複するので変換せずにエラーとするか
+    def test_duplicate_name(self, tmp_path, overwrite_sys_argv, capsys):
+        # GIVEN
+        sut = execute
+        (tmp_path / 'a').mkdir()
+        (tmp_path / 'b').mkdir()
+        (tmp_path / 'a' / 'article.md').write_text('# a')
+        (tmp_path / 'b' / 'article.md').write_text('# b')
+        in_file_paths = [str(tmp_path / 'a' / 'article.md'), str(tmp_path / 'b' / 'article.md')]
+        overwrite_sys_argv(['main.py', '--batch', str(tmp_path), '--backend', 'thread', *in_file_paths])
+        # WHEN
+        with pytest.raises(SystemExit) as e:
+            sut()
+        # THEN
+        assert e.value.code == 1
+        assert capsys.readouterr().out.strip() == \
+               f'入力ファイル: "{in_file_paths[0]}", "{in_file_paths[1]}"の出力先: ' \
+               f'"{tmp_path / "article.html"}"が重複しています。'
+        assert not (tmp_path / 'article.html').exists()
+
+    def test_invalid_jobs(self, tmp_path):
+        # GIVEN
+        sut = validate_batch_args
+        (tmp_path / 'article.md').write_text('# a')
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut([str(tmp_path / 'article.md')], {'--batch': str(tmp_path), '--jobs': '0'})
+        # THEN
+        assert e.value.message == 'ワーカー数: "0"は無効です。'
+
+    # ワーカー数を省略した場合は受け付けるか
+    def test_jobs_omitted(self, tmp_path):
+        # GIVEN
+        sut = validate_batch_args
+        (tmp_path / 'article.md').write_text('# a')
+        # WHEN
+        actual = sut([str(tmp_path / 'article.md')], {'--batch': str(tmp_path)})
+        # THEN
+        assert actual is None
+
+    def test_invalid_max_rss(self, tmp_path):
+        # GIVEN
+        sut = validate_batch_args
+        (tmp_path / 'article.md').write_text('# a')
+        # WHEN
+        with pytest.raises(InvalidArgumentException) as e:
+            sut([str(tmp_path / 'article.md')], {'--batch': str(tmp_path), '--max-rss': '1.5'})
+        # THEN
+        assert e.value.message == '--max-rss: "1.5"は無効です。'
+
+
 class TestParse:
 
     def test_plain(self):
@@ -157,3 +305,51 @@ class TestParseByString:
             with open(expected_path, 'r') as f_expected:
                 # THEN
                 assert actual == f_expected.read()
+
+
+class TestDefaultRenderer:
+    """ 共有するパイプラインが、settings.settingの現在の値で変換するか検証 """
+
+    # 読み込んだ後に書き換えた設定値で変換し、元に戻すと元の設定値で変換するか
+    def test_setting_changed(self, monkeypatch):
+        # GIVEN
+        sut = parse_md_to_html_by_string
+        before = sut('段落')
+        renderer = main.get_default_renderer()
+        # WHEN
+        monkeypatch.setitem(setting['class_name'], 'p', 'changed')
+        actual = sut('段落')
+        monkeypatch.undo()
+        # THEN
+        assert actual == before.replace(f'class="{setting["class_name"]["p"]}"', 'class="changed"')
+        assert actual != before
+        assert sut('段落') == before
+        assert main.get_default_renderer() is not renderer
+
+
+class TestParseToChunks:
+    """ マークダウン文字列をHTML文字列の断片へ少しずつ変換できるか検証 """
+
+    # 断片を連結したものが、まとめて変換したものと一致するか
+    @pytest.mark.parametrize('flush_size', [0, 100, 1000000])
+    def test_parse_to_chunks(self, flush_size: int):
+        # GIVEN
+        sut = parse_md_to_html_chunks
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+        # WHEN
+        actual = ''.join(sut(markdown_content, flush_size))
+        # THEN
+        assert actual == parse_md_to_html_by_string(markdown_content)
+
+    # ヘッダより前にある目次を、後続のヘッダを変換する前に出力できるか
+    def test_table_of_contents_before_headings(self):
+        # GIVEN
+        sut = parse_md_to_html_chunks
+        markdown_content = '\n'.join(['[toc]', '# 概要', '## 詳細'])
+        # WHEN
+        actual = list(sut(markdown_content, 0))
+        # THEN
+        assert len(actual) == 3
+        assert '概要' in actual[0] and '詳細' in actual[0]
+        assert ''.join(actual) == parse_md_to_html_by_string(markdown_content)
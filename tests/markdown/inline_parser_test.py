@@ -1,7 +1,10 @@
+import pickle
+
 import pytest
 
 from a_pompom_markdown_parser.element.inline import Inline, PlainInline, LinkInline, CodeInline, ImageInline
-from a_pompom_markdown_parser.markdown.inline_parser import InlineParser, LinkParser, CodeParser, ImageParser
+from a_pompom_markdown_parser.markdown.inline_parser import InlineParser, LinkParser, CodeParser, ImageParser, \
+    LazyInlineChildren
 
 
 class TestInlineParser:
@@ -30,6 +33,37 @@ class TestInlineParser:
         for actual, expected in zip(actual_list, expected_list):
             assert actual == expected
 
+    # Inline要素の数が上限を超えた時点で分割を打ち切り、行全体をテキストとして扱うか
+    def test_parse_limited(self):
+        # GIVEN
+        sut = InlineParser()
+        parsed = []
+        code_parser = sut.parsers[1]
+        original_parse = code_parser.parse
+        code_parser.parse = lambda inline_text: parsed.append(inline_text) or original_parse(inline_text)
+        text = '`a` `b` `c` `d` `e` `f`'
+        # WHEN
+        actual = sut.parse_limited(text, max_elements=2)
+        # THEN
+        assert actual == [PlainInline(text=text)]
+        # 末尾から抜き出した「`f`」「`e`」「`d`」が追加待ちのまま上限を超えるので、いずれの記法も解釈しない
+        assert parsed == []
+        assert sut.parse_limited(text, max_elements=11) == sut.parse(text)
+
+    # Inline要素を多く含む行でも、呼び出しの深さが増えずに分割できるか
+    @pytest.mark.parametrize('inline_text', ['[a](b)', '`a`'], ids=['link', 'code'])
+    def test_parse_many_elements(self, inline_text: str):
+        # GIVEN
+        sut = InlineParser()
+        text = inline_text * 1500
+        # WHEN
+        limited = sut.parse_limited(text, max_elements=10)
+        actual = sut.parse(text)
+        # THEN
+        assert limited == [PlainInline(text=text)]
+        assert len(actual) == 1500
+        assert actual[0] == sut.parse(inline_text)[0]
+
 
 class TestLink:
     """ []()で表現されるリンク要素を検証 """
@@ -222,3 +256,35 @@ class TestImage:
         actual = sut.parse(text)
         # THEN
         assert actual == expected
+
+
+class TestLazyInlineChildren:
+    """ 子要素が参照されたときに初めてInline要素を解釈するか検証 """
+
+    # 参照されるまで解釈しないか
+    def test_not_parsed_until_accessed(self):
+        # GIVEN
+        parser = InlineParser()
+        calls = []
+        parse = parser.parse
+        parser.parse = lambda text: calls.append(text) or parse(text)
+        # WHEN
+        sut = LazyInlineChildren(parser, '[公式](https://docs.python.org/3/)を参照')
+        # THEN
+        assert calls == []
+        assert list(sut) == [LinkInline(href='https://docs.python.org/3/', text='公式'), PlainInline(text='を参照')]
+        assert len(sut) == 2
+        assert calls[0] == '[公式](https://docs.python.org/3/)を参照'
+
+    # listとして比較・複製できるか
+    def test_behaves_as_list(self):
+        # GIVEN
+        sut = LazyInlineChildren(InlineParser(), '記号`!`は否定')
+        expected = [PlainInline(text='記号'), CodeInline(text='!'), PlainInline(text='は否定')]
+        # WHEN
+        copied = pickle.loads(pickle.dumps(sut))
+        # THEN
+        assert sut == expected
+        assert [*sut] == expected
+        assert type(copied) is list
+        assert copied == expected
@@ -0,0 +1,56 @@
+import pytest
+
+from a_pompom_markdown_parser.markdown.line_classifier import classify_line, classify_lines_python, \
+    classify_lines_numpy, KIND_PLAIN, KIND_BLOCK_CANDIDATE, KIND_CODE_FENCE_CANDIDATE, FLAG_INLINE_CANDIDATE
+
+
+class TestClassifyLine:
+    """ 行の先頭・含まれる文字から種別コードを判定できるか検証 """
+
+    # 種別コード
+    @pytest.mark.parametrize(
+        ('line', 'expected'),
+        [
+            ('plain text', KIND_PLAIN),
+            ('', KIND_PLAIN),
+            ('## heading', KIND_BLOCK_CANDIDATE),
+            ('> quote', KIND_BLOCK_CANDIDATE),
+            ('* list', KIND_BLOCK_CANDIDATE),
+            ('---', KIND_BLOCK_CANDIDATE),
+            ('```Python', KIND_CODE_FENCE_CANDIDATE | FLAG_INLINE_CANDIDATE),
+            ('[toc]', KIND_BLOCK_CANDIDATE | FLAG_INLINE_CANDIDATE),
+            ('[公式](https://docs.python.org/3/)を参照', KIND_BLOCK_CANDIDATE | FLAG_INLINE_CANDIDATE),
+            ('記号`!`は否定を表現します。', KIND_PLAIN | FLAG_INLINE_CANDIDATE),
+        ],
+        ids=['plain', 'empty', 'heading', 'quote', 'list', 'horizontal rule', 'code block', 'toc', 'link',
+             'inline code'])
+    def test_classify_line(self, line: str, expected: int):
+        # GIVEN
+        sut = classify_line
+        # WHEN
+        actual = sut(line)
+        # THEN
+        assert actual == expected
+
+
+class TestClassifyLinesNumpy:
+    """ ベクトル化した判定結果が純Pythonによる判定結果と一致するか検証 """
+
+    # 判定結果の一致
+    @pytest.mark.parametrize(
+        'lines',
+        [
+            ['# 概要', '', 'これは`code`です', '```Python', "print('hello')", '```', '* [link](url)', ''],
+            ['', '', '> 引用'],
+            ['![image](src)', '---', '[toc]'],
+        ],
+        ids=['mixed', 'leading empty lines', 'notation only'])
+    def test_classify_lines_numpy(self, lines: list[str]):
+        pytest.importorskip('numpy')
+        # GIVEN
+        sut = classify_lines_numpy
+        expected = classify_lines_python(lines)
+        # WHEN
+        actual = sut(lines)
+        # THEN
+        assert actual == expected
@@ -3,6 +3,7 @@ import pytest
 from a_pompom_markdown_parser.element.block import ParseResult, ParagraphBlock, HeadingBlock, QuoteBlock, ListBlock, \
     HorizontalRuleBlock, PlainBlock, CodeBlock, CodeChildBlock
 from a_pompom_markdown_parser.element.inline import PlainInline, LinkInline, CodeInline, ImageInline
+from a_pompom_markdown_parser.limits import Limits, LimitExceededException
 from a_pompom_markdown_parser.markdown.parser import MarkdownParser
 
 
@@ -201,3 +202,55 @@ class TestMarkdownParser:
         actual = sut.parse(lines)
         # THEN
         assert actual == expected
+
+    # 遅延評価を有効にしても同じパース結果が得られるか
+    def test_parse_lazy_inline(self):
+        # GIVEN
+        sut = MarkdownParser(lazy_inline=True)
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            lines = f.read().splitlines()
+        expected = MarkdownParser().parse(lines)
+        # WHEN
+        actual = sut.parse(lines)
+        # THEN
+        assert repr(actual) == repr(expected)
+
+    # コードブロック内部を除き、ヘッダのみを解釈できるか
+    def test_parse_headings(self):
+        # GIVEN
+        sut = MarkdownParser()
+        lines = ['# 概要', '#ヘッダでない', '```Python', '# コメント', '```', '> # 引用', '## 詳細']
+        expected = [
+            HeadingBlock(size=1, children=[PlainInline(text='概要')]),
+            HeadingBlock(size=2, children=[PlainInline(text='詳細')]),
+        ]
+        # WHEN
+        actual = sut.parse_headings(lines)
+        # THEN
+        assert repr(actual) == repr(expected)
+
+    # 上限を超えた行のみ、Inline要素を解釈せずテキストのまま扱うか
+    @pytest.mark.parametrize('lazy_inline', [False, True], ids=['eager', 'lazy'])
+    def test_parse_line_limits(self, lazy_inline: bool):
+        # GIVEN
+        sut = MarkdownParser(lazy_inline=lazy_inline, limits=Limits(max_line_length=20, max_inline_elements=2))
+        lines = ['# [長い見出し](https://example.com/long)', '`a` and `b`', '`a` b']
+        expected = ParseResult(content=[
+            HeadingBlock(size=1, children=[PlainInline(text='[長い見出し](https://example.com/long)')]),
+            ParagraphBlock(children=[PlainInline(text='`a` and `b`')]),
+            ParagraphBlock(children=[CodeInline(text='a'), PlainInline(text=' b')]),
+        ])
+        # WHEN
+        actual = sut.parse(lines)
+        # THEN
+        assert repr(actual) == repr(expected)
+
+    # 行数が上限を超えた場合は解釈しないか
+    def test_parse_too_many_lines(self):
+        # GIVEN
+        sut = MarkdownParser(limits=Limits(max_lines=2))
+        # WHEN
+        with pytest.raises(LimitExceededException):
+            sut.parse(['# 概要', '段落', '段落'])
+        # THEN
+        assert sut.parse(['# 概要', '段落']) == MarkdownParser().parse(['# 概要', '段落'])
@@ -0,0 +1,69 @@
+import pytest
+
+from a_pompom_markdown_parser.markdown.parallel_parser import ParallelMarkdownParser, find_code_block_ranges, \
+    split_at_safe_boundaries
+from a_pompom_markdown_parser.markdown.parser import MarkdownParser
+from a_pompom_markdown_parser.markdown.line_classifier import classify_lines
+
+
+class TestFindCodeBlockRanges:
+    """ コードブロックの行範囲を抽出できるか検証 """
+
+    @pytest.mark.parametrize(
+        ('lines', 'expected'),
+        [
+            (['text', '```Python', "print('hello')", '```', 'text'], [(1, 3)]),
+            (['```', '```', '```JavaScript', 'const i = 0;'], [(0, 1), (2, 3)]),
+            (['`inline`', 'text'], []),
+        ],
+        ids=['closed', 'not closed', 'no code block'])
+    def test_find_code_block_ranges(self, lines: list[str], expected: list[tuple[int, int]]):
+        # GIVEN
+        sut = find_code_block_ranges
+        # WHEN
+        actual = sut(lines, classify_lines(lines))
+        # THEN
+        assert actual == expected
+
+
+class TestSplitAtSafeBoundaries:
+    """ コードブロックの内部を避けて入力を分割できるか検証 """
+
+    # 分割位置がコードブロックの内部であれば、コードブロックの直後へずらすか
+    def test_split_outside_code_block(self):
+        # GIVEN
+        sut = split_at_safe_boundaries
+        lines = ['text', '```', 'code', 'code', 'code', '```', 'text', 'text']
+        # WHEN
+        actual = sut(lines, 2)
+        # THEN
+        assert actual == [(0, 5), (6, 7)]
+
+    # 分割した範囲が入力全体を過不足なく覆うか
+    def test_cover_all_lines(self):
+        # GIVEN
+        sut = split_at_safe_boundaries
+        lines = ['# heading', '* list', '```', 'code', '```', '> quote'] * 10
+        # WHEN
+        actual = sut(lines, 7)
+        # THEN
+        assert actual[0][0] == 0
+        assert actual[-1][1] == len(lines) - 1
+        assert all(former[1] + 1 == latter[0] for former, latter in zip(actual, actual[1:]))
+
+
+class TestParallelMarkdownParser:
+    """ 分割してパースした結果が、まとめてパースした結果と一致するか検証 """
+
+    # 共有メモリ・pickleのいずれで受け渡しても、まとめてパースした結果と一致するか
+    @pytest.mark.parametrize('use_shared_memory', [True, False])
+    def test_parse(self, use_shared_memory: bool):
+        # GIVEN
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            lines = f.read().splitlines() * 5
+        expected = MarkdownParser().parse(lines)
+        # WHEN
+        with ParallelMarkdownParser(workers=2, min_chunk_lines=50, use_shared_memory=use_shared_memory) as sut:
+            actual = sut.parse(lines)
+        # THEN
+        assert repr(actual) == repr(expected)
@@ -0,0 +1,165 @@
+import os
+import stat
+import urllib.error
+import urllib.request
+
+import pytest
+
+from a_pompom_markdown_parser.metrics import MetricsRegistry, RenderMetrics, size_class, start_metrics_server, \
+    CONTENT_TYPE
+
+
+class TestMetricsRegistry:
+    """ メトリクスをPrometheusのテキスト形式で出力できるか検証 """
+
+    # カウンタ・ゲージを、ラベルの値の組ごとに出力できるか
+    def test_counter_and_gauge(self):
+        # GIVEN
+        sut = MetricsRegistry()
+        counter = sut.counter('requests_total', 'Requests.', ['result'])
+        gauge = sut.gauge('queue_depth', 'Queue depth.')
+        # WHEN
+        counter.inc(result='hit')
+        counter.inc(2, result='miss')
+        counter.inc(result='hit')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        # THEN
+        assert sut.expose() == '\n'.join([
+            '# HELP requests_total Requests.',
+            '# TYPE requests_total counter',
+            'requests_total{result="hit"} 2',
+            'requests_total{result="miss"} 2',
+            '# HELP queue_depth Queue depth.',
+            '# TYPE queue_depth gauge',
+            'queue_depth 1',
+        ]) + '\n'
+
+    # ヒストグラムを、区間ごとの累積の件数・合計・件数で出力できるか
+    def test_histogram(self):
+        # GIVEN
+        sut = MetricsRegistry()
+        histogram = sut.histogram('duration_seconds', 'Duration.', buckets=[0.1, 1.0])
+        # WHEN
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            histogram.observe(value)
+        # THEN
+        assert sut.expose().splitlines()[2:] == [
+            'duration_seconds_bucket{le="0.1"} 2',
+            'duration_seconds_bucket{le="1.0"} 3',
+            'duration_seconds_bucket{le="+Inf"} 4',
+            'duration_seconds_sum 2.65',
+            'duration_seconds_count 4',
+        ]
+
+    # ラベルの値・説明に含まれる特殊な文字をエスケープするか
+    def test_escape(self):
+        # GIVEN
+        sut = MetricsRegistry()
+        counter = sut.counter('errors_total', 'Line1\nLine2', ['path'])
+        # WHEN
+        counter.inc(path='a"b\\c\n')
+        # THEN
+        assert sut.expose().splitlines() == [
+            '# HELP errors_total Line1\\nLine2',
+            '# TYPE errors_total counter',
+            'errors_total{path="a\\"b\\\\c\\n"} 1',
+        ]
+
+    # 読み込む側が書きかけのファイルを参照しないよう、置き換えて書き出すか
+    def test_write(self, tmp_path):
+        # GIVEN
+        sut = MetricsRegistry()
+        sut.counter('documents_total', 'Documents.').inc(3)
+        file_path = tmp_path / 'metrics.prom'
+        # WHEN
+        sut.write(str(file_path))
+        # THEN
+        assert file_path.read_text().splitlines()[-1] == 'documents_total 3'
+        assert os.listdir(tmp_path) == ['metrics.prom']
+
+    # 書き出したファイルを、別のユーザからも読み込めるようumaskに従うパーミッションとするか
+    def test_write_permission(self, tmp_path):
+        # GIVEN
+        sut = MetricsRegistry()
+        file_path = tmp_path / 'metrics.prom'
+        # WHEN
+        previous_umask = os.umask(0o022)
+        try:
+            sut.write(str(file_path))
+        finally:
+            os.umask(previous_umask)
+        # THEN
+        assert stat.S_IMODE(os.stat(file_path).st_mode) == 0o644
+
+
+class TestRenderMetrics:
+    """ 変換処理を提供するサービスのメトリクスを記録できるか検証 """
+
+    @pytest.mark.parametrize(('size', 'expected'), [
+        (0, '1024'),
+        (1024, '1024'),
+        (1025, '16384'),
+        (4 * 1024 * 1024 + 1, '+Inf'),
+    ])
+    def test_size_class(self, size: int, expected: str):
+        # GIVEN
+        sut = size_class
+        # WHEN
+        actual = sut(size)
+        # THEN
+        assert actual == expected
+
+    # 変換時間を文書の大きさごとに記録し、例外を送出した変換は記録しないか
+    def test_measure_render(self):
+        # GIVEN
+        sut = RenderMetrics()
+        # WHEN
+        with sut.measure_render(2048):
+            pass
+        with pytest.raises(RuntimeError):
+            with sut.measure_render(10):
+                raise RuntimeError()
+        # THEN
+        actual = sut.registry.expose()
+        assert 'markdown_render_duration_seconds_count{size_le="16384"} 1' in actual
+        assert 'size_le="1024"' not in actual
+        assert 'markdown_render_queue_depth 0' in actual
+
+    # 要求を受け付けてから応答を送り終えるまで、例外を送出した場合も含めて待ち行列へ数えるか
+    def test_track_request(self):
+        # GIVEN
+        sut = RenderMetrics()
+        # WHEN
+        with sut.track_request():
+            with sut.track_request():
+                during = sut.registry.expose()
+        with pytest.raises(RuntimeError):
+            with sut.track_request():
+                raise RuntimeError()
+        # THEN
+        assert 'markdown_render_queue_depth 2' in during
+        assert 'markdown_render_queue_depth 0' in sut.registry.expose()
+
+    # メトリクスをHTTPで公開できるか
+    def test_start_metrics_server(self):
+        # GIVEN
+        metrics = RenderMetrics()
+        metrics.count_error('limit_exceeded')
+        sut = start_metrics_server(metrics.registry, 0)
+        url = f'http://127.0.0.1:{sut.server_address[1]}'
+        # WHEN
+        try:
+            with urllib.request.urlopen(f'{url}/metrics') as response:
+                content_type = response.headers['Content-Type']
+                actual = response.read().decode('utf-8')
+            with pytest.raises(urllib.error.HTTPError) as e:
+                urllib.request.urlopen(f'{url}/other')
+        finally:
+            sut.shutdown()
+            sut.server_close()
+        # THEN
+        assert content_type == CONTENT_TYPE
+        assert 'markdown_render_errors_total{reason="limit_exceeded"} 1' in actual
+        assert e.value.code == 404
@@ -0,0 +1,59 @@
+import json
+
+from a_pompom_markdown_parser.profiling import SlowDocumentLog, SLOW_LOG_INDEX
+from a_pompom_markdown_parser.renderer import Renderer
+
+
+class TestLineProfile:
+    """ 行ごとのパース処理を計測できるか検証 """
+
+    # 行番号・正規表現の呼び出し回数・Inline要素の深さを行ごとに記録できるか
+    def test_profile_lines(self):
+        # GIVEN
+        sut = Renderer()
+        lines = ['# 見出し', '段落', '```Python', 'print()', '```', '`a`と[b](c)と`d`']
+        # WHEN
+        actual = sut.profile_lines('\n'.join(lines))
+        # THEN
+        # コードブロックは開始行の行番号で1つにまとめる
+        assert [cost.line_number for cost in actual.costs] == [1, 2, 3, 6]
+        assert [cost.text for cost in actual.costs] == [lines[0], lines[1], lines[2], lines[5]]
+        # 記法を含まない行はInline要素を解釈しない
+        assert actual.costs[1].inline_depth == 0
+        # 「`a`と」「[b](c)」「と`d`」のうち、「`a`と」「と`d`」をさらに分割する
+        assert actual.costs[3].inline_depth == 3
+        assert all(cost.regex_calls > 0 for cost in [actual.costs[0], actual.costs[2], actual.costs[3]])
+        assert actual.slowest(1)[0].elapsed == max(cost.elapsed for cost in actual.costs)
+        assert actual.format(2).splitlines()[0].startswith('lines: 4, parse: ')
+        assert len(actual.format(2).splitlines()) == 4
+
+    # 計測しても、変換処理で共有するパーサには影響しないか
+    def test_profile_lines_isolated(self):
+        # GIVEN
+        sut = Renderer()
+        markdown_content = '\n'.join(['# 見出し', '[link](url)'])
+        # WHEN
+        sut.profile_lines(markdown_content)
+        # THEN
+        assert sut.render(markdown_content) == Renderer().render(markdown_content)
+        assert sut.profile_lines(markdown_content).costs[1].inline_depth == 1
+
+
+class TestSlowDocumentLog:
+    """ 変換時間が閾値を超えた文書を保存できるか検証 """
+
+    def test_capture(self, tmp_path):
+        # GIVEN
+        sut = SlowDocumentLog(str(tmp_path / 'slow'), threshold=0.5)
+        # WHEN
+        not_captured = sut.capture('# 速い文書', 0.1)
+        captured = [sut.capture('# 遅い文書', 1.0, source='a.md') for _ in range(2)]
+        # THEN
+        assert not_captured is None
+        # 同じ内容の文書は1つのファイルへ保存する
+        assert captured[0] == captured[1]
+        with open(captured[0], 'r') as f:
+            assert f.read() == '# 遅い文書'
+        with open(tmp_path / 'slow' / SLOW_LOG_INDEX, 'r') as f:
+            entries = [json.loads(line) for line in f]
+        assert [(entry['source'], entry['elapsed'], entry['lines']) for entry in entries] == [('a.md', 1.0, 1)] * 2
@@ -0,0 +1,263 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from a_pompom_markdown_parser.cancellation import CancellationToken, RenderCancelledException, STAGE_PARSE
+from a_pompom_markdown_parser.limits import Limits, LimitExceededException, LIMIT_BYTES
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.settings import default_profile
+
+from tests.util_equality import assert_that_text_file_content_is_same
+
+
+@pytest.fixture
+def frequent_thread_switch():
+    """
+    スレッドの切り替え間隔を短くし、変換処理の途中で他のスレッドへ切り替わりやすくするfixture
+    """
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+class TestRenderer:
+    """ 1つのパイプラインを使い回してマークダウン→HTMLへ変換できるか検証 """
+
+    def test_render(self):
+        # GIVEN
+        sut = Renderer()
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+        with open('./template/html/sample_article.html', 'r') as f:
+            expected = f.read()
+        # WHEN
+        actual = [sut.render(markdown_content) for _ in range(2)]
+        # THEN
+        assert actual == [expected, expected]
+
+    def test_render_file(self, tmp_path):
+        # GIVEN
+        sut = Renderer()
+        out_file_path = str(tmp_path / 'sample_article.html')
+        # WHEN
+        sut.render_file('./template/markdown/sample_article.md', out_file_path)
+        # THEN
+        assert_that_text_file_content_is_same('./template/html/sample_article.html', out_file_path)
+
+    # 変換の途中で、同じRendererから別の文書を変換できるか
+    def test_render_reentrant(self):
+        # GIVEN
+        sut = Renderer()
+        outer_content = '\n'.join(['[toc]', '# 概要', '## 詳細', '```Python', 'print()', '```'])
+        inner_content = '\n'.join(['* リスト', '> 引用'])
+        # WHEN
+        actual = []
+        for chunk in sut.render_chunks(outer_content, flush_size=0):
+            actual.append(chunk)
+            actual.append(sut.render(inner_content))
+        # THEN
+        assert ''.join(actual[0::2]) == Renderer().render(outer_content)
+        assert actual[1::2] == [Renderer().render(inner_content)] * (len(actual) // 2)
+
+    # 変換ごとに渡した設定値で組み立てられるか
+    def test_render_with_profile(self):
+        # GIVEN
+        sut = Renderer()
+        profile = default_profile().replace(newline_code='\r\n', indent='\t', class_name={'p': 'tenant-p'})
+        markdown_content = '\n'.join(['段落', '* リスト'])
+        expected = (
+            '<p class="tenant-p">\r\n'
+            '\t段落\r\n'
+            '</p>\r\n'
+            f'<ul class="{profile.class_name["ul"]}">\r\n'
+            f'\t<li class="{profile.class_name["li"]}">\r\n'
+            '\t\tリスト\r\n'
+            '\t</li>\r\n'
+            '</ul>\r\n'
+        )
+        # WHEN
+        actual = sut.render(markdown_content, profile)
+        # THEN
+        assert actual == expected
+        assert sut.render(markdown_content) == Renderer().render(markdown_content)
+
+
+class CountdownToken(CancellationToken):
+    """ 指定の回数だけ確認された後に、自身を取り消すトークン """
+
+    def __init__(self, checks: int):
+        super().__init__()
+        self.remaining = checks
+
+    def check(self, stage: str, line_number: int = None):
+        self.remaining -= 1
+        if self.remaining < 0:
+            self.cancel()
+        super().check(stage, line_number)
+
+
+class TestRendererCancellation:
+    """ 変換を打ち切ったとき、入力をそのまま表示するHTMLへ切り替えられるか検証 """
+
+    # 取り消された場合、入力をエスケープしてpreタグで囲むか
+    def test_render_cancelled(self):
+        # GIVEN
+        sut = Renderer()
+        token = CancellationToken()
+        token.cancel()
+        markdown_content = '\n'.join(['# <見出し>', '[link](https://example.com?a=1&b=2)'])
+        expected = '<pre># &lt;見出し&gt;\n[link](https://example.com?a=1&amp;b=2)</pre>\n'
+        # WHEN
+        actual = sut.render(markdown_content, token=token)
+        # THEN
+        assert actual == expected
+        assert token.error.stage == STAGE_PARSE
+        assert token.error.line_number == 1
+
+    # 1行のInline要素を解釈している途中でも打ち切り、入力をそのまま表示するか
+    def test_render_cancelled_within_line(self):
+        # GIVEN
+        sut = Renderer()
+        token = CountdownToken(checks=2)
+        markdown_content = '`a` `b` `c` `d` `e` `f`'
+        # WHEN
+        actual = sut.render(markdown_content, token=token)
+        # THEN
+        assert actual == f'<pre>{markdown_content}</pre>\n'
+        assert token.error.stage == STAGE_PARSE
+        assert token.error.line_number == 1
+
+    # 制限時間内であれば、通常通り変換するか
+    def test_render_within_timeout(self):
+        # GIVEN
+        sut = Renderer()
+        token = CancellationToken(timeout=60)
+        markdown_content = '\n'.join(['[toc]', '# 見出し', '段落'])
+        # WHEN
+        actual = sut.render(markdown_content, token=token)
+        # THEN
+        assert actual == Renderer().render(markdown_content)
+        assert token.error is None
+
+    # 逐次出力の途中で取り消された場合、例外を送出するか
+    def test_render_chunks_cancelled(self):
+        # GIVEN
+        sut = Renderer()
+        token = CancellationToken()
+        markdown_content = '\n'.join(['# 見出し', '段落', '* リスト'])
+        chunks = sut.render_chunks(markdown_content, flush_size=0, token=token)
+        first = next(chunks)
+        # WHEN
+        token.cancel()
+        with pytest.raises(RenderCancelledException):
+            list(chunks)
+        # THEN
+        assert first == Renderer().render('# 見出し')
+
+
+class TestRendererLimits:
+    """ 入力の大きさの上限に従って変換できるか検証 """
+
+    # 文書全体が上限を超えた場合は、変換せずに例外を送出するか
+    def test_render_too_large(self):
+        # GIVEN
+        sut = Renderer(limits=Limits(max_bytes=16))
+        # WHEN
+        with pytest.raises(LimitExceededException) as e:
+            sut.render('# 上限を超える見出し')
+        # THEN
+        assert e.value.limit == LIMIT_BYTES
+        with pytest.raises(LimitExceededException):
+            list(sut.render_chunks('# 上限を超える見出し'))
+
+    # Inline要素の数が上限を超えた行は、記法を含めたテキストのまま変換するか
+    def test_render_max_inline_elements(self):
+        # GIVEN
+        sut = Renderer(limits=Limits(max_inline_elements=10))
+        markdown_content = '[a](b)' * 1500
+        # WHEN
+        actual = sut.render(markdown_content)
+        # THEN
+        assert markdown_content in actual
+        assert '<a' not in actual
+
+    # 目次の階層の上限は、一括変換・逐次出力いずれにも適用されるか
+    def test_render_max_toc_depth(self):
+        # GIVEN
+        sut = Renderer(limits=Limits(max_toc_depth=1))
+        markdown_content = '\n'.join(['[toc]', '# 概要', '## 詳細'])
+        expected = Renderer().render('\n'.join(['[toc]', '# 概要']))
+        # WHEN
+        actual = sut.render(markdown_content)
+        # THEN
+        assert actual.startswith(expected)
+        assert ''.join(sut.render_chunks(markdown_content)) == actual
+
+
+class TestRendererConcurrency:
+    """ 1つのRendererを複数のスレッドから同時に呼び出しても、変換結果が損なわれないか検証 """
+
+    THREAD_COUNT = 8
+    RENDER_COUNT_PER_THREAD = 20
+
+    def test_render_concurrently(self, frequent_thread_switch):
+        # GIVEN
+        sut = Renderer()
+        documents = []
+        for path in ['plain', 'block', 'inline', 'sample_article']:
+            with open(f'./template/markdown/{path}.md', 'r') as f:
+                documents.append(f.read())
+        expected = [Renderer().render(document) for document in documents]
+        barrier = threading.Barrier(self.THREAD_COUNT)
+
+        def _render_repeatedly(thread_index: int) -> list[tuple[int, str]]:
+            # すべてのスレッドが揃ってから変換を始めることで、同時に変換する機会を増やす
+            barrier.wait()
+            results = []
+            for count in range(self.RENDER_COUNT_PER_THREAD):
+                document_index = (thread_index + count) % len(documents)
+                if count % 2 == 0:
+                    html_text = sut.render(documents[document_index])
+                else:
+                    html_text = ''.join(sut.render_chunks(documents[document_index], flush_size=0))
+                results.append((document_index, html_text))
+            return results
+
+        # WHEN
+        with ThreadPoolExecutor(max_workers=self.THREAD_COUNT) as executor:
+            actual = list(executor.map(_render_repeatedly, range(self.THREAD_COUNT)))
+        # THEN
+        for results in actual:
+            for document_index, html_text in results:
+                assert html_text == expected[document_index]
+
+    # 異なる設定値による変換を同時に行っても、互いの設定値が混ざらないか
+    def test_render_profiles_concurrently(self, frequent_thread_switch):
+        # GIVEN
+        sut = Renderer()
+        with open('./template/markdown/sample_article.md', 'r') as f:
+            markdown_content = f.read()
+        profiles = [default_profile().replace(indent=' ' * index, class_name={'p': f'tenant-{index}'})
+                    for index in range(self.THREAD_COUNT)]
+        expected = [Renderer(profile).render(markdown_content) for profile in profiles]
+        barrier = threading.Barrier(self.THREAD_COUNT)
+
+        def _render_repeatedly(thread_index: int) -> list[tuple[int, str]]:
+            barrier.wait()
+            results = []
+            for count in range(self.RENDER_COUNT_PER_THREAD):
+                profile_index = (thread_index + count) % len(profiles)
+                results.append((profile_index, sut.render(markdown_content, profiles[profile_index])))
+            return results
+
+        # WHEN
+        with ThreadPoolExecutor(max_workers=self.THREAD_COUNT) as executor:
+            actual = list(executor.map(_render_repeatedly, range(self.THREAD_COUNT)))
+        # THEN
+        for results in actual:
+            for profile_index, html_text in results:
+                assert html_text == expected[profile_index]
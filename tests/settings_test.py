@@ -0,0 +1,48 @@
+import pytest
+
+from a_pompom_markdown_parser.settings import SettingsProfile, default_profile, setting
+
+
+class TestSettingsProfile:
+    """ 設定値を不変な形で扱えるか検証 """
+
+    # 同じ設定値であれば同じfingerprintとなるか
+    def test_fingerprint(self):
+        # GIVEN
+        sut = default_profile()
+        # WHEN
+        same = SettingsProfile.from_dict(setting)
+        different = sut.replace(class_name={'p': 'tenant-p'})
+        # THEN
+        assert sut.fingerprint == same.fingerprint
+        assert sut == same
+        assert sut.fingerprint != different.fingerprint
+
+    # 一部の設定値のみを置き換えられるか
+    def test_replace(self):
+        # GIVEN
+        sut = default_profile()
+        # WHEN
+        actual = sut.replace(indent='\t', class_name={'p': 'tenant-p'})
+        # THEN
+        assert actual.indent == '\t'
+        assert actual.class_name['p'] == 'tenant-p'
+        assert actual.class_name['h1'] == sut.class_name['h1']
+        assert sut.indent == setting['indent']
+        assert sut.class_name['p'] == setting['class_name']['p']
+
+    # 生成後に設定値を書き換えられないか
+    def test_immutable(self):
+        # GIVEN
+        setting_dict = {**setting, 'class_name': dict(setting['class_name'])}
+        sut = SettingsProfile.from_dict(setting_dict)
+        fingerprint = sut.fingerprint
+        # WHEN
+        setting_dict['class_name']['p'] = 'changed'
+        # THEN
+        assert sut.class_name['p'] == setting['class_name']['p']
+        assert sut.fingerprint == fingerprint
+        with pytest.raises(AttributeError):
+            sut.indent = '\t'
+        with pytest.raises(TypeError):
+            sut.class_name['p'] = 'changed'
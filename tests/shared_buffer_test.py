@@ -0,0 +1,43 @@
+import pytest
+
+from a_pompom_markdown_parser.shared_buffer import SharedArena, SegmentWriter, read_segment
+
+
+class TestSharedArena:
+    """ 共有メモリへバイト列を配置し、記述子から読み出せるか検証 """
+
+    def test_write_and_read(self):
+        # GIVEN
+        data = ['見出し'.encode('utf-8'), b'', b'list']
+        # WHEN
+        with SharedArena(64) as sut:
+            segments = [sut.write(item) for item in data]
+            actual = [read_segment(segment) for segment in segments]
+        # THEN
+        assert actual == data
+        assert [segment[1] for segment in segments] == [0, 9, 9]
+
+    def test_overflow(self):
+        # GIVEN
+        with SharedArena(4) as sut:
+            sut.write(b'abc')
+            # WHEN
+            with pytest.raises(ValueError):
+                sut.write(b'de')
+
+
+class TestSegmentWriter:
+    """ 他のプロセスが確保した領域へ書き込めるか検証 """
+
+    # 領域に収まらないバイト列は書き込まずにNoneを返却するか
+    def test_write(self):
+        # GIVEN
+        with SharedArena(16) as arena:
+            arena.write(b'input')
+            output_segment = arena.allocate(8)
+            # WHEN
+            with SegmentWriter(output_segment) as sut:
+                written = [sut.write(b'html'), sut.write(b'large html'), sut.write(b'<p>')]
+            # THEN
+            assert written[1] is None
+            assert [arena.read(segment) for segment in (written[0], written[2])] == [b'html', b'<p>']
@@ -0,0 +1,54 @@
+from a_pompom_markdown_parser.cancellation import STAGE_PARSE, STAGE_CONVERT, STAGE_BUILD
+from a_pompom_markdown_parser.element.block import ParagraphBlock, ListBlock, ListItemBlock
+from a_pompom_markdown_parser.element.inline import PlainInline, LinkInline
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.stats import RenderStats, count_inlines
+
+
+class TestRenderStats:
+    """ 変換処理の段階ごとの時間と、入出力の大きさを記録できるか検証 """
+
+    # 変換結果を変えずに、段階ごとの時間・入出力の大きさを記録できるか
+    def test_render_with_stats(self):
+        # GIVEN
+        sut = RenderStats()
+        markdown_content = '\n'.join(['# 見出し', '[link](url)と`code`', '* リスト'])
+        # WHEN
+        actual = Renderer().render(markdown_content, stats=sut)
+        # THEN
+        assert actual == Renderer().render(markdown_content)
+        assert list(sut.stages) == [STAGE_PARSE, STAGE_CONVERT, STAGE_BUILD]
+        assert all(stage_time.wall_time > 0 for stage_time in sut.stages.values())
+        assert (sut.document_count, sut.line_count, sut.block_count, sut.inline_count) == (1, 3, 3, 5)
+        assert sut.input_bytes == len(markdown_content.encode('utf-8'))
+        assert sut.output_bytes == len(actual.encode('utf-8'))
+        assert sut.throughput > 0
+
+    # 複数の変換へ渡した場合は合計を記録するか
+    def test_accumulate(self):
+        # GIVEN
+        sut = RenderStats()
+        renderer = Renderer()
+        # WHEN
+        renderer.render('段落', stats=sut)
+        renderer.render('段落\n段落', stats=sut)
+        # THEN
+        assert (sut.document_count, sut.line_count, sut.block_count) == (2, 3, 3)
+        assert sut.to_dict()['line_count'] == 3
+        assert sut.format().startswith('documents: 2, lines: 3, blocks: 3, inlines: 3')
+
+
+class TestCountInlines:
+    """ 入れ子となったBlock要素のInline要素を数えられるか検証 """
+
+    def test_count_inlines(self):
+        # GIVEN
+        sut = count_inlines
+        block = ListBlock(indent_depth=0, children=[
+            ListItemBlock(indent_depth=1, children=[PlainInline(text='a'), LinkInline(text='b', href='c')]),
+            ListItemBlock(indent_depth=1, children=[ParagraphBlock(children=[PlainInline(text='d')])]),
+        ])
+        # WHEN
+        actual = sut(block)
+        # THEN
+        assert actual == 3
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.trace import TraceRecorder
+
+
+class TestTraceRecorder:
+    """ 区間をChrome Trace Event形式で記録できるか検証 """
+
+    # 区間の時刻・長さ・プロセス・スレッド・文書名を記録できるか
+    def test_span(self):
+        # GIVEN
+        sut = TraceRecorder()
+        # WHEN
+        with sut.for_document('a.md').span('parse', lines=3):
+            pass
+        # THEN
+        actual = sut.events
+        assert len(actual) == 1
+        assert {key: actual[0][key] for key in ['name', 'ph', 'pid', 'tid', 'args']} == {
+            'name': 'parse', 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_native_id(),
+            'args': {'lines': 3, 'document': 'a.md'}}
+        assert actual[0]['dur'] >= 0
+
+    # 同じスレッドへ複数回付けた名前は1つにまとめ、区間は開始時刻の順に並べるか
+    def test_to_dict(self):
+        # GIVEN
+        sut = TraceRecorder()
+        with sut.span('outer'):
+            sut.name_thread('worker')
+            with sut.span('inner'):
+                pass
+        sut.name_thread('worker')
+        # WHEN
+        actual = sut.to_dict()
+        # THEN
+        assert [(event['ph'], event['name']) for event in actual['traceEvents']] == \
+               [('M', 'thread_name'), ('X', 'outer'), ('X', 'inner')]
+
+
+class TestRendererTrace:
+    """ 変換処理の区間を記録できるか検証 """
+
+    # 段階ごと・行の種別の判定・Inline要素・目次の組み立てを記録し、変換結果は変わらないか
+    def test_render_trace(self):
+        # GIVEN
+        sut = Renderer()
+        trace = TraceRecorder()
+        markdown_content = '\n'.join(['[toc]', '# 見出し', '段落', '[link](url)と`code`'])
+        # WHEN
+        actual = sut.render(markdown_content, trace=trace.for_document('a.md'))
+        # THEN
+        assert actual == Renderer().render(markdown_content)
+        events = trace.to_dict()['traceEvents']
+        # 記法を含む「[toc]」「[link](url)と`code`」のみInline要素を解釈する
+        assert [event['name'] for event in events] == ['render', 'parse', 'classify', 'inline', 'inline', 'convert',
+                                                       'toc', 'build']
+        assert all(event['args']['document'] == 'a.md' for event in events)
+        # 子の区間は親の区間に収まる
+        assert events[1]['ts'] >= events[0]['ts']
+        assert events[1]['ts'] + events[1]['dur'] <= events[0]['ts'] + events[0]['dur']
+
+    # ファイルの読み書きを記録し、Perfettoで読み込めるJSONとして書き出せるか
+    def test_render_file_trace(self, tmp_path):
+        # GIVEN
+        sut = Renderer()
+        trace = TraceRecorder()
+        in_file_path = tmp_path / 'in.md'
+        in_file_path.write_text('# 見出し')
+        # WHEN
+        sut.render_file(str(in_file_path), str(tmp_path / 'out.html'), trace=trace)
+        trace.write(str(tmp_path / 'trace.json'))
+        # THEN
+        with open(tmp_path / 'trace.json', 'r') as f:
+            actual = json.load(f)
+        assert [event['name'] for event in actual['traceEvents']] == ['read', 'render', 'parse', 'classify',
+                                                                      'convert', 'build', 'write']
+        assert actual['traceEvents'][0]['args'] == {'document': str(in_file_path)}
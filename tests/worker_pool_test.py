@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from a_pompom_markdown_parser.batch import create_worker_pool, render_timed_chunk
+from a_pompom_markdown_parser.renderer import Renderer
+from a_pompom_markdown_parser.worker_pool import RecyclePolicy, RecyclingWorkerPool, RECYCLE_BY_TASKS, \
+    RECYCLE_BY_MEMORY, read_rss
+
+
+class TestReadRss:
+    """ 常駐メモリのバイト数を取得できるか検証 """
+
+    def test_read_rss(self):
+        # GIVEN
+        sut = read_rss
+        # WHEN
+        actual = sut()
+        # THEN
+        assert actual is None or actual > 0
+
+
+class TestRecyclingWorkerPool:
+    """ 条件に応じてワーカープロセスを入れ替えても、変換結果が失われないか検証 """
+
+    # 変換の数が上限に達したワーカーを入れ替えるか
+    def test_recycle_by_tasks(self):
+        # GIVEN
+        recycled = []
+        policy = RecyclePolicy(max_tasks_per_child=3, on_recycle=recycled.append)
+        markdown_contents = [f'# 見出し{index}' for index in range(8)]
+        # WHEN
+        sut = create_worker_pool(1, recycle_policy=policy)
+        try:
+            pids = [sut.submit(os.getpid).result() for _ in range(4)]
+            actual = [sut.submit(render_timed_chunk, [markdown_content]).result()[0][0]
+                      for markdown_content in markdown_contents]
+        finally:
+            sut.shutdown()
+        # THEN
+        assert actual == [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+        # 起動時の呼び出しを含め、3つ目の変換を終えたワーカーが入れ替わる
+        assert pids[0] == pids[1] != pids[2] == pids[3]
+        assert isinstance(sut, RecyclingWorkerPool)
+        assert [event.reason for event in sut.events] == [RECYCLE_BY_TASKS] * 4
+        assert recycled == sut.events
+
+    # 常駐メモリが上限を超えた場合、処理中の変換を終えてからワーカーを入れ替えるか
+    def test_recycle_by_memory(self):
+        # GIVEN
+        policy = RecyclePolicy(max_rss=1)
+        markdown_contents = [f'* リスト{index}' for index in range(6)]
+        # WHEN
+        sut = create_worker_pool(2, recycle_policy=policy)
+        try:
+            futures = [sut.submit(render_timed_chunk, [markdown_content]) for markdown_content in markdown_contents]
+            first_results = [future.result()[0][0] for future in futures]
+            pid_before = sut.submit(os.getpid).result()
+            pid_after = sut.submit(os.getpid).result()
+        finally:
+            sut.shutdown()
+        # THEN
+        assert first_results == [Renderer().render(markdown_content) for markdown_content in markdown_contents]
+        assert pid_before != pid_after
+        assert {event.reason for event in sut.events} == {RECYCLE_BY_MEMORY}
+        assert all(event.rss is None or event.rss > 1 for event in sut.events)
+
+    # 入れ替え先のExecutorを生成している間も、他の変換の委譲・ワーカーの状態の記録を止めないか
+    def test_replace_without_blocking(self):
+        # GIVEN
+        creating = threading.Event()
+        created = threading.Event()
+        executors = []
+
+        def create_executor():
+            if executors:
+                creating.set()
+                created.wait(5)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'executor{len(executors)}')
+            executors.append(executor)
+            return executor
+
+        def thread_name():
+            return threading.current_thread().name
+
+        sut = RecyclingWorkerPool(create_executor, RecyclePolicy(max_rss=1))
+        # WHEN
+        try:
+            first = sut.submit(thread_name).result()
+            replacing = threading.Thread(target=lambda: sut.submit(thread_name).result())
+            replacing.start()
+            creating.wait(5)
+            during = sut.submit(thread_name).result(timeout=5)
+            events = sut.events
+            created.set()
+            replacing.join()
+            after = sut.submit(thread_name).result()
+        finally:
+            created.set()
+            sut.shutdown()
+        # THEN
+        assert first.startswith('executor0') and during.startswith('executor0')
+        assert not after.startswith('executor0')
+        assert [event.reason for event in events] == [RECYCLE_BY_MEMORY]